@@ -1,5 +1,6 @@
 """cqgridfinity - A python library to make Gridfinity compatible objects with CadQuery."""
 
+import importlib
 import os
 
 # fmt: off
@@ -11,9 +12,52 @@ VERSION = __project__ + "-" + __version__
 
 script_dir = os.path.dirname(__file__)
 
+from . import constants
 from .constants import *
-from .gf_obj import GridfinityObject
-from .gf_baseplate import GridfinityBaseplate
-from .gf_box import GridfinityBox, GridfinitySolidBox
-from .gf_drawer import GridfinityDrawerSpacer
-from .gf_ruggedbox import GridfinityRuggedBox
+from .gf_spec import GridfinityBoxSpec, GridfinitySpecError, Param, SpecError
+
+# classes which depend on CadQuery are imported when they are first used so
+# that the constants and lightweight specifications can be used without
+# loading CadQuery and OCCT
+_LAZY_IMPORTS = {
+    "GridfinityObject": "gf_obj",
+    "GridPattern": "gf_pattern",
+    "csg": "gf_csg",
+    "GridfinityBaseplate": "gf_baseplate",
+    "GridfinityBox": "gf_box",
+    "GridfinitySolidBox": "gf_box",
+    "GridfinityDrawerSpacer": "gf_drawer",
+    "GridfinityRuggedBox": "gf_ruggedbox",
+    "GeometryCache": "gf_cache",
+    "GridfinityJobRunner": "gf_jobs",
+    "BuildManifest": "gf_manifest",
+    "GridfinityBatch": "gf_batch",
+    "GridfinitySpecTable": "gf_spectable",
+    "GridfinityCostModel": "gf_costmodel",
+    "as_rendered": "gf_async",
+    "set_render_executor": "gf_async",
+}
+
+__all__ = [
+    *(name for name in dir(constants) if not name.startswith("_")),
+    "VERSION",
+    "script_dir",
+    "GridfinityBoxSpec",
+    "GridfinitySpecError",
+    "Param",
+    "SpecError",
+    *_LAZY_IMPORTS,
+]
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        module = importlib.import_module("." + _LAZY_IMPORTS[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
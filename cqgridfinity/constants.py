@@ -46,6 +46,7 @@ GR_TOL = 0.5  # nominal tolerance
 GR_RAD = 4  # nominal exterior filleting radius
 GR_BASE_CLR = 0.25  # clearance above the nominal base height
 GR_BASE_HEIGHT = 4.75  # nominal base height
+GR_DENSITY = 1.24  # default material density (PLA) in g/cm^3 for mass estimates
 
 # baseplate extrusion profile
 GR_BASE_CHAMF_H = 0.98994949 / SQRT2
@@ -60,6 +61,7 @@ GR_STR_BASE_PROFILE = (
     (GR_BASE_TOP_CHAMF * SQRT2, 45),
     GR_STR_H + GR_BASE_CHAMF_H,
 )
+GR_BASE_RIDGE = 0.1  # top wall width of a lattice constructed baseplate
 
 GR_BOT_H = 7  # bin nominal floor height
 GR_FILLET = 1.1  # inside filleting radius
@@ -0,0 +1,185 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Gridfinity asyncio rendering
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import copy
+import functools
+import os
+
+from cqgridfinity.gf_jobs import export_file
+from cqgridfinity.gf_progress import CancelToken, RenderMonitor
+from cqgridfinity import gf_pool
+
+_executor = None
+
+
+def render_executor():
+    """Returns the executor used for asyncio rendering. A pool of worker
+    processes with one worker per CPU is created on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor()
+    return _executor
+
+
+def set_render_executor(executor=None, max_workers=None, preload=False):
+    """Sets the executor used for asyncio rendering. executor is either a
+    concurrent.futures executor, "process" for a pool of worker processes or
+    "thread" for a pool of threads in this process. Threads avoid copying
+    objects and results between processes, but OCCT holds the GIL for most
+    of a render so that only processes render in parallel. None restores the
+    default process pool. If preload is True, the pool processes start warm
+    (see gf_pool.warm_context) or this process is preloaded for a pool of
+    threads, which is useful for long running services. Returns the
+    previous executor, which is not shut down."""
+    global _executor
+    previous = _executor
+    if executor == "process" and preload:
+        executor = ProcessPoolExecutor(
+            max_workers, mp_context=gf_pool.warm_context(), initializer=gf_pool.preload
+        )
+    elif executor == "process":
+        executor = ProcessPoolExecutor(max_workers)
+    elif executor == "thread":
+        if preload:
+            gf_pool.preload()
+        executor = ThreadPoolExecutor(max_workers)
+    elif isinstance(executor, str):
+        raise ValueError("Unknown render executor %s" % (executor))
+    _executor = executor
+    return previous
+
+
+def _preloaded(fn):
+    # renders use the geometry cache of a preloaded process
+    @functools.wraps(fn)
+    def wrapper(*args):
+        cache = gf_pool.preloaded_cache()
+        if cache is None:
+            return fn(*args)
+        with cache:
+            return fn(*args)
+
+    return wrapper
+
+
+@_preloaded
+def _render(obj, method="render"):
+    if hasattr(obj, "render_detached"):
+        return obj.render_detached(method)
+    # object specifications such as GridfinityBoxSpec
+    return getattr(obj, method)()
+
+
+@_preloaded
+def _save(obj, formats, path=None, prefix=None):
+    # a copy is rendered so that the object can be shared between threads
+    obj = copy.copy(obj)
+    obj._cq_obj = obj.render()
+    fn = obj.filename(path=path, prefix=prefix)
+    filenames = []
+    for fmt in formats:
+        filename = "%s.%s" % (fn, fmt.lower())
+        export_file(obj, filename, fmt)
+        filenames.append(filename)
+    return filenames
+
+
+def _monitored(cancel, fn, *args):
+    # a render in a thread stops at its next stage once cancel is cancelled
+    with RenderMonitor(cancel=cancel):
+        return fn(*args)
+
+
+def _submit(executor, fn, *args):
+    # returns the future of fn(*args) run in an executor and the CancelToken
+    # of the render, which is None for executors of worker processes since a
+    # token cannot be cancelled from another process
+    loop = asyncio.get_running_loop()
+    if isinstance(executor, ThreadPoolExecutor):
+        cancel = CancelToken()
+        return loop.run_in_executor(executor, _monitored, cancel, fn, *args), cancel
+    return loop.run_in_executor(executor, fn, *args), None
+
+
+async def _run(executor, fn, *args):
+    fut, cancel = _submit(executor or render_executor(), fn, *args)
+    try:
+        return await fut
+    except asyncio.CancelledError:
+        if cancel is not None:
+            cancel.cancel()
+        raise
+
+
+async def render_async(obj, method="render", executor=None):
+    """Renders an object in an executor without blocking the event loop and
+    returns the result of its render method, e.g. "render_lid". Cancelling
+    the awaiting task cancels the render if it has not started. A render
+    which has started in a thread pool is cancelled with a CancelToken and
+    stops at the end of its current stage. A render which has started in a
+    pool of worker processes cannot be stopped; it runs to completion and
+    its result is discarded."""
+    return await _run(executor, _render, obj, method)
+
+
+async def save_async(obj, formats=("step",), path=None, prefix=None, executor=None):
+    """Renders an object and saves it to a file for each file format
+    ("step", "stl" or "svg") in an executor without blocking the event loop.
+    Files are named by obj.filename(path=path, prefix=prefix). Returns the
+    list of saved filenames. Cancellation is the same as render_async."""
+    if isinstance(formats, str):
+        formats = [formats]
+    return await _run(executor, _save, obj, list(formats), path, prefix)
+
+
+async def as_rendered(objs, limit=None, executor=None, method="render"):
+    """Renders objects or object specifications concurrently and yields
+    (obj, result) pairs in the order that the renders finish, e.g.
+      async for obj, r in as_rendered(specs, limit=4):
+    At most limit renders (default is the number of CPUs) are submitted to
+    the executor at once, so that a large batch does not flood it. An error
+    is raised from the loop when its render finishes. Leaving the loop early
+    or cancelling the task cancels the renders which have not started and
+    the started renders of a thread pool (see render_async)."""
+    executor = executor or render_executor()
+    limit = limit or os.cpu_count() or 1
+    pending = list(objs)[::-1]
+    running = {}
+    try:
+        while pending or running:
+            while pending and len(running) < limit:
+                obj = pending.pop()
+                fut, cancel = _submit(executor, _render, obj, method)
+                running[fut] = obj, cancel
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for fut in done:
+                yield running.pop(fut)[0], fut.result()
+    finally:
+        for fut, (_, cancel) in running.items():
+            fut.cancel()
+            if cancel is not None:
+                cancel.cancel()
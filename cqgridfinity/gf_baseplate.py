@@ -23,9 +23,17 @@
 #
 # Gridfinity Baseplates
 
+from concurrent.futures import ProcessPoolExecutor
+import json
+import math
+import os
+
 import cadquery as cq
 
-from cqgridfinity import *
+from cqgridfinity.constants import *
+from cqgridfinity.gf_obj import GridfinityObject, Param
+from cqgridfinity.gf_pattern import GridPattern
+from cqgridfinity.gf_progress import monitored, render_stage
 from cqkit.cq_helpers import (
     rounded_rect_sketch,
     composite_from_pts,
@@ -33,6 +41,13 @@ from cqkit.cq_helpers import (
     recentre,
 )
 from cqkit import VerticalEdgeSelector, HasZCoordinateSelector
+from cqgridfinity.gf_helpers import (
+    detach,
+    selector,
+    rounded_rect_area,
+    profile_inset,
+    profile_integral,
+)
 
 
 class GridfinityBaseplate(GridfinityObject):
@@ -51,8 +66,33 @@ class GridfinityBaseplate(GridfinityObject):
       csk_hole - mounting screw hole diameter
       csk_diam - mounting screw countersink diameter
       csk_angle - mounting screw countersink angle
+      lattice - build the baseplate directly from its 2D lattice of pocket
+        openings rather than cutting each pocket from a solid slab
+
+    The lattice construction avoids a 3D boolean operation whose cost grows
+    with the number of pockets and is much faster for large baseplates. Since
+    adjacent pockets overlap at the very top of the baseplate, the walls of
+    a lattice baseplate finish with a GR_BASE_RIDGE wide vertical ridge rather
+    than a knife edge. The difference in volume is less than 0.1%.
+
+    Baseplates which are too large to print in one piece can be split into
+    tiles which fit a printer bed with the tile_layout, render_tiles and
+    save_tiles methods.
     """
 
+    PARAMS = [
+        Param("length_u", int, 2, 1, help="length in U (42 mm / U)"),
+        Param("width_u", int, 2, 1, help="width in U (42 mm / U)"),
+        Param("ext_depth", float, 0.0, 0.0, help="extra depth under the baseplate"),
+        Param("straight_bottom", bool, False, help="straight instead of chamfered"),
+        Param("corner_screws", bool, False, help="add corner mounting screw tabs"),
+        Param("corner_tab_size", float, 21.0, help="size of the corner tabs"),
+        Param("csk_hole", float, 5.0, help="mounting screw hole diameter"),
+        Param("csk_diam", float, 10.0, help="mounting screw countersink diameter"),
+        Param("csk_angle", float, 82.0, help="mounting screw countersink angle"),
+        Param("lattice", bool, False, help="build from the 2D pocket lattice"),
+    ]
+
     def __init__(self, length_u, width_u, **kwargs):
         super().__init__()
         self.length_u = length_u
@@ -64,12 +104,22 @@ class GridfinityBaseplate(GridfinityObject):
         self.csk_hole = 5.0
         self.csk_diam = 10.0
         self.csk_angle = 82
+        self.lattice = False
         for k, v in kwargs.items():
             if k in self.__dict__ and v is not None:
                 self.__dict__[k] = v
         if self.corner_screws:
             self.ext_depth = max(self.ext_depth, 5.0)
 
+    def canonical_params(self):
+        params = super().canonical_params()
+        unused = ["height_u"]
+        if self.corner_screws:
+            params["ext_depth"] = max(params["ext_depth"], 5.0)
+        else:
+            unused.extend(["corner_tab_size", "csk_hole", "csk_diam", "csk_angle"])
+        return {k: v for k, v in params.items() if k not in unused}
+
     def _corner_pts(self):
         oxy = self.corner_tab_size / 2
         return [
@@ -78,31 +128,274 @@ class GridfinityBaseplate(GridfinityObject):
             for j in (-1, 1)
         ]
 
-    def render(self):
+    def _lattice_levels(self):
+        """Returns the (inset, z) levels of the pocket opening profile from the
+        bottom to the top of the baseplate. Each inset is measured from the
+        nominal GRU_CUT opening and equals the corner radius reduction."""
+        top = GR_BASE_HEIGHT + self.ext_depth
+        tc = GR_BASE_TOP_CHAMF
+        if self.straight_bottom:
+            levels = [(tc, 0)]
+        else:
+            levels = [(tc + GR_BASE_CHAMF_H, 0)]
+            if self.ext_depth > 0:
+                levels.append((tc + GR_BASE_CHAMF_H, self.ext_depth))
+            levels.append((tc, self.ext_depth + GR_BASE_CHAMF_H))
+        levels.append((tc, top - tc))
+        ridge = (GRU_CUT - GRU + GR_BASE_RIDGE) / 2
+        levels.extend([(ridge, top - ridge), (ridge, top)])
+        return levels
+
+    def _render_lattice(self):
+        def _wire(length, width, rad, z):
+            f = rounded_rect_sketch(length, width, rad).reset().faces().val()
+            return f.outerWire().moved(cq.Location(cq.Vector(0, 0, z)))
+
+        levels = self._lattice_levels()
+        wires = [
+            _wire(GRU_CUT - 2 * d, GRU_CUT - 2 * d, GR_RAD - d, z) for d, z in levels
+        ]
+        top = levels[-1][1]
+        outer = [_wire(self.length, self.width, GR_RAD, z) for z in (0, top)]
+
+        def _side_faces(wires):
+            rs = cq.Solid.makeLoft(wires, True)
+            return [f for f in rs.Faces() if abs(abs(f.normalAt().z) - 1) > EPS]
+
+        walls = cq.Compound.makeCompound(_side_faces(wires))
+        grid = (self.length_u, self.width_u)
+        faces = _side_faces(outer)
+        for rs in GridPattern.grid(walls, *grid, centred=True).shapes():
+            faces.extend(rs.Faces())
+        for ow, w in zip(outer, (wires[0], wires[-1])):
+            holes = GridPattern.grid(w, *grid, centred=True).shapes()
+            faces.append(cq.Face.makeFromWires(ow, holes))
+        rs = cq.Solid.makeSolid(cq.Shell.makeShell(faces))
+        return cq.Workplane("XY").newObject([rs])
+
+    def _render_pocket(self):
         profile = GR_BASE_PROFILE if not self.straight_bottom else GR_STR_BASE_PROFILE
         if self.ext_depth > 0:
             profile = [*profile, self.ext_depth]
         rc = self.extrude_profile(
             rounded_rect_sketch(GRU_CUT, GRU_CUT, GR_RAD), profile
         )
-        rc = rotate_x(rc, 180).translate((GRU2, GRU2, GR_BASE_HEIGHT + self.ext_depth))
-        rc = recentre(composite_from_pts(rc, self.grid_centres), "XY")
+        return rotate_x(rc, 180).translate((0, 0, GR_BASE_HEIGHT + self.ext_depth))
+
+    def pocket_key(self):
+        """Returns the inputs which determine the grid pocket cutter."""
+        return ("pocket", self.straight_bottom, self.ext_depth)
+
+    def sub_solids(self):
+        if self.lattice:
+            return []
+        return [[(self, self.pocket_key(), self._render_pocket, ())]]
+
+    def _render_pocketed(self):
+        # a single pocket is shared by baseplates of every size
+        rc = self.cached(self.pocket_key(), self._render_pocket)
         r = (
             cq.Workplane("XY")
             .rect(self.length, self.width)
             .extrude(GR_BASE_HEIGHT + self.ext_depth)
-            .edges("|Z")
+            .edges(selector("|Z"))
             .fillet(GR_RAD)
-            .faces(">Z")
-            .cut(rc)
         )
+        pockets = GridPattern.grid(rc, self.length_u, self.width_u, centred=True)
+        # only the cut plate outlives the pocket composite
+        return detach(pockets.cut_from(r))
+
+    @monitored
+    def render(self):
+        self.check_valid()
+        if self.lattice:
+            render_stage("lattice", 0.05)
+            r = self._render_lattice()
+        else:
+            render_stage("pockets", 0.05)
+            r = self._render_pocketed()
         if self.corner_screws:
+            render_stage("corner screws", 0.7)
             rs = cq.Sketch().rect(self.corner_tab_size, self.corner_tab_size)
             rs = cq.Workplane("XY").placeSketch(rs).extrude(self.ext_depth)
-            rs = rs.faces(">Z").cskHole(
+            rs = rs.faces(selector(">Z")).cskHole(
                 self.csk_hole, cskDiameter=self.csk_diam, cskAngle=self.csk_angle
             )
             r = r.union(recentre(composite_from_pts(rs, self._corner_pts()), "XY"))
             bs = VerticalEdgeSelector(self.ext_depth) & HasZCoordinateSelector(0)
-            r = r.edges(bs).fillet(GR_RAD)
+            r = detach(r.edges(bs).fillet(GR_RAD))
         return r
+
+    def estimate(self, density=GR_DENSITY):
+        """Returns analytic estimates of the size, material volume and mass of
+        the baseplate computed from its dimensions without rendering it. The
+        estimate is returned as a dictionary with:
+          size - overall length, width and height in mm
+          footprint - base area in mm^2
+          volume - material volume in mm^3
+          mass - mass in g for a material density in g/cm^3
+          pockets - number of bin pockets
+        The material where adjacent pockets overlap at the very top of the
+        baseplate is ignored and lattice baseplates have slightly more volume
+        in their top ridge. Volumes are typically within 0.5% of the rendered
+        baseplate."""
+        profile = GR_BASE_PROFILE if not self.straight_bottom else GR_STR_BASE_PROFILE
+        if self.ext_depth > 0:
+            profile = [*profile, self.ext_depth]
+        pockets = self.length_u * self.width_u
+        footprint = rounded_rect_area(self.length, self.width, GR_RAD)
+        inset = (GRU_CUT - GRU) / 2
+
+        def _area(z, t):
+            size = GRU_CUT - 2 * t
+            return footprint - pockets * rounded_rect_area(size, size, GR_RAD - t)
+
+        # adjacent pockets overlap in the top inset mm of the baseplate
+        height = GR_BASE_HEIGHT + self.ext_depth
+        vol = profile_integral(profile, _area, inset)
+        if self.corner_screws:
+            # corner tabs fill the bottom of the corner pockets less the
+            # countersunk screw holes. The filleted tab corners add material
+            # where they meet the pocket walls and remove it in the pocket.
+            t = profile_inset(profile, height)
+            size = self.corner_tab_size - t + inset
+            tab = size * size - (1 - math.pi / 4) * (GR_RAD - t) ** 2
+            tab += (1 - math.pi / 4) * GR_RAD * GR_RAD
+            rh, rc = self.csk_hole / 2, self.csk_diam / 2
+            hc = (rc - rh) / math.tan(math.radians(self.csk_angle / 2))
+            csk = math.pi * rh * rh * self.ext_depth
+            csk += math.pi * hc / 3 * (rc * rc + rc * rh - 2 * rh * rh)
+            vol += 4 * (tab * self.ext_depth - csk)
+        return {
+            "size": (self.length, self.width, height),
+            "footprint": footprint,
+            "volume": vol,
+            "mass": vol * density / 1000,
+            "pockets": pockets,
+        }
+
+    @property
+    def tile_params(self):
+        """Attributes which are shared by every tile of a tiled baseplate."""
+        return {
+            k: v
+            for k, v in self.__dict__.items()
+            if not k.startswith("_") and k not in ("length_u", "width_u")
+        }
+
+    def tile_layout(self, bed_length, bed_width=None):
+        """Computes a layout of baseplate tiles which fit a printer bed of
+        bed_length x bed_width mm. The baseplate is split as evenly as possible
+        in each dimension so that most tiles share the same size. Returns a list
+        of dictionaries describing each tile with its grid index, size in U,
+        offset in U from the baseplate corner and centre position in mm relative
+        to the centre of the complete baseplate."""
+        bed_width = bed_width if bed_width is not None else bed_length
+        max_l, max_w = (math.floor(x / GRU) for x in (bed_length, bed_width))
+        if max_l < 1 or max_w < 1:
+            raise ValueError(
+                "Print bed %.1f x %.1f mm is too small for a 1U baseplate tile"
+                % (bed_length, bed_width)
+            )
+
+        def _split(units, max_units):
+            n = math.ceil(units / max_units)
+            sizes = [units // n + (1 if i < units % n else 0) for i in range(n)]
+            offsets = [sum(sizes[:i]) for i in range(n)]
+            return list(zip(offsets, sizes))
+
+        tiles = []
+        for i, (xo, lu) in enumerate(_split(self.length_u, max_l)):
+            for j, (yo, wu) in enumerate(_split(self.width_u, max_w)):
+                tiles.append(
+                    {
+                        "index": (i, j),
+                        "size_u": (lu, wu),
+                        "offset_u": (xo, yo),
+                        "centre": (
+                            (xo + lu / 2) * GRU - self.length / 2,
+                            (yo + wu / 2) * GRU - self.width / 2,
+                        ),
+                    }
+                )
+        return tiles
+
+    def tile_filename(self, size_u, prefix=None, path=None):
+        """Returns a filename for a baseplate tile of size_u = (length_u, width_u)."""
+        return self.filename(prefix=prefix, path=path) + "_tile_%dx%d" % size_u
+
+    @monitored
+    def render_tiles(self, bed_length, bed_width=None):
+        """Renders each distinct tile shape of a tiled baseplate once. Returns a
+        dictionary of rendered tiles keyed by tile size in U."""
+        tiles = {}
+        sizes = [tile["size_u"] for tile in self.tile_layout(bed_length, bed_width)]
+        sizes = list(dict.fromkeys(sizes))
+        for i, size in enumerate(sizes):
+            render_stage("tile %dx%d" % size, i / len(sizes))
+            bp = GridfinityBaseplate(*size, **self.tile_params)
+            tiles[size] = bp.render()
+        return tiles
+
+    def save_tiles(
+        self,
+        bed_length,
+        bed_width=None,
+        path=None,
+        prefix=None,
+        file_format="step",
+        workers=None,
+    ):
+        """Renders and saves each distinct tile shape of a tiled baseplate to its
+        own file. Tiles are rendered and exported in parallel using a pool of
+        worker processes (workers=1 exports serially in this process). A JSON
+        manifest mapping every tile position to its tile file is also saved.
+        Returns the manifest as a dictionary."""
+        layout = self.tile_layout(bed_length, bed_width)
+        sizes = list(dict.fromkeys(tile["size_u"] for tile in layout))
+        fmt = file_format.lower()
+        fns = {
+            size: "%s.%s" % (self.tile_filename(size, prefix=prefix, path=path), fmt)
+            for size in sizes
+        }
+        jobs = [(self.tile_params, size, fns[size], fmt) for size in sizes]
+        if workers == 1 or len(jobs) == 1:
+            for job in jobs:
+                _save_baseplate_tile(*job)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(_save_baseplate_tile, *zip(*jobs)))
+        manifest = {
+            "baseplate": self.filename(prefix=prefix),
+            "size_u": (self.length_u, self.width_u),
+            "size": (self.length, self.width),
+            "bed_size": (bed_length, bed_width or bed_length),
+            "files": {
+                "%dx%d"
+                % size: {
+                    "file": os.path.basename(fns[size]),
+                    "count": sum(1 for t in layout if t["size_u"] == size),
+                }
+                for size in sizes
+            },
+            "tiles": [
+                {**tile, "file": os.path.basename(fns[tile["size_u"]])}
+                for tile in layout
+            ],
+        }
+        fn = self.filename(prefix=prefix, path=path) + "_tiles.json"
+        with open(fn, "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+
+def _save_baseplate_tile(params, size_u, filename, file_format):
+    """Renders and saves a single baseplate tile (run in a worker process)."""
+    bp = GridfinityBaseplate(*size_u, **params)
+    if file_format == "stl":
+        bp.save_stl_file(filename=filename)
+    elif file_format == "svg":
+        bp.save_svg_file(filename=filename)
+    else:
+        bp.save_step_file(filename=filename)
+    return filename
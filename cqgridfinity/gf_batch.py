@@ -0,0 +1,459 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Gridfinity batch rendering
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import itertools
+import os
+import queue
+import shutil
+import threading
+import time
+
+from OCP.StlAPI import StlAPI_Writer
+
+from cqgridfinity.gf_cache import GeometryCache, geometry_key
+from cqgridfinity.gf_costmodel import GridfinityCostModel
+from cqgridfinity.gf_jobs import GridfinityJobRunner, export_file
+from cqgridfinity.gf_manifest import BuildManifest, geometry_hash
+from cqgridfinity.gf_obj import GridfinitySpecError, SpecError
+from cqgridfinity.gf_pool import warm_context
+
+
+def link_file(src, dst):
+    """Makes dst a hard link to the file src, or a copy of src if the file
+    system does not support hard links."""
+    if os.path.lexists(dst):
+        if os.path.samefile(src, dst):
+            return
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _warm_sub_solid(cache, obj, key, render_fn, args):
+    # renders a sub-solid into a shared cache in a worker process
+    t0 = time.perf_counter()
+    try:
+        with GeometryCache(shared=cache):
+            obj.cached(key, render_fn, *args)
+        status, error = "ok", None
+    except Exception as e:
+        status, error = "error", "%s: %s" % (type(e).__name__, e)
+    return status, error, time.perf_counter() - t0, os.getpid()
+
+
+class GridfinityBatch:
+    """Gridfinity batch renderer
+
+    This class renders a batch of related Gridfinity objects, e.g. a catalog
+    of boxes with the same footprint and different heights and features.
+    Objects are rendered with a shared GeometryCache so that each distinct
+    intermediate sub-solid (box shells, base feet, interiors, dividing walls)
+    is only rendered once per batch and shared by every object which needs it.
+    Objects whose specifications differ only in parameters which are
+    overridden or have no effect (see canonical_params) render identical
+    geometry. Each such geometry is rendered once and the output files of the
+    duplicate objects are hard links to the same file.
+      objs - optional list of Gridfinity objects to render
+    """
+
+    def __init__(self, objs=None):
+        self.objs = list(objs) if objs is not None else []
+        self.cache = GeometryCache()
+        self.render_time = 0.0
+        self.tessellate_time = 0.0
+        self.write_time = 0.0
+        self.linked = 0
+        self.runner = None
+
+    def __len__(self):
+        return len(self.objs)
+
+    def add(self, obj):
+        self.objs.append(obj)
+
+    @classmethod
+    def matrix(cls, obj_class, **kwargs):
+        """Returns a batch with one object for every combination of keyword
+        argument values. Arguments with a list, tuple or range value are
+        varied and all other arguments are shared by every object, e.g.
+        GridfinityBatch.matrix(GridfinityBox, length_u=2, width_u=3,
+        height_u=range(2, 7), holes=[False, True])"""
+        multi = {k: v for k, v in kwargs.items() if isinstance(v, (list, tuple, range))}
+        fixed = {k: v for k, v in kwargs.items() if k not in multi}
+        objs = []
+        for values in itertools.product(*multi.values()):
+            objs.append(obj_class(**fixed, **dict(zip(multi.keys(), values))))
+        return cls(objs)
+
+    def validate(self):
+        """Returns a dictionary of the invalid objects in the batch keyed by
+        their batch index with the list of SpecError tuples for each object."""
+        errors = {}
+        for i, obj in enumerate(self.objs):
+            obj_errors = obj.validate()
+            if obj_errors:
+                errors[i] = obj_errors
+        return errors
+
+    def check_valid(self):
+        """Raises a GridfinitySpecError listing the problems of every invalid
+        object in the batch."""
+        errors = self.validate()
+        if errors:
+            raise GridfinitySpecError(
+                SpecError(
+                    e.param, e.value, "%s: %s" % (self.objs[i].filename(), e.message)
+                )
+                for i, obj_errors in errors.items()
+                for e in obj_errors
+            )
+
+    def remove_invalid(self):
+        """Removes the invalid objects from the batch and returns them."""
+        errors = self.validate()
+        invalid = [obj for i, obj in enumerate(self.objs) if i in errors]
+        self.objs = [obj for i, obj in enumerate(self.objs) if i not in errors]
+        return invalid
+
+    def duplicates(self):
+        """Returns a list with the batch index of the first object which has
+        the same geometry hash as each object. Objects whose geometry is not
+        duplicated have their own index. Invalid objects are never matched."""
+        errors = self.validate()
+        first, sources = {}, []
+        for i, obj in enumerate(self.objs):
+            key = i if i in errors else geometry_hash(obj)
+            sources.append(first.setdefault(key, i))
+        return sources
+
+    def render(self):
+        """Renders every object in the batch and returns a list of the rendered
+        CadQuery objects in the same order as the batch objects. Every object
+        is validated before any are rendered so that an invalid specification
+        raises a GridfinitySpecError without wasting any rendering work."""
+        self.check_valid()
+        results = []
+        with self.cache:
+            for obj in self.objs:
+                t0 = time.perf_counter()
+                obj._cq_obj = obj.render()
+                self.render_time += time.perf_counter() - t0
+                results.append(obj._cq_obj)
+        return results
+
+    def save(
+        self, path=None, prefix=None, file_format="step", queue_size=2, dedupe=True
+    ):
+        """Renders and saves every object in the batch to a file named with
+        each object's automatic filename. Returns a list of the filenames.
+        Objects stream through a pipeline of stages: rendering feeds a
+        bounded queue consumed by a tessellation thread, which feeds a bounded
+        queue consumed by a file writing thread. Exporting one object
+        overlaps with rendering the next and rendering blocks while queue_size
+        objects are waiting in a queue. Rendered objects are released once
+        their file is written. If dedupe is True, objects with duplicate
+        geometry are rendered once and their files are hard linked."""
+        self.check_valid()
+        fmt = file_format.lower()
+        fns = ["%s.%s" % (o.filename(prefix=prefix, path=path), fmt) for o in self.objs]
+        sources = self.duplicates() if dedupe else list(range(len(self.objs)))
+        mesh_queue = queue.Queue(maxsize=queue_size)
+        write_queue = queue.Queue(maxsize=queue_size)
+        errors = []
+
+        def _tessellate():
+            while True:
+                job = mesh_queue.get()
+                if job is not None and fmt == "stl" and not errors:
+                    obj, fn, _ = job
+                    t0 = time.perf_counter()
+                    try:
+                        job = obj, fn, obj.tessellate()
+                    except Exception as e:
+                        errors.append(e)
+                    self.tessellate_time += time.perf_counter() - t0
+                write_queue.put(job)
+                if job is None:
+                    break
+
+        def _write():
+            while True:
+                job = write_queue.get()
+                if job is None:
+                    break
+                obj, fn, shape = job
+                t0 = time.perf_counter()
+                try:
+                    if not errors:
+                        if shape is not None:
+                            StlAPI_Writer().Write(shape, fn)
+                        else:
+                            export_file(obj, fn, fmt)
+                except Exception as e:
+                    errors.append(e)
+                obj._cq_obj = None
+                self.write_time += time.perf_counter() - t0
+
+        threads = [
+            threading.Thread(target=_tessellate, daemon=True),
+            threading.Thread(target=_write, daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            with self.cache:
+                for obj, fn, i in zip(self.objs, fns, sources):
+                    if errors:
+                        break
+                    if obj is not self.objs[i]:
+                        continue
+                    t0 = time.perf_counter()
+                    obj._cq_obj = obj.render()
+                    self.render_time += time.perf_counter() - t0
+                    mesh_queue.put((obj, fn, None))
+        finally:
+            mesh_queue.put(None)
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+        for i, src in enumerate(sources):
+            if fns[src] != fns[i]:
+                link_file(fns[src], fns[i])
+                self.linked += 1
+        return fns
+
+    def run(
+        self,
+        path=None,
+        prefix=None,
+        file_format="step",
+        manifest=None,
+        resume=True,
+        callback=None,
+        dedupe=True,
+        **kwargs
+    ):
+        """Renders and saves every object in the batch in supervised worker
+        processes with a GridfinityJobRunner. Keyword arguments such as
+        workers, timeout, max_memory, max_jobs and memory_budget configure
+        the runner.
+        Invalid objects are never dispatched and jobs which fail, crash or
+        time out are recorded without aborting the rest of the batch. Jobs
+        are dispatched in order of longest predicted render time first.
+        The result of each job is appended to an optional BuildManifest file
+        as soon as it finishes. If resume is True, objects whose outputs in
+        the manifest are still current are skipped, so an interrupted run
+        can be continued and only objects affected by a change of version or
+        constants are rebuilt. If dedupe is True, objects with duplicate
+        geometry are rendered once and their files are hard linked with the
+        job status "linked". Returns a list of job result dictionaries in
+        the same order as the batch objects. callback(result) is called as
+        each job finishes."""
+        fmt = file_format.lower()
+        errors = self.validate()
+        built = BuildManifest(manifest) if manifest is not None else None
+        results = [None] * len(self.objs)
+        sources = self.duplicates() if dedupe else list(range(len(self.objs)))
+        fns = [
+            "%s.%s" % (obj.filename(prefix=prefix, path=path), fmt) for obj in self.objs
+        ]
+        jobs, indices, copies = [], [], {}
+
+        def _result(i, fn, status, error):
+            return {
+                "index": i,
+                "filename": fn,
+                "status": status,
+                "error": error,
+                "time": 0.0,
+                "pid": None,
+                "memory": None,
+            }
+
+        def _link(i):
+            # an object with duplicate geometry shares the output of the first
+            # such object once it is built
+            src = results[sources[i]]
+            if src["status"] in ("ok", "skipped"):
+                link_file(src["filename"], fns[i])
+                results[i] = _result(i, fns[i], "linked", None)
+                self.linked += 1
+            else:
+                error = "Duplicate of %s: %s" % (src["filename"], src["error"])
+                results[i] = _result(i, fns[i], src["status"], error)
+            if built is not None:
+                built.append(self.objs[i], results[i])
+            if callback is not None:
+                callback(results[i])
+
+        for i, (obj, fn) in enumerate(zip(self.objs, fns)):
+            if i in errors:
+                error = "; ".join(e.message for e in errors[i])
+                results[i] = _result(i, fn, "invalid", error)
+                if built is not None:
+                    built.append(obj, results[i])
+            elif resume and built is not None and built.is_current(obj, fn):
+                results[i] = _result(i, fn, "skipped", None)
+            elif sources[i] != i:
+                copies.setdefault(sources[i], []).append(i)
+            else:
+                jobs.append((obj, fn, fmt))
+                indices.append(i)
+        for src in list(copies):
+            if results[src] is not None:
+                for i in copies.pop(src):
+                    _link(i)
+        model = GridfinityCostModel()
+
+        def _cost(job):
+            try:
+                return model.total(job[0])
+            except ValueError:
+                return 0.0
+
+        order = sorted(range(len(jobs)), key=lambda j: _cost(jobs[j]), reverse=True)
+
+        def _done(result):
+            result["index"] = indices[order[result["index"]]]
+            results[result["index"]] = result
+            if built is not None:
+                built.append(self.objs[result["index"]], result)
+            if callback is not None:
+                callback(result)
+            for i in copies.get(result["index"], []):
+                _link(i)
+
+        self.runner = GridfinityJobRunner(**kwargs)
+        t0 = time.perf_counter()
+        self.runner.run([jobs[j] for j in order], callback=_done)
+        self.render_time += time.perf_counter() - t0
+        return results
+
+    def sub_solids(self):
+        """Returns the distinct sub-solids which are rendered through the
+        geometry cache by the valid objects in the batch as a list of
+        (stage, count, obj, key, render_fn, args) tuples, where count is the
+        number of objects which use the sub-solid and the other items are
+        those of GridfinityObject.sub_solids. The list is in stage order and
+        then in order of most used first."""
+        errors = self.validate()
+        found = {}
+        for i, obj in enumerate(self.objs):
+            if i in errors:
+                continue
+            used = set()
+            for stage, solids in enumerate(obj.sub_solids()):
+                for owner, key, render_fn, args in solids:
+                    hkey = geometry_key(*owner.cache_key(key))
+                    if hkey in used:
+                        continue
+                    used.add(hkey)
+                    if hkey not in found:
+                        found[hkey] = [stage, 0, owner, key, render_fn, args]
+                    found[hkey][1] += 1
+        return sorted((tuple(v) for v in found.values()), key=lambda v: (v[0], -v[1]))
+
+    def warm(self, cache, workers=None, callback=None):
+        """Renders every distinct sub-solid of the batch (see sub_solids) into
+        a DiskGeometryCache or SharedGeometryStore in parallel warm worker
+        processes, so that a later render of the batch, or of any other batch
+        which shares its sub-solids, finds them cached. Each stage is started
+        once the sub-solids of earlier stages which it contains are cached,
+        and the sub-solids used by the most objects are rendered first.
+        Sub-solids which are already in the cache are skipped. Returns a list
+        of result dictionaries with the kind and key of each rendered
+        sub-solid, the number of objects which use it, the job status, error
+        message, elapsed time and worker pid. callback(result) is called as
+        each sub-solid is rendered."""
+        pending = {}
+        for stage, count, obj, key, render_fn, args in self.sub_solids():
+            if geometry_key(*obj.cache_key(key)) not in cache:
+                pending.setdefault(stage, []).append((count, obj, key, render_fn, args))
+        results = []
+        if not pending:
+            return results
+        with ProcessPoolExecutor(workers, mp_context=warm_context()) as executor:
+            for stage in sorted(pending):
+                # jobs are started in the order they are submitted
+                futures = {}
+                for count, obj, key, fn, args in pending[stage]:
+                    future = executor.submit(_warm_sub_solid, cache, obj, key, fn, args)
+                    futures[future] = (count, obj.cache_key(key))
+                for future in as_completed(futures):
+                    count, key = futures[future]
+                    status, error, elapsed, pid = future.result()
+                    result = {
+                        "kind": key[0],
+                        "key": key,
+                        "count": count,
+                        "status": status,
+                        "error": error,
+                        "time": elapsed,
+                        "pid": pid,
+                    }
+                    results.append(result)
+                    if callback is not None:
+                        callback(result)
+        return results
+
+    @property
+    def stats(self):
+        """Returns a dictionary summarizing the batch render and the work
+        saved by sharing sub-solids between objects."""
+        stats = self.cache.stats
+        stats["objects"] = len(self.objs)
+        stats["batch_time"] = self.render_time
+        stats["tessellate_time"] = self.tessellate_time
+        stats["write_time"] = self.write_time
+        stats["linked"] = self.linked
+        return stats
+
+    def report(self):
+        """Returns a readable summary of the batch render."""
+        st = self.stats
+        s = []
+        s.append("Rendered %d objects in %.2f s" % (st["objects"], st["batch_time"]))
+        s.append(
+            "  %d distinct sub-solids, %d re-used (%d rendered)"
+            % (st["solids"], st["hits"], st["misses"])
+        )
+        s.append("  Estimated render time saved: %.2f s" % (st["saved_time"]))
+        if st["tessellate_time"] or st["write_time"]:
+            s.append(
+                "  Tessellated in %.2f s, written in %.2f s"
+                % (st["tessellate_time"], st["write_time"])
+            )
+        if st["linked"]:
+            s.append("  %d duplicate objects linked" % (st["linked"]))
+        for kind, ks in st["kinds"].items():
+            s.append(
+                "  %-10s: %3d rendered %3d re-used  %.2f s saved"
+                % (kind, ks["misses"], ks["hits"], ks["saved"])
+            )
+        return "\n".join(s)
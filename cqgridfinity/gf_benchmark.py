@@ -0,0 +1,211 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Gridfinity render benchmarks
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from cqgridfinity import (
+    __version__,
+    GridfinityBaseplate,
+    GridfinityBox,
+    GridfinityRuggedBox,
+)
+from cqgridfinity.gf_memory import peak_rss, release_memory, reset_peak_rss, rss
+from cqgridfinity.gf_obj import spec_params
+
+BASEPLATE_METHODS = {"pocketed": False, "lattice": True}
+
+# a representative suite of objects whose render and export times are used
+# to fit the render time cost model
+BENCHMARK_SUITE = [
+    (GridfinityBox, (1, 1, 3), {}),
+    (GridfinityBox, (2, 2, 3), {"holes": True}),
+    (GridfinityBox, (3, 2, 5), {"scoops": True, "labels": True}),
+    (GridfinityBox, (3, 3, 4), {"length_div": 2, "width_div": 1}),
+    (GridfinityBox, (4, 2, 3), {"lite_style": True, "length_div": 1}),
+    (GridfinityBox, (2, 3, 6), {"solid": True, "no_lip": True}),
+    (GridfinityBox, (4, 4, 3), {"holes": True, "unsupported_holes": True}),
+    (
+        GridfinityBox,
+        (5, 3, 4),
+        {"length_div": 4, "width_div": 2, "scoops": True, "labels": True},
+    ),
+    (GridfinityBox, (1, 2, 8), {"labels": True, "length_div": 1}),
+    (GridfinityBox, (6, 6, 3), {}),
+    (GridfinityBox, (2, 1, 3), {"holes": True, "unsupported_holes": True}),
+    (GridfinityBox, (2, 2, 10), {"scoops": True}),
+    (GridfinityBox, (3, 1, 2), {"lite_style": True}),
+    (GridfinityBox, (4, 3, 3), {"length_div": 3, "labels": True}),
+    (GridfinityBox, (1, 1, 6), {"solid": True, "solid_ratio": 0.5}),
+    (GridfinityBox, (5, 5, 6), {"holes": True, "scoops": True}),
+    (GridfinityBox, (3, 3, 3), {"width_div": 2, "holes": True}),
+    (GridfinityBox, (2, 4, 4), {"lite_style": True, "labels": True}),
+    (GridfinityBaseplate, (2, 2), {}),
+    (GridfinityBaseplate, (5, 4), {"corner_screws": True}),
+    (GridfinityBaseplate, (6, 6), {"lattice": True}),
+    (GridfinityBaseplate, (8, 5), {"ext_depth": 2, "straight_bottom": True}),
+    (GridfinityBaseplate, (10, 10), {"lattice": True, "corner_screws": True}),
+    (GridfinityBaseplate, (3, 3), {"lattice": True}),
+    (GridfinityBaseplate, (4, 6), {}),
+    (GridfinityBaseplate, (7, 7), {"ext_depth": 3}),
+    (GridfinityBaseplate, (12, 8), {"lattice": True}),
+    (GridfinityRuggedBox, (3, 3, 4), {}),
+    (GridfinityRuggedBox, (4, 3, 5), {"rib_style": True}),
+    (GridfinityRuggedBox, (5, 4, 6), {"inside_baseplate": False}),
+    (GridfinityRuggedBox, (4, 4, 4), {"side_clasps": False, "side_handles": False}),
+    (GridfinityRuggedBox, (6, 5, 8), {"rib_style": True, "side_clasps": False}),
+    (GridfinityRuggedBox, (3, 4, 5), {"inside_baseplate": False, "rib_style": True}),
+    (GridfinityRuggedBox, (7, 5, 4), {}),
+    (GridfinityRuggedBox, (5, 3, 10), {"side_clasps": False}),
+]
+
+
+def benchmark_suite():
+    """Returns a list of objects to benchmark from BENCHMARK_SUITE."""
+    return [cls(*size, **kwargs) for cls, size, kwargs in BENCHMARK_SUITE]
+
+
+def benchmark_baseplate(sizes=None, repeat=1, **kwargs):
+    """Times the rendering of square baseplates of each size in U using both
+    the pocketed slab and the lattice construction methods. The best time
+    of repeat renders is recorded for each method. Returns a list of
+    dictionaries with the size, render time and volume of each method."""
+    sizes = sizes if sizes is not None else range(1, 16)
+    results = []
+    for size in sizes:
+        result = {"size_u": (size, size)}
+        for method, lattice in BASEPLATE_METHODS.items():
+            times = []
+            for _ in range(repeat):
+                bp = GridfinityBaseplate(size, size, lattice=lattice, **kwargs)
+                t0 = time.perf_counter()
+                r = bp.render()
+                times.append(time.perf_counter() - t0)
+            result[method] = {"time": min(times), "volume": r.val().Volume()}
+        results.append(result)
+    return results
+
+
+def benchmark_objects(objs, repeat=1, export=True):
+    """Times the rendering and STL export of each object. The best time of
+    repeat renders and exports is recorded. Returns a list of timing records
+    with the object class, its parameters, the render and export times in
+    seconds and the peak memory in MB used above the memory in use before
+    the render, which can be saved to a benchmark history file."""
+    records = []
+    with tempfile.TemporaryDirectory() as path:
+        for obj in objs:
+            params = spec_params(obj)
+            render, export_time = [], []
+            release_memory()
+            reset_peak_rss()
+            base = rss()
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                obj._cq_obj = obj.render()
+                render.append(time.perf_counter() - t0)
+                if export:
+                    t0 = time.perf_counter()
+                    obj.save_stl_file(filename=os.path.join(path, "benchmark.stl"))
+                    export_time.append(time.perf_counter() - t0)
+            memory = peak_rss() - base
+            obj._cq_obj = None
+            records.append(
+                {
+                    "class": type(obj).__name__,
+                    "params": params,
+                    "render": min(render),
+                    "export": min(export_time) if export else None,
+                    "memory": round(memory, 1),
+                    "version": __version__,
+                    "timestamp": time.time(),
+                }
+            )
+    return records
+
+
+def save_history(records, filename):
+    """Appends timing records to a benchmark history file with one JSON
+    record per line."""
+    with open(filename, "a") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def load_history(filename):
+    """Returns the list of timing records in a benchmark history file."""
+    with open(filename) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare Gridfinity baseplate construction methods"
+    )
+    parser.add_argument(
+        "-m", "--max", type=int, default=15, help="Largest baseplate size in U"
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=1, help="Renders per size and method"
+    )
+    parser.add_argument(
+        "-s",
+        "--suite",
+        action="store_true",
+        default=False,
+        help="Time the render and export of the benchmark suite objects",
+    )
+    parser.add_argument(
+        "--history",
+        default=None,
+        help="Append the benchmark suite timings to this history file",
+    )
+    args = parser.parse_args()
+    if args.suite:
+        print("  Object                                        Render     Export")
+        records = benchmark_objects(benchmark_suite(), repeat=args.repeat)
+        for obj, record in zip(benchmark_suite(), records):
+            print(
+                "  %-42s %9.3fs %9.3fs"
+                % (obj.filename(), record["render"], record["export"])
+            )
+        if args.history is not None:
+            save_history(records, args.history)
+        return
+    print("  Size   Pocketed    Lattice   Speedup   Volume diff")
+    for res in benchmark_baseplate(range(1, args.max + 1), repeat=args.repeat):
+        tp, tl = res["pocketed"]["time"], res["lattice"]["time"]
+        vp, vl = res["pocketed"]["volume"], res["lattice"]["volume"]
+        print(
+            "%6s %9.3fs %9.3fs %8.1fx %12.3f%%"
+            % ("%dx%d" % res["size_u"], tp, tl, tp / tl, 100 * (vl - vp) / vp)
+        )
+
+
+if __name__ == "__main__":
+    main()
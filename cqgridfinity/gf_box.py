@@ -23,15 +23,33 @@
 #
 # Gridfinity Boxes
 
+from collections import OrderedDict
 import math
+import threading
 
 import cadquery as cq
 from cqkit import HasZCoordinateSelector, VerticalEdgeSelector, FlatEdgeSelector
 from cqkit.cq_helpers import rounded_rect_sketch, composite_from_pts
-from cqgridfinity import *
-
-
-class GridfinityBox(GridfinityObject):
+from cqgridfinity.constants import *
+from cqgridfinity.gf_cache import GeometryCache
+from cqgridfinity.gf_obj import GridfinityObject
+from cqgridfinity.gf_spec import GridfinityBoxDimensions
+from cqgridfinity.gf_pattern import GridPattern
+from cqgridfinity.gf_progress import monitored, render_stage
+from cqgridfinity.gf_csg import csg
+from cqgridfinity.gf_helpers import (
+    detach,
+    selector,
+    stretch_z,
+    rounded_rect_area,
+    rounded_rect_band_area,
+    profile_segments,
+    profile_integral,
+    profile_volume,
+)
+
+
+class GridfinityBox(GridfinityObject, GridfinityBoxDimensions):
     """Gridfinity Box
 
     This class represents a Gridfinity compatible box module. As a minimum,
@@ -62,9 +80,24 @@ class GridfinityBox(GridfinityObject):
     - scoop_rad : radius of the bottom scoop feature
     - wall_th : wall thickness
     - hole_diam : magnet/counterbore bolt hole diameter
+    - template : render the box by stretching a cached canonical bin with
+                 the same footprint and features rather than rendering
+                 every feature at this height. Boxes which cannot be made
+                 from a template (e.g. solid boxes) are rendered normally.
+    - fillet_free : make the interior by cutting compartments whose corners
+                    and floor edges are already rounded rather than filleting
+                    the merged box. Applies to boxes without scoops, labels,
+                    solid fill or lite style and is ignored otherwise.
 
     """
 
+    # canonical bins rendered as templates while no geometry cache is active,
+    # least recently used first
+    MAX_TEMPLATES = 16
+    _templates = OrderedDict()
+    _templates_lock = threading.Lock()
+    _rendering = {}
+
     def __init__(self, length_u, width_u, height_u, **kwargs):
         super().__init__()
         self.length_u = length_u
@@ -87,6 +120,8 @@ class GridfinityBox(GridfinityObject):
         self.fillet_interior = True
         self.wall_th = GR_WALL
         self.hole_diam = GR_HOLE_D  # magnet/bolt hole diameter
+        self.template = False
+        self.fillet_free = False
         for k, v in kwargs.items():
             if k in self.__dict__:
                 self.__dict__[k] = v
@@ -143,121 +178,299 @@ class GridfinityBox(GridfinityObject):
         s.append("  Auto filename: %s" % (self.filename()))
         return "\n".join(s)
 
+    @monitored
     def render(self):
-        """Returns a CadQuery Workplane object representing this Gridfinity box."""
-        self._int_shell = None
-        if self.lite_style:
-            # just force the dividers to the desired quantity in both dimensions
-            # rather than raise a exception
-            if self.length_div:
-                self.length_div = self.length_u - 1
-            if self.width_div:
-                self.width_div = self.width_u - 1
-            if self.solid:
-                raise ValueError(
-                    "Cannot select both solid and lite box styles together"
-                )
-            if self.holes:
-                raise ValueError(
-                    "Cannot select both holes and lite box styles together"
-                )
-            if self.wall_th > 1.5:
-                raise ValueError(
-                    "Wall thickness cannot exceed 1.5 mm for lite box style"
+        """Returns a CadQuery Workplane object representing this Gridfinity box.
+        Rendering does not change the box parameters, so that a box can be
+        rendered by several threads at once."""
+        box = self
+        divs = self.rendered_divs
+        if divs != (self.length_div, self.width_div):
+            # render a copy with the dividers forced to the quantity which
+            # lite style boxes support rather than modify this box
+            length_div, width_div = divs
+            d = dict(self.to_dict(), length_div=length_div, width_div=width_div)
+            box = GridfinityBox.from_dict(d)
+        box.check_valid()
+        r = detach(box._render())
+        # release the interior cutting solid shared by the render stages
+        box._int_shell = None
+        return r
+
+    def _render(self):
+        if self.template:
+            render_stage("template", 0.05)
+            r = self.render_from_template()
+            if r is not None:
+                return r
+        if self.fillet_free and self.can_render_fillet_free:
+            render_stage("compartments", 0.05)
+            r = self.render_rounded_interior()
+        else:
+            render_stage("shell", 0.05)
+            r = self.render_shell(lazy=True)
+            render_stage("dividers", 0.15)
+            rd = self.render_dividers()
+            render_stage("scoops", 0.2)
+            rs = self.render_scoops()
+            render_stage("labels", 0.25)
+            rl = self.render_labels()
+            render_stage("union", 0.3)
+            # the interior features are evaluated with the shell in one
+            # expression, since the fillets which follow need a solid
+            r = r.union(rd, rl, rs).evaluate()
+            if not self.solid and self.fillet_interior:
+                render_stage("fillets", 0.6)
+                heights = [GR_FLOOR]
+                if self.labels:
+                    heights.append(
+                        self.safe_label_height(backwall=True, from_bottom=True)
+                    )
+                    heights.append(
+                        self.safe_label_height(backwall=False, from_bottom=True)
+                    )
+                bs = (
+                    HasZCoordinateSelector(heights, min_points=1, tolerance=0.5)
+                    + VerticalEdgeSelector(">5")
+                    - HasZCoordinateSelector("<%.2f" % (self.floor_h))
                 )
-        if self.wall_th > 2.5:
-            raise ValueError("Wall thickness cannot exceed 2.5 mm")
-        if self.wall_th < 0.5:
-            raise ValueError("Wall thickness must be at least 0.5 mm")
-        r = self.render_shell()
-        rd = self.render_dividers()
-        rs = self.render_scoops()
-        rl = self.render_labels()
-        for e in (rd, rl, rs):
-            if e is not None:
-                r = r.union(e)
-        if not self.solid and self.fillet_interior:
-            heights = [GR_FLOOR]
-            if self.labels:
-                heights.append(self.safe_label_height(backwall=True, from_bottom=True))
-                heights.append(self.safe_label_height(backwall=False, from_bottom=True))
-            bs = (
-                HasZCoordinateSelector(heights, min_points=1, tolerance=0.5)
-                + VerticalEdgeSelector(">5")
-                - HasZCoordinateSelector("<%.2f" % (self.floor_h))
-            )
-            if self.lite_style and self.scoops:
-                bs = bs - HasZCoordinateSelector("<=%.2f" % (self.floor_h))
-                bs = bs - VerticalEdgeSelector()
-            r = self.safe_fillet(r, bs, self.safe_fillet_rad)
-
-            if self.lite_style and not self.has_dividers:
-                bs = FlatEdgeSelector(self.floor_h)
-                if self.wall_th < 1.2:
-                    r = self.safe_fillet(r, bs, 0.5)
-                elif self.wall_th < 1.25:
-                    r = self.safe_fillet(r, bs, 0.25)
-
-            if not self.labels and self.has_dividers:
-                bs = VerticalEdgeSelector(
-                    GR_TOPSIDE_H, tolerance=0.05
-                ) & HasZCoordinateSelector(GRHU * self.height_u - GR_BASE_HEIGHT)
-                r = self.safe_fillet(r, bs, GR_TOPSIDE_H - EPS)
+                if self.lite_style and self.scoops:
+                    bs = bs - HasZCoordinateSelector("<=%.2f" % (self.floor_h))
+                    bs = bs - VerticalEdgeSelector()
+                r = self.safe_fillet(r, bs, self.safe_fillet_rad)
+
+                if self.lite_style and not self.has_dividers:
+                    bs = FlatEdgeSelector(self.floor_h)
+                    if self.wall_th < 1.2:
+                        r = self.safe_fillet(r, bs, 0.5)
+                    elif self.wall_th < 1.25:
+                        r = self.safe_fillet(r, bs, 0.25)
+
+                if not self.labels and self.has_dividers:
+                    bs = VerticalEdgeSelector(
+                        GR_TOPSIDE_H, tolerance=0.05
+                    ) & HasZCoordinateSelector(GRHU * self.height_u - GR_BASE_HEIGHT)
+                    r = self.safe_fillet(r, bs, GR_TOPSIDE_H - EPS)
 
         if self.holes:
+            render_stage("holes", 0.8)
             r = self.render_holes(r)
         r = r.translate((-self.half_l, -self.half_w, GR_BASE_HEIGHT))
         if self.unsupported_holes:
+            render_stage("hole fillers", 0.9)
             r = self.render_hole_fillers(r)
         return r
 
-    @property
-    def top_ref_height(self):
-        """The height of the top surface of a solid box or the floor
-        height of an empty box."""
-        if self.solid:
-            return self.max_height * self.solid_ratio + GR_BOT_H
+    def canonical_params(self):
+        params = super().canonical_params()
+        unused = ["label_lip_height"]
         if self.lite_style:
-            return self.floor_h
-        return GR_BOT_H
+            params["length_div"] = float(self.rendered_divs[0])
+            params["width_div"] = float(self.rendered_divs[1])
+        if self.solid:
+            # solid boxes have no interior features
+            unused.extend(["length_div", "width_div", "scoops", "labels"])
+            unused.extend(["fillet_interior", "template"])
+        else:
+            unused.append("solid_ratio")
+        if not self.scoops or self.solid:
+            unused.append("scoop_rad")
+        if not self.labels or self.solid:
+            unused.extend(["label_width", "label_height"])
+        if not self.holes and not self.unsupported_holes:
+            unused.append("hole_diam")
+        if not self.can_render_fillet_free:
+            unused.append("fillet_free")
+        return {k: v for k, v in params.items() if k not in unused}
+
+    def render_rounded_interior(self):
+        """Renders the box with its interior cut by one cutter per compartment.
+        Each cutter has its vertical corners and floor edges rounded so that
+        the divided interior is filleted by construction. The cutters are
+        bounded by the interior profile and the top lip region is cut above
+        the dividing walls."""
+        rad = self.safe_fillet_rad
+        xs = self.compartment_spans(self.length_div, self.inner_l)
+        ys = self.compartment_spans(self.width_div, self.inner_w)
+        nx, ny = len(xs) - 1, len(ys) - 1
+        rcs = []
+        for i, (x0, x1) in enumerate(xs):
+            for j, (y0, y1) in enumerate(ys):
+                # compartments at the corners of the box follow the interior
+                # corner radius, all other corners are filleted
+                corners = {
+                    "<X and <Y": i == 0 and j == 0,
+                    ">X and <Y": i == nx and j == 0,
+                    "<X and >Y": i == 0 and j == ny,
+                    ">X and >Y": i == nx and j == ny,
+                }
+                rs = cq.Sketch().rect(x1 - x0, y1 - y0)
+                for sel, at_corner in corners.items():
+                    rs = rs.reset().vertices(selector(sel))
+                    rs = rs.fillet(self.inner_rad if at_corner else rad)
+                rc = cq.Workplane("XY").placeSketch(rs.reset()).extrude(self.max_height)
+                rc = rc.faces(selector("<Z")).edges().fillet(rad)
+                rc = rc.translate(((x0 + x1) / 2, (y0 + y1) / 2, self.floor_h))
+                rcs.append(rc.val())
+        rci = self.interior_solid.val()
+        rc = cq.Compound.makeCompound(rcs).intersect(rci)
+        bb = rci.BoundingBox()
+        zo = self.floor_h + self.max_height
+        rl = cq.Solid.makeBox(
+            bb.xlen + 2,
+            bb.ylen + 2,
+            bb.zmax - zo + 1,
+            cq.Vector(bb.xmin - 1, bb.ymin - 1, zo),
+        )
+        r = self.render_shell(as_solid=True).val().cut(rc, rci.intersect(rl)).clean()
+        return cq.Workplane("XY").newObject([r])
 
     @property
-    def bin_height(self):
-        return self.height - GR_BASE_HEIGHT
-
-    def safe_label_height(self, backwall=False, from_bottom=False):
-        lw = self.label_width
-        if backwall:
-            lw += self.lip_width
-        lh = self.label_height * (lw / self.label_width)
-        yl = self.max_height - self.label_height + self.wall_th
-        if backwall:
-            yl -= self.lip_width
-        if yl < 0:
-            lh = self.max_height - 1.5 * GR_FILLET - 0.1
-        elif yl < 1.5 * GR_FILLET:
-            lh -= 1.5 * GR_FILLET - yl + 0.1
-        if from_bottom:
-            ws = math.sin(math.atan2(self.label_height, self.label_width))
-            if backwall:
-                lh = self.max_height + GR_FLOOR - lh + ws * self.wall_th
-            else:
-                lh = self.max_height + GR_FLOOR - lh + ws * GR_DIV_WALL
-        return lh
+    def template_key(self):
+        """Attributes which identify the canonical bin used as a template."""
+        return (
+            self.length_u,
+            self.width_u,
+            tuple(
+                sorted(
+                    (k, v)
+                    for k, v in self.__dict__.items()
+                    if not k.startswith("_")
+                    and k not in ("length_u", "width_u", "height_u", "template")
+                )
+            ),
+        )
 
-    @property
-    def has_dividers(self):
-        return self.length_div > 0 or self.width_div > 0
+    def stretch_plane(self):
+        """Returns the height of a horizontal plane through the straight walled
+        section of the box between its floor and top features, or None if
+        the box cannot be stretched at this height."""
+        if self.solid:
+            return None
+        if self.scoops and self.int_height - 0.1 < self.scoop_rad:
+            return None
+        lo = GR_FLOOR + GR_FILLET + (self.scoop_rad if self.scoops else 0)
+        hi = self.floor_h + self.int_height + self.wall_th - GR_WALL
+        if self.labels:
+            yl = self.max_height - self.label_height + self.wall_th - self.lip_width
+            if yl < 1.5 * GR_FILLET:
+                return None
+            hi = min(
+                hi,
+                *[
+                    self.safe_label_height(backwall=b, from_bottom=True) - GR_FILLET
+                    for b in (True, False)
+                ],
+            )
+        elif self.has_dividers:
+            hi = min(hi, GRHU * self.height_u - GR_BASE_HEIGHT - GR_TOPSIDE_H)
+        # vertical edges crossing the plane must remain long enough to be
+        # selected for filleting in both the canonical and stretched boxes
+        if hi - lo < 7:
+            return None
+        return (lo + hi) / 2 + GR_BASE_HEIGHT
+
+    def template_height_u(self):
+        """Returns the lowest height in U of a canonical bin which can be
+        stretched to make this box, or None if there is no such height."""
+        _, _, attrs = self.template_key
+        for height_u in range(1, self.height_u + 1):
+            box = GridfinityBox(self.length_u, self.width_u, height_u, **dict(attrs))
+            if box.stretch_plane() is not None:
+                return height_u
+        return None
+
+    def render_from_template(self):
+        """Renders this box by stretching a canonical bin of the same footprint
+        and features. The canonical bin is rendered once and cached, in the
+        active geometry cache if there is one. It is split at a plane through
+        its straight walled section and a prism of the section is inserted to
+        make up the height. Returns None if this box cannot be made from a
+        template."""
+        height_u = self.template_height_u()
+        if height_u is None:
+            return None
+        box = self.template_box(height_u)
+        r = self._template(height_u)
+        if box.height_u == self.height_u:
+            return r
+        dz = GRHU * (self.height_u - box.height_u)
+        return stretch_z(r, box.stretch_plane(), dz)
+
+    def template_box(self, height_u):
+        """Returns the canonical bin of this box with a height of height_u."""
+        attrs = dict(self.template_key[2])
+        return GridfinityBox(self.length_u, self.width_u, height_u, **attrs)
+
+    def _template(self, height_u):
+        key = ("template", *self.template_key, height_u)
+        if GeometryCache.active() is not None:
+            return self.cached(key, self._render_template, height_u)
+        templates = GridfinityBox._templates
+        with GridfinityBox._templates_lock:
+            if key in templates:
+                templates.move_to_end(key)
+                return templates[key]
+            render_lock = GridfinityBox._rendering.setdefault(key, threading.Lock())
+        # only threads which need the same template wait for its render
+        with render_lock:
+            with GridfinityBox._templates_lock:
+                if key in templates:
+                    templates.move_to_end(key)
+                    return templates[key]
+            r = self._render_template(height_u)
+            with GridfinityBox._templates_lock:
+                templates[key] = r
+                while len(templates) > GridfinityBox.MAX_TEMPLATES:
+                    templates.popitem(last=False)
+                GridfinityBox._rendering.pop(key, None)
+        return r
+
+    def _render_template(self, height_u):
+        return self.template_box(height_u).render()
+
+    @classmethod
+    def clear_templates(cls):
+        """Removes the canonical bins kept for template boxes rendered while
+        no geometry cache is active."""
+        with cls._templates_lock:
+            cls._templates.clear()
 
     @property
     def interior_solid(self):
-        if self._int_shell is not None:
-            return self._int_shell
-        self._int_shell = self.render_interior()
-        return self._int_shell
+        # memoized with the inputs of the interior so that it follows changes
+        # to the box parameters. Threads which race to render it store equal
+        # solids.
+        key = self.interior_key()
+        memo = self._int_shell
+        if memo is None or memo[0] != key:
+            memo = self._int_shell = (key, self.render_interior())
+        return memo[1]
+
+    def interior_key(self, force_solid=False):
+        """Returns the inputs which determine the interior cutting solid."""
+        return (
+            "interior",
+            self.length_u,
+            self.width_u,
+            self.height_u,
+            self.wall_th,
+            self.no_lip,
+            self.lite_style,
+            self.solid,
+            self.solid_ratio,
+            self.scoops,
+            force_solid,
+        )
 
     def render_interior(self, force_solid=False):
         """Renders the interior cutting solid of the box."""
+        key = self.interior_key(force_solid)
+        return self.cached(key, self._render_interior, force_solid)
+
+    def interior_profile(self):
+        """Returns the extrusion profile of the interior cutting solid from
+        the floor to the top of the box."""
         wall_u = self.wall_th - GR_WALL
         wall_h = self.int_height + wall_u
         under_h = ((GR_UNDER_H - wall_u) * SQRT2, 45)
@@ -265,8 +478,12 @@ class GridfinityBox(GridfinityObject):
         profile = [wall_h, *profile]
         if self.int_height < 0:
             profile = [self.height - GR_BOT_H]
+        return profile
+
+    def _render_interior(self, force_solid=False):
         rci = self.extrude_profile(
-            rounded_rect_sketch(*self.inner_dim, self.inner_rad), profile
+            rounded_rect_sketch(*self.inner_dim, self.inner_rad),
+            self.interior_profile(),
         )
         rci = rci.translate((*self.half_dim, self.floor_h))
         if self.solid or force_solid:
@@ -284,17 +501,39 @@ class GridfinityBox(GridfinityObject):
             )
             rci = rci.cut(rf)
         if self.lite_style:
-            r = composite_from_pts(self.base_interior(), self.grid_centres)
-            rci = rci.union(r)
+            rci = GridPattern(self.base_interior(), self.grid_centres).union_with(rci)
         return rci
 
+    def sub_solids(self):
+        if self.template:
+            # boxes made from a template re-use the template and its sub-solids
+            height_u = self.template_height_u()
+            if height_u is not None:
+                stages = self.template_box(height_u).sub_solids()
+                key = ("template", *self.template_key, height_u)
+                stages.append([(self, key, self._render_template, (height_u,))])
+                return stages
+        stages = [
+            [
+                (self, ("foot", self.outer_rad), self._render_foot, ()),
+                (self, self.interior_key(), self._render_interior, ()),
+            ],
+            [(self, ("feet", self.length_u, self.width_u), self._render_feet, ())],
+            [(self, self.shell_key(), self._render_outer_shell, ())],
+        ]
+        if not (self.fillet_free and self.can_render_fillet_free):
+            stages[0].append((self, self.dividers_key(), self._render_dividers, ()))
+        return stages
+
     def solid_shell(self):
         """Returns a completely solid box object useful for intersecting with other solids."""
-        if self._ext_shell is not None:
-            return self._ext_shell
-        r = self.render_shell(as_solid=True)
-        self._ext_shell = r.cut(self.render_interior(force_solid=True))
-        return self._ext_shell
+        key = self.interior_key(force_solid=True)
+        memo = self._ext_shell
+        if memo is None or memo[0] != key:
+            r = self.render_shell(as_solid=True)
+            r = r.cut(self.render_interior(force_solid=True))
+            memo = self._ext_shell = (key, r)
+        return memo[1]
 
     def mask_with_obj(self, obj):
         """Intersects a solid object with this box."""
@@ -311,18 +550,44 @@ class GridfinityBox(GridfinityObject):
             rounded_rect_sketch(GRU - GR_TOL, GRU - GR_TOL, self.outer_rad),
             profile,
         )
-        rx = r.faces("<Z").shell(-self.wall_th)
+        rx = r.faces(selector("<Z")).shell(-self.wall_th)
         r = r.cut(rx).mirror(mirrorPlane="XY").translate((0, 0, zo))
         return r
 
-    def render_shell(self, as_solid=False):
-        """Renders the box shell without any added features."""
+    def render_shell(self, as_solid=False, lazy=False):
+        """Renders the box shell without any added features. Optionally, the
+        shell is returned as an unevaluated CSG expression so that further
+        boolean operations can be combined with it."""
+        rc = csg(self.cached(self.shell_key(), self._render_outer_shell))
+        if not as_solid:
+            rc = rc.cut(self.interior_solid)
+        return rc if lazy else rc.evaluate()
+
+    def shell_key(self):
+        """Returns the inputs which determine the outer shell."""
+        return ("shell", self.length_u, self.width_u, self.height_u)
+
+    def _render_foot(self):
         r = self.extrude_profile(
             rounded_rect_sketch(GRU, GRU, self.outer_rad + GR_BASE_CLR), GR_BOX_PROFILE
         )
         r = r.translate((0, 0, -GR_BASE_CLR))
-        r = r.mirror(mirrorPlane="XY")
+        return r.mirror(mirrorPlane="XY")
+
+    def _render_feet(self):
+        # a single foot is shared by boxes of every size
+        r = self.cached(("foot", self.outer_rad), self._render_foot)
         r = composite_from_pts(r, self.grid_centres)
+        rs = rounded_rect_sketch(*self.outer_dim, self.outer_rad)
+        rc = (
+            cq.Workplane("XY")
+            .placeSketch(rs)
+            .extrude(-GR_BASE_HEIGHT - 1)
+            .translate((*self.half_dim, 0.5))
+        )
+        return rc.intersect(r)
+
+    def _render_outer_shell(self):
         rs = rounded_rect_sketch(*self.outer_dim, self.outer_rad)
         rw = (
             cq.Workplane("XY")
@@ -330,18 +595,27 @@ class GridfinityBox(GridfinityObject):
             .extrude(self.bin_height - GR_BASE_CLR)
             .translate((*self.half_dim, GR_BASE_CLR))
         )
-        rc = (
-            cq.Workplane("XY")
-            .placeSketch(rs)
-            .extrude(-GR_BASE_HEIGHT - 1)
-            .translate((*self.half_dim, 0.5))
+        rf = self.cached(("feet", self.length_u, self.width_u), self._render_feet)
+        return rf.union(rw)
+
+    def dividers_key(self):
+        """Returns the inputs which determine the dividing walls."""
+        return (
+            "dividers",
+            self.length_u,
+            self.width_u,
+            self.height_u,
+            self.wall_th,
+            self.lite_style,
+            self.length_div,
+            self.width_div,
+            self.solid,
         )
-        rc = rc.intersect(r).union(rw)
-        if not as_solid:
-            return rc.cut(self.interior_solid)
-        return rc
 
     def render_dividers(self):
+        return self.cached(self.dividers_key(), self._render_dividers)
+
+    def _render_dividers(self):
         r = None
         if self.length_div > 0 and not self.solid:
             wall_w = (
@@ -382,7 +656,12 @@ class GridfinityBox(GridfinityObject):
         # front wall scoop
         # prevent the scoop radius exceeding the internal height
         srad = min(self.scoop_rad, self.int_height - 0.1)
-        rs = cq.Sketch().rect(srad, srad).vertices(">X and >Y").circle(srad, mode="s")
+        rs = (
+            cq.Sketch()
+            .rect(srad, srad)
+            .vertices(selector(">X and >Y"))
+            .circle(srad, mode="s")
+        )
         rsc = cq.Workplane("YZ").placeSketch(rs).extrude(self.inner_l)
         rsc = rsc.translate((0, 0, srad / 2 + GR_FLOOR))
         yo = -self.half_in + srad / 2
@@ -417,8 +696,8 @@ class GridfinityBox(GridfinityObject):
             .segment((0, -self.label_lip_height))
             .close()
             .assemble()
-            .vertices("<X")
-            .vertices("<Y")
+            .vertices(selector("<X"))
+            .vertices(selector("<Y"))
             .fillet(self.label_lip_height / 2)
         )
         rsc = cq.Workplane("YZ").placeSketch(rs).extrude(self.inner_l)
@@ -435,8 +714,8 @@ class GridfinityBox(GridfinityObject):
                 .segment((0, -self.label_lip_height))
                 .close()
                 .assemble()
-                .vertices("<X")
-                .vertices("<Y")
+                .vertices(selector("<X"))
+                .vertices(selector("<Y"))
                 .fillet(self.label_lip_height / 2)
             )
             rsc = cq.Workplane("YZ").placeSketch(rs).extrude(self.inner_l)
@@ -455,12 +734,12 @@ class GridfinityBox(GridfinityObject):
         h = GR_HOLE_H
         if self.unsupported_holes:
             h += GR_HOLE_SLICE
-        return (
-            obj.faces("<Z")
-            .workplane()
-            .pushPoints(self.hole_centres)
-            .cboreHole(GR_BOLT_D, self.hole_diam, h, depth=GR_BOLT_H)
-        )
+        # counterbored hole tool drilled upwards from the bottom face
+        zo = obj.findSolid().BoundingBox().zmin
+        rh = cq.Solid.makeCylinder(GR_BOLT_D / 2, GR_BOLT_H, cq.Vector(0, 0, zo))
+        rc = cq.Solid.makeCylinder(self.hole_diam / 2, h, cq.Vector(0, 0, zo))
+        pts = [(x, -y) for x, y in self.hole_centres]
+        return GridPattern(rh.fuse(rc), pts).cut_from(obj)
 
     def render_hole_fillers(self, obj):
         rc = (
@@ -470,8 +749,168 @@ class GridfinityBox(GridfinityObject):
         )
         xo = self.hole_diam / 2
         rs = composite_from_pts(rc, [(-xo, 0, GR_HOLE_H), (xo, 0, GR_HOLE_H)])
-        rs = composite_from_pts(rs, self.hole_centres)
-        return obj.union(rs.translate((-self.half_l, self.half_w, 0)))
+        pts = [(x - self.half_l, y + self.half_w) for x, y in self.hole_centres]
+        return GridPattern(rs, pts).union_with(obj)
+
+    def estimate(self, density=GR_DENSITY):
+        """Returns analytic estimates of the size, material volume, mass and
+        interior capacity of the box computed from its dimensions without
+        rendering it. The estimate is returned as a dictionary with:
+          size - overall length, width and height in mm
+          footprint - base area in mm^2
+          volume - material volume in mm^3
+          mass - mass in g for a material density in g/cm^3
+          capacity - volume of the empty interior in mm^3
+          compartments - list of compartment (length, width, depth) in mm
+        Volumes are typically within 1% of the rendered box."""
+        profile = self.interior_profile()
+        lite, solid = self.lite_style, self.solid
+        nl, nw = (0, 0) if solid else self.rendered_divs
+        strip = self.scoops and not self.no_lip and not lite
+        z0 = self.max_height * self.solid_ratio if solid else 0
+        zd = max(self.max_height, 0)
+
+        def _strip(t):
+            return max(self.under_h - t, 0) if strip else 0
+
+        # base feet and outer walls
+        clip = GR_TOL / 2
+        foot = profile_integral(
+            GR_BOX_PROFILE,
+            lambda z, t: rounded_rect_area(
+                GRU - 2 * max(t, clip), GRU - 2 * max(t, clip), GR_RAD - max(t, clip)
+            ),
+        )
+        seams = (self.length_u - 1) * self.outer_w + (self.width_u - 1) * self.outer_l
+        vol = self.length_u * self.width_u * foot + seams * clip * clip
+        vol += rounded_rect_area(*self.outer_dim, self.outer_rad) * (
+            self.bin_height - GR_BASE_CLR
+        )
+        # interior less any solid fill and the straight front wall for scoops
+        cavity = profile_volume(*self.inner_dim, self.inner_rad, profile, z0)
+        cavity -= profile_integral(
+            profile,
+            lambda z, t: rounded_rect_band_area(
+                self.inner_l - 2 * t, self.inner_rad - t, _strip(t)
+            ),
+            z0,
+            zd,
+        )
+        if lite:
+            cavity += self.length_u * self.width_u * self._lite_foot_volume()
+        # dividing walls
+        walls = GR_DIV_WALL * profile_integral(
+            profile,
+            lambda z, t: nl * (self.inner_w - 2 * t - _strip(t))
+            + nw * (self.inner_l - 2 * t)
+            - nl * nw * GR_DIV_WALL,
+            0,
+            zd,
+        )
+        # interior fillets, scoops and labels
+        extras = 0
+        xs = self.compartment_spans(nl, self.inner_l)
+        ys = self.compartment_spans(nw, self.inner_w)
+        row_l = sum(x1 - x0 for x0, x1 in xs)
+        if not solid and self.fillet_interior:
+            rad = self.safe_fillet_rad
+            edges = 2 * (nw + 1) * row_l + 2 * (nl + 1) * sum(y1 - y0 for y0, y1 in ys)
+            arc = (10 - 3 * math.pi) / (12 - 3 * math.pi) * rad
+            edges -= 4 * (2 - math.pi / 2) * self.inner_rad + 2 * math.pi * arc
+            if self.scoops:
+                edges -= (nw + 1) * row_l
+            if lite and self.scoops:
+                edges = 0
+            wall_h = profile_segments(profile)[0][1]
+            edges += 4 * (nl + nw) * wall_h + 4 * nl * nw * zd
+            extras += (1 - math.pi / 4) * rad * rad * edges
+        if self.scoops and not solid:
+            srad = min(self.scoop_rad, self.int_height - 0.1)
+            extras += (1 - math.pi / 4) * srad * srad * row_l * (nw + 1)
+        if self.labels and not solid:
+            extras += self._label_volume(profile, nl, nw)
+        if self.holes:
+            h = GR_HOLE_H + (GR_HOLE_SLICE if self.unsupported_holes else 0)
+            rh, rb = self.hole_diam / 2, GR_BOLT_D / 2
+            hole = math.pi * (rh * rh * h + rb * rb * (GR_BOLT_H - h))
+            if self.unsupported_holes:
+                seg = rh * rh * (math.pi / 3 - math.sqrt(3) / 4)
+                hole -= 2 * GR_HOLE_SLICE * seg
+            vol -= len(self.hole_centres) * hole
+        vol = vol - cavity + walls + extras
+        capacity = cavity - walls - extras
+        depth = self.bin_height - self.floor_h
+        return {
+            "size": (self.outer_l, self.outer_w, self.height),
+            "footprint": rounded_rect_area(*self.outer_dim, self.outer_rad),
+            "volume": vol,
+            "mass": vol * density / 1000,
+            "capacity": capacity,
+            "compartments": (
+                []
+                if solid
+                else [(x1 - x0, y1 - y0, depth) for x0, x1 in xs for y0, y1 in ys]
+            ),
+        }
+
+    def _label_volume(self, profile, nl, nw):
+        """Volume of the label flanges inside the box interior."""
+        top = self.max_height
+        lip = self.label_lip_height
+        length = lambda t: self.inner_l - 2 * t - nl * GR_DIV_WALL
+
+        def _flange(lw, lh, s_max, wall):
+            # integrate the flange cross section across its width s from its
+            # lip (s=0) to its thick end (s=lw) at each height z below the top
+            def _area(z, t):
+                s0 = (top - z - lip) * lw / (lh - lip) if lh > lip else 0
+                s1 = min(s_max, lw - wall - t) if wall is not None else s_max
+                return max(min(s1, lw) - max(s0, 0), 0) * length(t)
+
+            return profile_integral(profile, _area, top - max(lh, lip), top, 16)
+
+        lw = self.label_width + self.lip_width
+        lh = self.safe_label_height(backwall=True)
+        vol = _flange(lw, lh, lw, 1.25 * self.wall_th)
+        if nw:
+            lh = self.safe_label_height(backwall=False)
+            lw = self.label_width
+            vol += nw * _flange(lw, lh, lw - GR_DIV_WALL, None)
+        return vol
+
+    def _lite_foot_volume(self):
+        """Volume of the hollow inside one foot of a lite style box below its
+        floor. The hollow is the foot shape offset inwards by the wall
+        thickness."""
+        profile = [GR_BASE_HEIGHT, *GR_BOX_PROFILE]
+        segs = profile_segments(profile)
+        zo = GR_BASE_HEIGHT + GR_BASE_CLR
+        pts = [(segs[-1][3], zo - segs[-1][1])]
+        pts.extend((t0, zo - z0) for z0, _, t0, _ in reversed(segs))
+        d = self.wall_th
+
+        def _inset(z):
+            u = -d
+            for (t0, z0), (t1, z1) in zip(pts, pts[1:]):
+                ln = math.hypot(t1 - t0, z1 - z0)
+                nt, nz = (z1 - z0) / ln, (t0 - t1) / ln
+                a, b = z0 + d * nz, z1 + d * nz
+                if a <= z <= b:
+                    u = max(u, t0 + d * nt + (t1 - t0) * (z - a) / (b - a))
+            for t, ze in pts:
+                if abs(z - ze) < d:
+                    u = max(u, t + math.sqrt(d * d - (z - ze) ** 2))
+            return u
+
+        def _area(z, t):
+            u = _inset(z)
+            size = GRU - GR_TOL - 2 * u
+            return rounded_rect_area(size, size, self.outer_rad - u)
+
+        zb = pts[0][1] + d
+        return profile_integral(
+            [self.floor_h - zb], lambda z, t: _area(z + zb, t), steps=24
+        )
 
 
 class GridfinitySolidBox(GridfinityBox):
@@ -0,0 +1,175 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Gridfinity intermediate geometry cache
+
+from contextvars import ContextVar
+import hashlib
+import threading
+import time
+
+_active_cache = ContextVar("gf_active_cache", default=None)
+
+
+def geometry_key(*parts):
+    """Returns a deterministic hash key for a sequence of geometry inputs."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+class GeometryCache:
+    """Gridfinity intermediate geometry cache
+
+    This class stores intermediate sub-solids (e.g. box shells, interiors
+    and dividing walls) keyed by a hash of the inputs which determine their
+    geometry. A cache is only consulted while it is active, i.e. inside a
+    `with cache:` block, so that normal rendering is unaffected. The cache
+    keeps count of hits and misses and the render time which was saved by
+    re-using each kind of sub-solid. A cache can be shared by several
+    threads, each of which activates it with its own `with cache:` block.
+    Each sub-solid is rendered once, and threads which need a sub-solid
+    which is being rendered by another thread wait for it.
+      shared - optional SharedGeometryStore or DiskGeometryCache which is
+        consulted for the sub-solids which are not in this cache, and to
+        which rendered sub-solids are added, so that they are shared with
+        other processes or later runs. Sub-solids found in the shared store
+        are counted as shared hits.
+    """
+
+    def __init__(self, shared=None):
+        self.solids = {}
+        self.shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.render_time = 0.0
+        self.saved_time = 0.0
+        self.kinds = {}
+        self._times = {}
+        self._lock = threading.Lock()
+        self._rendering = {}
+        self._local = threading.local()
+
+    def __len__(self):
+        return len(self.solids)
+
+    def __enter__(self):
+        if not hasattr(self._local, "tokens"):
+            self._local.tokens = []
+        self._local.tokens.append(_active_cache.set(self))
+        return self
+
+    def __exit__(self, *args):
+        _active_cache.reset(self._local.tokens.pop())
+
+    @staticmethod
+    def active():
+        """Returns the currently active cache or None."""
+        return _active_cache.get()
+
+    def get_or_render(self, key, render_fn, *args):
+        """Returns the cached sub-solid for key = (kind, *inputs) or renders
+        it with render_fn(*args) and stores it."""
+        kind = key[0]
+        hkey = geometry_key(*key)
+        with self._lock:
+            r = self._hit(kind, hkey)
+            if r is not None:
+                return r
+            render_lock = self._rendering.setdefault(hkey, threading.Lock())
+        with render_lock:
+            with self._lock:
+                # another thread may have rendered it while this one waited
+                r = self._hit(kind, hkey)
+                if r is not None:
+                    return r
+            found = self.shared.get(hkey) if self.shared is not None else None
+            if found is not None:
+                r, dt = found
+                with self._lock:
+                    self.shared_hits += 1
+                    self.saved_time += dt
+                    stats = self._kind_stats(kind)
+                    stats["shared"] += 1
+                    stats["saved"] += dt
+                    self._store(hkey, r, dt)
+                return r
+            depth = getattr(self._local, "depth", 0)
+            t0 = time.perf_counter()
+            self._local.depth = depth + 1
+            try:
+                r = render_fn(*args)
+            finally:
+                self._local.depth = depth
+            dt = time.perf_counter() - t0
+            if self.shared is not None:
+                self.shared.put(hkey, r, dt, key)
+            with self._lock:
+                self.misses += 1
+                if not depth:
+                    # nested sub-solids are already included in the outer
+                    # render time
+                    self.render_time += dt
+                stats = self._kind_stats(kind)
+                stats["misses"] += 1
+                self._store(hkey, r, dt)
+        return r
+
+    def _store(self, hkey, r, dt):
+        # with the lock held
+        self.solids[hkey] = r
+        self._times[hkey] = dt
+        self._rendering.pop(hkey, None)
+
+    def _kind_stats(self, kind):
+        return self.kinds.setdefault(
+            kind, {"hits": 0, "shared": 0, "misses": 0, "saved": 0.0}
+        )
+
+    def _hit(self, kind, hkey):
+        # returns a cached sub-solid and counts the hit, with the lock held
+        if hkey not in self.solids:
+            return None
+        stats = self._kind_stats(kind)
+        self.hits += 1
+        self.saved_time += self._times[hkey]
+        stats["hits"] += 1
+        stats["saved"] += self._times[hkey]
+        return self.solids[hkey]
+
+    def clear(self):
+        with self._lock:
+            self.solids = {}
+            self._times = {}
+
+    @property
+    def stats(self):
+        """Returns a dictionary summarizing cache usage."""
+        return {
+            "solids": len(self.solids),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "render_time": self.render_time,
+            "saved_time": self.saved_time,
+            "kinds": {k: dict(v) for k, v in self.kinds.items()},
+        }
@@ -0,0 +1,299 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Gridfinity render time cost model
+
+import heapq
+import json
+import math
+
+import numpy as np
+
+import cqgridfinity
+
+
+def _log_cells(obj):
+    return math.log(obj.length_u * obj.width_u)
+
+
+def _log_height(obj):
+    return math.log(obj.height_u)
+
+
+def _log_compartments(obj):
+    ld, wd = obj.rendered_divs
+    return math.log((ld + 1) * (wd + 1))
+
+
+def _log_holes(obj):
+    holes = 4 * obj.length_u * obj.width_u if obj.holes else 0
+    return math.log(1 + holes)
+
+
+def _flag(attr):
+    return lambda obj: float(bool(getattr(obj, attr)))
+
+
+# the features which determine the render time of each object class
+COST_FEATURES = {
+    "GridfinityBox": [
+        ("cells", _log_cells),
+        ("height", _log_height),
+        ("compartments", _log_compartments),
+        ("holes", _log_holes),
+        ("scoops", _flag("scoops")),
+        ("labels", _flag("labels")),
+        ("lite_style", _flag("lite_style")),
+        ("solid", _flag("solid")),
+        ("unsupported_holes", _flag("unsupported_holes")),
+    ],
+    "GridfinityBaseplate": [
+        ("cells", _log_cells),
+        ("ext_depth", _flag("ext_depth")),
+        ("corner_screws", _flag("corner_screws")),
+        ("lattice", _flag("lattice")),
+    ],
+    "GridfinityRuggedBox": [
+        ("cells", _log_cells),
+        ("height", _log_height),
+        ("rib_style", _flag("rib_style")),
+        ("side_clasps", _flag("side_clasps")),
+        ("inside_baseplate", _flag("inside_baseplate")),
+    ],
+}
+
+# cost model coefficients fitted from the benchmark suite on a reference
+# machine. Times on other machines differ by a roughly constant factor.
+# Memory is the peak resident memory in MB used above that of an idle
+# worker process.
+DEFAULT_COSTS = {
+    "GridfinityBox": {
+        "render": {
+            "coef": [
+                -0.0629,
+                0.5752,
+                -0.0902,
+                0.2096,
+                -0.0087,
+                0.1364,
+                -0.051,
+                0.6795,
+                -1.0853,
+                0.2404,
+            ],
+            "error": 0.2702,
+            "samples": 28,
+        },
+        "export": {
+            "coef": [
+                -1.6908,
+                0.5293,
+                -0.2476,
+                0.1913,
+                0.1915,
+                0.2324,
+                0.379,
+                0.5844,
+                -0.6019,
+                0.2591,
+            ],
+            "error": 0.1718,
+            "samples": 28,
+        },
+        "memory": {
+            "coef": [
+                1.7296,
+                0.4387,
+                0.274,
+                0.0652,
+                0.0278,
+                -0.0694,
+                0.1471,
+                0.7911,
+                -0.9073,
+                0.527,
+            ],
+            "error": 0.2011,
+            "samples": 18,
+        },
+    },
+    "GridfinityBaseplate": {
+        "render": {
+            "coef": [-2.3712, 0.8304, 0.3288, 1.5172, -1.4286],
+            "error": 0.3902,
+            "samples": 14,
+        },
+        "export": {
+            "coef": [-3.8922, 1.0901, -0.1678, 0.3407, 0.2599],
+            "error": 0.197,
+            "samples": 14,
+        },
+        "memory": {
+            "coef": [0.5194, 1.0818, -0.1569, 0.256, -0.4059],
+            "error": 0.091,
+            "samples": 9,
+        },
+    },
+    "GridfinityRuggedBox": {
+        "render": {
+            "coef": [0.6531, 0.1115, 0.3733, 0.1828, 0.5212, 0.5076],
+            "error": 0.0904,
+            "samples": 13,
+        },
+        "export": {
+            "coef": [-2.033, 0.4576, 0.1241, 0.179, 0.3146, 0.9119],
+            "error": 0.2001,
+            "samples": 13,
+        },
+        "memory": {
+            "coef": [3.0407, 0.2806, 0.0332, 0.0358, 0.238, 0.2931],
+            "error": 0.0279,
+            "samples": 8,
+        },
+    },
+}
+
+COST_STAGES = ["render", "export", "memory"]
+
+
+class GridfinityCostModel:
+    """Gridfinity render time cost model
+
+    This class predicts the render and STL export time of Gridfinity objects
+    from their parameters without rendering them. Times are modelled as
+      log(time) = c0 + c1 * f1 + c2 * f2 + ...
+    where the features f are the log of the number of grid cells, height,
+    compartments and holes and the flags of the features which add geometry.
+    Each object class has its own coefficients which are fitted by least
+    squares from benchmark timing records (see gf_benchmark).
+    The peak memory used to render and export an object is modelled in the
+    same way as the "memory" stage.
+    The predictions are intended for scheduling batches of objects, e.g.
+    longest job first packing onto parallel workers, estimating their
+    completion time and keeping parallel jobs within a memory budget.
+      costs - dictionary of fitted coefficients by class name and stage
+      scale - factor applied to every predicted time
+    """
+
+    def __init__(self, costs=None, scale=1.0):
+        self.costs = costs if costs is not None else DEFAULT_COSTS
+        self.scale = scale
+
+    @staticmethod
+    def cost_class(obj):
+        """Returns the name of the modelled class of an object."""
+        for cls in type(obj).__mro__:
+            if cls.__name__ in COST_FEATURES:
+                return cls.__name__
+        raise ValueError("No cost model for %s objects" % (type(obj).__name__))
+
+    @staticmethod
+    def features(obj):
+        """Returns the cost model feature vector of an object."""
+        fns = COST_FEATURES[GridfinityCostModel.cost_class(obj)]
+        return np.array([1.0] + [fn(obj) for _, fn in fns])
+
+    @classmethod
+    def fit(cls, records):
+        """Returns a cost model fitted from a list of benchmark timing records.
+        Coefficients of features which do not vary in the records are left at
+        zero."""
+        rows = {}
+        for record in records:
+            obj = getattr(cqgridfinity, record["class"])(**record["params"])
+            name = cls.cost_class(obj)
+            rows.setdefault(name, []).append((cls.features(obj), record))
+        costs = {}
+        for name, samples in rows.items():
+            costs[name] = {}
+            for stage in COST_STAGES:
+                xy = [(x, r[stage]) for x, r in samples if r.get(stage)]
+                if not xy:
+                    continue
+                x = np.array([x for x, _ in xy])
+                y = np.log([t for _, t in xy])
+                # centre the features so that constant features only add to
+                # the intercept
+                mean = x[:, 1:].mean(axis=0)
+                x[:, 1:] -= mean
+                coef = np.linalg.lstsq(x, y, rcond=None)[0]
+                err = np.sqrt(np.mean((x @ coef - y) ** 2))
+                coef[0] -= coef[1:] @ mean
+                costs[name][stage] = {
+                    "coef": [round(float(c), 4) for c in coef],
+                    "error": round(float(err), 4),
+                    "samples": len(xy),
+                }
+        return cls(costs)
+
+    @classmethod
+    def from_history(cls, filename):
+        """Returns a cost model fitted from a benchmark history file."""
+        from cqgridfinity.gf_benchmark import load_history
+
+        return cls.fit(load_history(filename))
+
+    def to_json(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.costs, f, indent=2)
+
+    @classmethod
+    def from_json(cls, filename):
+        with open(filename) as f:
+            return cls(json.load(f))
+
+    def predict(self, obj, stage="render"):
+        """Returns the predicted time in seconds of a stage ("render" or
+        "export") for an object, or its predicted peak memory in MB for
+        the "memory" stage."""
+        name = self.cost_class(obj)
+        if name not in self.costs or stage not in self.costs[name]:
+            raise ValueError("No %s cost model for %s objects" % (stage, name))
+        coef = np.array(self.costs[name][stage]["coef"])
+        value = math.exp(coef @ self.features(obj))
+        return value if stage == "memory" else self.scale * value
+
+    def total(self, obj, export=True):
+        """Returns the predicted render and optional export time of an object."""
+        t = self.predict(obj, "render")
+        if export:
+            t += self.predict(obj, "export")
+        return t
+
+    def schedule(self, objs, workers=1, export=True):
+        """Assigns objects to parallel workers longest job first, each to the
+        worker which becomes free soonest. Returns a list of the object
+        indices assigned to each worker in order and a list of the predicted
+        completion time of each worker."""
+        times = [self.total(obj, export=export) for obj in objs]
+        order = sorted(range(len(objs)), key=lambda i: times[i], reverse=True)
+        jobs = [[] for _ in range(workers)]
+        loads = [(0.0, w) for w in range(workers)]
+        for i in order:
+            load, w = heapq.heappop(loads)
+            jobs[w].append(i)
+            heapq.heappush(loads, (load + times[i], w))
+        completion = [0.0] * workers
+        for load, w in loads:
+            completion[w] = load
+        return jobs, completion
@@ -0,0 +1,255 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Lazily evaluated CSG expressions
+
+import cadquery as cq
+
+BBOX_TOL = 1e-3
+
+
+def csg(obj):
+    """Wraps a CadQuery Workplane or Shape as a lazily evaluated CSG expression."""
+    if isinstance(obj, CSGNode):
+        return obj
+    return CSGShape(obj)
+
+
+def _bbox_overlap(a, b):
+    if a is None or b is None:
+        return False
+    return all(
+        a[i] <= b[i + 3] + BBOX_TOL and b[i] <= a[i + 3] + BBOX_TOL for i in range(3)
+    )
+
+
+class CSGNode:
+    """Lazily evaluated CSG expression
+
+    Boolean operations on a CSG expression are recorded rather than evaluated.
+    When the expression is evaluated, it is first optimized so that:
+      - nested unions are flattened into a single n-ary fuse
+      - consecutive cuts are merged into a single n-ary cut
+      - cut tools which cannot overlap the cut object (by bounding box) are
+        dropped
+      - cut tools which can only overlap one operand of a union are applied
+        to that operand alone, keeping intermediate solids small
+    and then each remaining operation is performed with a single OCCT boolean.
+    """
+
+    def __init__(self):
+        self._bbox = None
+
+    def union(self, *others):
+        """Records the union of this expression with others (None is ignored)."""
+        others = [csg(e) for e in others if e is not None]
+        if not others:
+            return self
+        return CSGUnion([self, *others])
+
+    def cut(self, *tools):
+        """Records the subtraction of tools from this expression."""
+        tools = [csg(e) for e in tools if e is not None]
+        if not tools:
+            return self
+        return CSGCut(self, tools)
+
+    def intersect(self, *others):
+        """Records the intersection of this expression with others."""
+        others = [csg(e) for e in others if e is not None]
+        if not others:
+            return self
+        return CSGIntersect([self, *others])
+
+    @property
+    def bbox(self):
+        """Conservative bounding box (xmin, ymin, zmin, xmax, ymax, zmax) of the
+        expression or None if the expression is known to be empty."""
+        if self._bbox is None:
+            self._bbox = self._compute_bbox()
+        return self._bbox
+
+    def overlaps(self, other):
+        return _bbox_overlap(self.bbox, other.bbox)
+
+    @property
+    def op_count(self):
+        """Number of boolean operations needed to evaluate the expression."""
+        return 0
+
+    def optimized(self):
+        """Returns an equivalent expression which needs fewer and smaller
+        boolean operations to evaluate."""
+        return self
+
+    def evaluate(self, optimize=True, clean=True):
+        """Evaluates the expression and returns a CadQuery Workplane."""
+        node = self.optimized() if optimize else self
+        return cq.Workplane("XY").newObject([node.shape(clean=clean)])
+
+
+class CSGShape(CSGNode):
+    """A CadQuery Workplane or Shape leaf of a CSG expression"""
+
+    def __init__(self, obj):
+        super().__init__()
+        self.obj = obj
+
+    def shape(self, clean=True):
+        if isinstance(self.obj, cq.Workplane):
+            shapes = [s for s in self.obj.vals() if isinstance(s, cq.Shape)]
+            if len(shapes) == 1:
+                return shapes[0]
+            return cq.Compound.makeCompound(shapes)
+        return self.obj
+
+    def _compute_bbox(self):
+        bb = self.shape().BoundingBox()
+        return (bb.xmin, bb.ymin, bb.zmin, bb.xmax, bb.ymax, bb.zmax)
+
+
+class CSGUnion(CSGNode):
+    """Union of two or more CSG expressions"""
+
+    def __init__(self, children):
+        super().__init__()
+        self.children = children
+
+    @property
+    def op_count(self):
+        return 1 + sum(e.op_count for e in self.children)
+
+    def _compute_bbox(self):
+        bbs = [e.bbox for e in self.children if e.bbox is not None]
+        if not bbs:
+            return None
+        return (*(min(bb[i] for bb in bbs) for i in range(3)),) + (
+            *(max(bb[i] for bb in bbs) for i in range(3, 6)),
+        )
+
+    def optimized(self):
+        children = []
+        for e in self.children:
+            e = e.optimized()
+            children.extend(e.children if isinstance(e, CSGUnion) else [e])
+        if len(children) == 1:
+            return children[0]
+        return CSGUnion(children)
+
+    def shape(self, clean=True):
+        shapes = [e.shape(clean=clean) for e in self.children]
+        r = shapes[0].fuse(*shapes[1:])
+        return r.clean() if clean else r
+
+
+class CSGCut(CSGNode):
+    """Subtraction of one or more tool expressions from a base expression"""
+
+    def __init__(self, base, tools):
+        super().__init__()
+        self.base = base
+        self.tools = tools
+
+    @property
+    def op_count(self):
+        return 1 + self.base.op_count + sum(e.op_count for e in self.tools)
+
+    def _compute_bbox(self):
+        return self.base.bbox
+
+    def optimized(self):
+        base = self.base.optimized()
+        tools = []
+        if isinstance(base, CSGCut):
+            base, tools = base.base, list(base.tools)
+        for e in self.tools:
+            e = e.optimized()
+            tools.extend(e.children if isinstance(e, CSGUnion) else [e])
+        tools = [e for e in tools if base.overlaps(e)]
+        if not tools:
+            return base
+        if isinstance(base, CSGUnion):
+            # apply tools which only overlap one operand of a union to that
+            # operand alone since (A + B) - T = (A - T) + B if B and T are disjoint
+            child_tools = [[] for _ in base.children]
+            shared = []
+            for tool in tools:
+                idx = [i for i, e in enumerate(base.children) if e.overlaps(tool)]
+                if len(idx) == 1:
+                    child_tools[idx[0]].append(tool)
+                elif len(idx) > 1:
+                    shared.append(tool)
+            children = [
+                CSGCut(e, t).optimized() if t else e
+                for e, t in zip(base.children, child_tools)
+            ]
+            base = CSGUnion(children)
+            if not shared:
+                return base
+            tools = shared
+        return CSGCut(base, tools)
+
+    def shape(self, clean=True):
+        r = self.base.shape(clean=clean).cut(
+            *[e.shape(clean=clean) for e in self.tools]
+        )
+        return r.clean() if clean else r
+
+
+class CSGIntersect(CSGNode):
+    """Intersection of two or more CSG expressions"""
+
+    def __init__(self, children):
+        super().__init__()
+        self.children = children
+
+    @property
+    def op_count(self):
+        return len(self.children) - 1 + sum(e.op_count for e in self.children)
+
+    def _compute_bbox(self):
+        bbs = [e.bbox for e in self.children]
+        if any(bb is None for bb in bbs):
+            return None
+        bb = (*(max(bb[i] for bb in bbs) for i in range(3)),) + (
+            *(min(bb[i] for bb in bbs) for i in range(3, 6)),
+        )
+        if any(bb[i] > bb[i + 3] + BBOX_TOL for i in range(3)):
+            return None
+        return bb
+
+    def optimized(self):
+        children = []
+        for e in self.children:
+            e = e.optimized()
+            children.extend(e.children if isinstance(e, CSGIntersect) else [e])
+        if len(children) == 1:
+            return children[0]
+        return CSGIntersect(children)
+
+    def shape(self, clean=True):
+        r = self.children[0].shape(clean=clean)
+        for e in self.children[1:]:
+            r = r.intersect(e.shape(clean=clean))
+            r = r.clean() if clean else r
+        return r
@@ -0,0 +1,319 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Gridfinity on-disk geometry cache
+
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+
+import cadquery as cq
+
+import cqgridfinity
+
+# default size limit of the cache in MB
+DEFAULT_CACHE_SIZE = 2048
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS solids (
+    key TEXT PRIMARY KEY,
+    kind TEXT,
+    spec TEXT,
+    version TEXT,
+    size INTEGER,
+    render_time REAL,
+    created REAL,
+    last_access REAL,
+    hits INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS solids_last_access ON solids (last_access);
+CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY, size INTEGER);
+CREATE TRIGGER IF NOT EXISTS solids_insert AFTER INSERT ON solids BEGIN
+    UPDATE totals SET size = size + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS solids_delete AFTER DELETE ON solids BEGIN
+    UPDATE totals SET size = size - old.size;
+END;
+CREATE TRIGGER IF NOT EXISTS solids_update AFTER UPDATE OF size ON solids BEGIN
+    UPDATE totals SET size = size + new.size - old.size;
+END;
+INSERT OR IGNORE INTO totals (id, size) SELECT 0, COALESCE(SUM(size), 0) FROM solids;
+"""
+
+
+def default_cache_dir():
+    """Returns the default geometry cache directory, which is set by the
+    GRIDFINITY_CACHE environment variable or is cqgridfinity in the user
+    cache directory."""
+    path = os.environ.get("GRIDFINITY_CACHE")
+    if path:
+        return path
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "cqgridfinity")
+
+
+class DiskGeometryCache:
+    """Gridfinity on-disk geometry cache
+
+    This class stores rendered sub-solids as serialized BREP blob files which
+    persist between runs and are indexed in a SQLite database. The index
+    records the key, kind and inputs (as JSON) of each sub-solid, the
+    cq-gridfinity version which rendered it, its size in bytes, the time it
+    took to render, its last access time and its number of hits. It has the
+    same interface as a SharedGeometryStore, so that it can be the shared
+    store of a GeometryCache or the shared_cache of a GridfinityJobRunner,
+    e.g.
+      with GeometryCache(shared=DiskGeometryCache()):
+          box.render()
+    Blobs are written to a unique temporary file, synced and renamed into
+    place before they are added to the index, so a cache can be used by
+    several processes of one host at once. The index relies on the file
+    locking of SQLite, which network file systems do not provide reliably,
+    so the cache directory must be on a local file system. The total size
+    of the sub-solids is kept up to date in the index as they are added and
+    removed. Sub-solids rendered by other versions are never returned, and
+    the least recently used sub-solids are evicted when the cache exceeds
+    its size limit.
+      path - cache directory (default is default_cache_dir())
+      max_size - size limit of the cache in MB
+    """
+
+    def __init__(self, path=None, max_size=DEFAULT_CACHE_SIZE):
+        self.path = path if path is not None else default_cache_dir()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(os.path.join(self.path, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = None
+        self._pid = None
+
+    def __getstate__(self):
+        return {"path": self.path, "max_size": self.max_size}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["max_size"])
+
+    def __len__(self):
+        return self._query("SELECT COUNT(*) FROM solids")[0][0]
+
+    def __contains__(self, key):
+        rows = self._query(
+            "SELECT 1 FROM solids WHERE key = ? AND version = ?",
+            (key, cqgridfinity.__version__),
+        )
+        return bool(rows) and os.path.isfile(self._filename(key))
+
+    def __str__(self):
+        return "Geometry cache in %s with %d solids (%.1f MB)" % (
+            self.path,
+            len(self),
+            self.size,
+        )
+
+    def _connect(self):
+        # connections cannot be shared with forked processes
+        if self._db is None or self._pid != os.getpid():
+            db = sqlite3.connect(
+                os.path.join(self.path, "index.sqlite"),
+                timeout=60,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            # sub-solids replaced by INSERT OR REPLACE update the total size
+            db.execute("PRAGMA recursive_triggers = ON")
+            db.executescript(_SCHEMA)
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._connect().execute(sql, args).fetchall()
+
+    def _filename(self, key):
+        return os.path.join(self.path, "blobs", key[:2], key + ".brep")
+
+    @property
+    def size(self):
+        """The total size of the cached sub-solids in MB."""
+        size = self._query("SELECT size FROM totals")[0][0]
+        return size / 2**20
+
+    def get(self, key):
+        """Returns a tuple of the sub-solid cached with a key (which may be
+        None) and the time it took to render, or None if it is not cached
+        or was rendered by another version."""
+        rows = self._query(
+            "SELECT render_time FROM solids WHERE key = ? AND version = ?",
+            (key, cqgridfinity.__version__),
+        )
+        try:
+            if not rows:
+                raise FileNotFoundError(key)
+            with open(self._filename(key), "rb") as f:
+                shapes = pickle.load(f)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            # not cached, or evicted by another process
+            self.misses += 1
+            return None
+        self._query(
+            "UPDATE solids SET last_access = ?, hits = hits + 1 WHERE key = ?",
+            (time.time(), key),
+        )
+        self.hits += 1
+        if shapes is None:
+            return None, rows[0][0]
+        return cq.Workplane("XY").newObject(shapes), rows[0][0]
+
+    def put(self, key, r, render_time=0.0, spec=None):
+        """Adds a rendered sub-solid to the cache with the time it took to
+        render and its geometry inputs, i.e. its GeometryCache key tuple of
+        (kind, class name, *inputs). The least recently used sub-solids are
+        evicted if the cache exceeds its size limit."""
+        shapes = r.vals() if r is not None else None
+        data = pickle.dumps(shapes, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_size * 2**20:
+            return
+        fn = self._filename(key)
+        os.makedirs(os.path.dirname(fn), exist_ok=True)
+        tmp = "%s.%s.tmp" % (fn, uuid.uuid4().hex)
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, fn)
+        now = time.time()
+        self._query(
+            "INSERT OR REPLACE INTO solids (key, kind, spec, version, size, "
+            "render_time, created, last_access, hits) VALUES (?, ?, ?, ?, ?, ?, "
+            "?, ?, 0)",
+            (
+                key,
+                spec[0] if spec else None,
+                json.dumps(list(spec), default=str) if spec else None,
+                cqgridfinity.__version__,
+                len(data),
+                render_time,
+                now,
+                now,
+            ),
+        )
+        self.evict()
+
+    def _remove(self, where, args=()):
+        # removes the index rows and blobs of the selected sub-solids
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                keys = [
+                    k for (k,) in db.execute("SELECT key FROM solids " + where, args)
+                ]
+                db.executemany("DELETE FROM solids WHERE key = ?", [(k,) for k in keys])
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        for k in keys:
+            try:
+                os.remove(self._filename(k))
+            except OSError:
+                pass
+        return len(keys)
+
+    def evict(self, max_size=None):
+        """Removes the least recently used sub-solids until the cache is
+        within max_size MB (default is the size limit of the cache). Returns
+        the number of sub-solids removed."""
+        max_size = max_size if max_size is not None else self.max_size
+        limit = max_size * 2**20
+        if self.size * 2**20 <= limit:
+            return 0
+        rows = self._query("SELECT key, size FROM solids ORDER BY last_access DESC")
+        total, keep = 0, 0
+        for _, size in rows:
+            if total + size > limit:
+                break
+            total += size
+            keep += 1
+        if keep == len(rows):
+            return 0
+        cutoff = [k for k, _ in rows[keep:]]
+        removed = 0
+        for i in range(0, len(cutoff), 500):
+            chunk = cutoff[i : i + 500]
+            removed += self._remove(
+                "WHERE key IN (%s)" % (",".join("?" * len(chunk))), chunk
+            )
+        self.evictions += removed
+        return removed
+
+    def prune(self, max_size=None):
+        """Removes the sub-solids rendered by other versions and the index
+        entries whose blobs are missing, then evicts the least recently used
+        sub-solids until the cache is within max_size MB. Returns the number
+        of sub-solids removed."""
+        removed = self._remove("WHERE version != ?", (cqgridfinity.__version__,))
+        missing = [
+            k
+            for (k,) in self._query("SELECT key FROM solids")
+            if not os.path.isfile(self._filename(k))
+        ]
+        for k in missing:
+            removed += self._remove("WHERE key = ?", (k,))
+        return removed + self.evict(max_size)
+
+    def clear(self):
+        """Removes every sub-solid from the cache."""
+        return self._remove("")
+
+    @property
+    def stats(self):
+        """Returns a dictionary summarizing the contents and use of the
+        cache, with the number of sub-solids, their size in MB and their
+        number of hits in total, by kind and by version."""
+
+        def _summary(rows):
+            return {
+                k: {"solids": n, "size": (size or 0) / 2**20, "hits": hits or 0}
+                for k, n, size, hits in rows
+            }
+
+        total = self._query("SELECT COUNT(*), SUM(size), SUM(hits) FROM solids")[0]
+        sql = "SELECT %s, COUNT(*), SUM(size), SUM(hits) FROM solids GROUP BY %s"
+        return {
+            "path": self.path,
+            "solids": total[0],
+            "size": (total[1] or 0) / 2**20,
+            "max_size": self.max_size,
+            "hits": total[2] or 0,
+            "kinds": _summary(self._query(sql % ("kind", "kind"))),
+            "versions": _summary(self._query(sql % ("version", "version"))),
+        }
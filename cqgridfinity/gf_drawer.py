@@ -27,7 +27,11 @@ import math
 
 import cadquery as cq
 
-from cqgridfinity import *
+from cqgridfinity.constants import *
+from cqgridfinity.gf_baseplate import GridfinityBaseplate
+from cqgridfinity.gf_helpers import selector
+from cqgridfinity.gf_obj import GridfinityObject, Param, render_part
+from cqgridfinity.gf_progress import monitored, render_stage
 from cqkit.cq_helpers import rotate_x, rotate_y, rotate_z
 
 
@@ -39,6 +43,33 @@ class GridfinityDrawerSpacer(GridfinityObject):
     interlocking alignment pegs/holes.
     """
 
+    PARAMS = [
+        Param("length_u", int, 1, 1, help="length of the corner spacers in U"),
+        Param("width_u", int, 1, 1, help="width of the corner spacers in U"),
+        Param("length_th", float, 10.0, help="front and back spacer thickness"),
+        Param("width_th", float, 10.0, help="left and right spacer thickness"),
+        Param("thickness", float, GR_BASE_HEIGHT, help="spacer height"),
+        Param("chamf_rad", float, 1.0, help="spacer chamfer radius"),
+        Param("show_arrows", bool, True, help="add arrows to the spacers"),
+        Param("arrow_h", float, 0.8, help="arrow height"),
+        Param("length_fill", float, 0.0, help="length of front and back spacers"),
+        Param("width_fill", float, 0.0, help="length of left and right spacers"),
+        Param("align_features", bool, True, help="add alignment features"),
+        Param("align_l", float, 16.0, help="alignment feature length"),
+        Param("align_tol", float, 0.15, help="alignment feature tolerance"),
+        Param("align_min", float, 8.0, help="minimum alignment feature length"),
+        Param("min_margin", float, 4.0, help="minimum margin requiring spacers"),
+        Param("tolerance", float, GR_TOL, help="fit tolerance"),
+    ]
+
+    RULES = [
+        (
+            "min_margin",
+            "Drawer spacers are not required since both margins are below min_margin",
+            lambda d: not d.wide_enough and not d.deep_enough,
+        ),
+    ]
+
     def __init__(self, dr_width=None, dr_depth=None, **kwargs):
         super().__init__()
         self.length_u = 1
@@ -146,7 +177,7 @@ class GridfinityDrawerSpacer(GridfinityObject):
 
     def check_dimensions(self):
         """Check required size does not fall below specified minimum margin."""
-        if not self.wide_enough and not self.deep_enough:
+        if self.validate():
             print("Drawer spacers NOT required since resulting margins are:")
             print(
                 "  %.2f mm +/-%.2f mm (tolerance) widthwise which is not above the %.2f margin threshold"
@@ -159,6 +190,8 @@ class GridfinityDrawerSpacer(GridfinityObject):
             return False
         return True
 
+    @render_part("corner_spacer")
+    @monitored
     def render(self, arrows_top=True, arrows_bottom=True):
         """Renders a corner spacer component. This component can be used for any of
         the four corners due to symmetry.  Optional arrows can be cut into the
@@ -177,22 +210,22 @@ class GridfinityDrawerSpacer(GridfinityObject):
             )
             er = min(GR_RAD, self.length_th / 4)
             r = r.translate((sp_length / 2, self.length_th / 2, 0))
-            r = r.edges("|Z").edges("<XY").fillet(er)
-            r = r.edges("|Z").fillet(self.fillet_rad)
+            r = r.edges(selector("|Z")).edges(selector("<XY")).fillet(er)
+            r = r.edges(selector("|Z")).fillet(self.fillet_rad)
         if self.wide_enough:
             rd = (
                 cq.Workplane("XY").rect(self.width_th, sp_width).extrude(self.thickness)
             )
             er = min(GR_RAD, self.width_th / 4)
             rd = rd.translate((self.width_th / 2, sp_width / 2, 0))
-            rd = rd.edges("|Z").edges("<XY").fillet(er)
-            rd = rd.edges("|Z").fillet(self.fillet_rad)
+            rd = rd.edges(selector("|Z")).edges(selector("<XY")).fillet(er)
+            rd = rd.edges(selector("|Z")).fillet(self.fillet_rad)
 
         if r is not None and rd is not None:
             r = r.union(rd)
         elif r is None and rd is not None:
             r = rd
-        r = r.faces(">Z or <Z").chamfer(self.safe_chamfer_rad)
+        r = r.faces(selector(">Z or <Z")).chamfer(self.safe_chamfer_rad)
         r = self.orientation_arrows(
             r, self.width_th / 2, sp_width / 2, top=arrows_top, bottom=arrows_bottom
         )
@@ -202,8 +235,6 @@ class GridfinityDrawerSpacer(GridfinityObject):
         if self.align_features and self.width_th > self.align_min:
             rc = self.alignment_feature(as_cutter=False, horz=False)
             r = r.union(rc.translate((self.width_th / 2, sp_width, 0)))
-        self._cq_obj = r
-        self._obj_label = "corner_spacer"
         return r
 
     def alignment_feature(self, as_cutter=False, horz=True):
@@ -232,7 +263,7 @@ class GridfinityDrawerSpacer(GridfinityObject):
         if not horz:
             r = rotate_z(r, 90)
         if not as_cutter:
-            r = r.faces(">Z or <Z").chamfer(self.safe_chamfer_rad)
+            r = r.faces(selector(">Z or <Z")).chamfer(self.safe_chamfer_rad)
         return r
 
     def orientation_arrows(self, obj, x, y, up=True, down=True, top=True, bottom=True):
@@ -266,6 +297,8 @@ class GridfinityDrawerSpacer(GridfinityObject):
                 obj = obj.cut(rd.translate((x, y - yo, 0)))
         return obj
 
+    @render_part("length_spacer")
+    @monitored
     def render_length_filler(self, alignment_type="peg"):
         """Renders the centre filler element used along the front/back walls
         of the drawer."""
@@ -276,8 +309,8 @@ class GridfinityDrawerSpacer(GridfinityObject):
             .rect(self.length_fill, self.length_th)
             .extrude(self.thickness)
         )
-        r = r.edges("|Z").fillet(self.fillet_rad)
-        r = r.faces(">Z or <Z").chamfer(self.safe_chamfer_rad)
+        r = r.edges(selector("|Z")).fillet(self.fillet_rad)
+        r = r.faces(selector(">Z or <Z")).chamfer(self.safe_chamfer_rad)
         if self.align_features and self.length_th > self.align_min:
             if alignment_type == "hole":
                 ra = self.alignment_feature(as_cutter=True)
@@ -287,10 +320,10 @@ class GridfinityDrawerSpacer(GridfinityObject):
                 ra = self.alignment_feature(as_cutter=False)
                 r = r.union(ra.translate((self.length_fill / 2, 0, 0)))
                 r = r.union(ra.translate((-self.length_fill / 2, 0, 0)))
-        self._cq_obj = r
-        self._obj_label = "length_spacer"
         return r
 
+    @render_part("width_spacer")
+    @monitored
     def render_width_filler(self, arrows_top=True, arrows_bottom=True):
         """Renders the centre filler element used along the left/right walls
         of the drawer."""
@@ -301,17 +334,17 @@ class GridfinityDrawerSpacer(GridfinityObject):
             .rect(self.width_th, self.width_fill)
             .extrude(self.thickness)
         )
-        r = r.edges("|Z").fillet(self.fillet_rad)
-        r = r.faces(">Z or <Z").chamfer(self.safe_chamfer_rad)
+        r = r.edges(selector("|Z")).fillet(self.fillet_rad)
+        r = r.faces(selector(">Z or <Z")).chamfer(self.safe_chamfer_rad)
         r = self.orientation_arrows(r, 0, 0, top=arrows_top, bottom=arrows_bottom)
         if self.align_features and self.width_th > self.align_min:
             ra = self.alignment_feature(horz=False, as_cutter=True)
             r = r.cut(ra.translate((0, self.width_fill / 2, 0)))
             r = r.cut(ra.translate((0, -self.width_fill / 2, 0)))
-        self._cq_obj = r
-        self._obj_label = "width_spacer"
         return r
 
+    @render_part("full_set")
+    @monitored
     def render_full_set(self, include_baseplate=False):
         """Renders a complete set of spacer components including the four corners plus
         left/right and front/back spacer pairs.  The components are placed in their
@@ -320,6 +353,7 @@ class GridfinityDrawerSpacer(GridfinityObject):
         # Four corners top/bottom left + top/bottom right
         if not self.check_dimensions():
             return None
+        render_stage("corners", 0.05)
         bl = self.render()
         tl = rotate_x(bl, 180).translate((0, self.size[1], self.thickness))
         br = rotate_y(bl, 180).translate((self.size[0], 0, self.thickness))
@@ -328,6 +362,7 @@ class GridfinityDrawerSpacer(GridfinityObject):
 
         # 2x length-wise (drawer width) fillers
         if self.deep_enough:
+            render_stage("length fillers", 0.3)
             lf = self.render_length_filler()
             r = r.union(lf.translate((self.size[0] / 2, self.length_th / 2, 0)))
             r = r.union(
@@ -335,19 +370,21 @@ class GridfinityDrawerSpacer(GridfinityObject):
             )
         # 2x width-wise (drawer depth) fillers
         if self.wide_enough:
+            render_stage("width fillers", 0.55)
             wf = self.render_width_filler()
             r = r.union(wf.translate((self.width_th / 2, self.size[1] / 2, 0)))
             r = r.union(
                 wf.translate((self.size[0] - self.width_th / 2, self.size[1] / 2, 0))
             )
         if include_baseplate:
+            render_stage("baseplate", 0.8)
             bp = GridfinityBaseplate(*self.size_u)
             rb = bp.render().translate((self.size[0] / 2, self.size[1] / 2, 0))
             r = r.union(rb)
-        self._cq_obj = r
-        self._obj_label = "full_set"
         return r
 
+    @render_part("half_set")
+    @monitored
     def render_half_set(self):
         """Renders half of the full set of spacer components arranged for convenience
         for 3D printing.  This resulting compound object can then be printed twice to
@@ -355,6 +392,7 @@ class GridfinityDrawerSpacer(GridfinityObject):
         # one of each corner
         if not self.check_dimensions():
             return None
+        render_stage("corners", 0.05)
         bl = self.render(arrows_bottom=False)
         br = self.render(arrows_top=False)
         if self.deep_enough:
@@ -380,14 +418,14 @@ class GridfinityDrawerSpacer(GridfinityObject):
                 yl += max(self.length_th, self.align_l / 2)
             else:
                 yl = 3.5 * self.length_th
+            render_stage("length filler", 0.4)
             r = r.union(self.render_length_filler().translate((xl, yl, 0)))
         # width-wise (drawer depth) filler
         if self.wide_enough:
+            render_stage("width filler", 0.7)
             r = r.union(
                 self.render_width_filler(arrows_bottom=False).translate(
                     (-2 * self.width_th / 2, self.width_fill / 2, 0)
                 )
             )
-        self._cq_obj = r
-        self._obj_label = "half_set"
         return r
@@ -23,9 +23,41 @@
 #
 # Gridfinity Helper Functions
 
+import functools
+import math
+
 import cadquery as cq
+from cadquery.selectors import StringSyntaxSelector
 from cqkit import rotate_z
 
+from cqgridfinity.constants import SQRT2
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_selector(s):
+    return StringSyntaxSelector(s)
+
+
+def selector(s):
+    """Returns a CadQuery string selector, e.g. ">Z", parsed once and cached.
+    Parsing a selector string raises and catches exceptions inside the parser
+    whose tracebacks keep the calling frames, and every intermediate solid
+    referenced by them, alive until the next garbage collection. Selector
+    objects are returned unchanged."""
+    if isinstance(s, str):
+        return _parse_selector(s)
+    return s
+
+
+def detach(r):
+    """Returns a workplane with the objects of the workplane r but without
+    its chain of parent workplanes. Every workplane keeps its parent, so a
+    rendered solid otherwise keeps every intermediate solid of the
+    operations which made it alive for as long as the solid itself."""
+    if r is None:
+        return None
+    return cq.Workplane(r.plane).add(r.vals())
+
 
 def quarter_circle(
     outer_rad, inner_rad, height, quad="tr", chamf=0.5, chamf_face=">Z", ext=0
@@ -52,9 +84,15 @@ def quarter_circle(
             "bl": ">Y >X",
         }
         for face in faces[quad].split():
-            r = r.faces(face).wires().toPending().workplane().extrude(ext, combine=True)
+            r = (
+                r.faces(selector(face))
+                .wires()
+                .toPending()
+                .workplane()
+                .extrude(ext, combine=True)
+            )
     if chamf > 0:
-        r = r.faces(chamf_face).chamfer(chamf)
+        r = r.faces(selector(chamf_face)).chamfer(chamf)
     return r
 
 
@@ -62,7 +100,7 @@ def chamf_cyl(rad, height, chamf=0.5):
     """Chamfered cylinder."""
     r = cq.Workplane("XY").circle(rad).extrude(height)
     if chamf > 0:
-        return r.faces("<Z or >Z").chamfer(chamf)
+        return r.faces(selector("<Z or >Z")).chamfer(chamf)
     return r
 
 
@@ -73,5 +111,126 @@ def chamf_rect(length, width, height, angle=0, tol=0.5, z_offset=0):
         width += tol
         height += tol
     r = cq.Workplane("XY").rect(length, width).extrude(height)
-    r = r.faces(">Z").chamfer(0.5).translate((0, 0, z_offset))
+    r = r.faces(selector(">Z")).chamfer(0.5).translate((0, 0, z_offset))
     return rotate_z(r, angle)
+
+
+def stretch_z(obj, z, dz):
+    """Stretches an object vertically by splitting it with a horizontal plane
+    at height z and inserting a prism of its cross section dz high. The
+    object must have a constant cross section in the vicinity of z."""
+    rs = obj.findSolid() if isinstance(obj, cq.Workplane) else obj
+    bb = rs.BoundingBox()
+    rc = cq.Solid.makeBox(
+        bb.xlen + 2,
+        bb.ylen + 2,
+        bb.zmax - z + 1,
+        cq.Vector(bb.xmin - 1, bb.ymin - 1, z),
+    )
+    upper = rs.intersect(rc).translate(cq.Vector(0, 0, dz))
+    lower = rs.cut(rc)
+    prisms = [
+        cq.Solid.extrudeLinear(f, cq.Vector(0, 0, dz))
+        for f in lower.Faces()
+        if f.geomType() == "PLANE"
+        and abs(f.Center().z - z) < 1e-6
+        and f.normalAt().z > 0.99
+    ]
+    r = lower.fuse(*prisms, upper, glue=True).clean()
+    return cq.Workplane("XY").newObject([r])
+
+
+def rounded_rect_area(length, width, rad):
+    """Area of a rectangle with rounded corners. Corners with a negative
+    radius are treated as sharp."""
+    rad = max(rad, 0)
+    return length * width - (4 - math.pi) * rad * rad
+
+
+def rounded_rect_band_area(length, rad, band):
+    """Area of the part of a rounded rectangle which lies within band of one
+    of its sides of the specified length."""
+    if band <= 0:
+        return 0
+    rad = max(rad, 0)
+    h = min(band, rad)
+
+    def _f(u):
+        return (
+            u * math.sqrt(max(rad * rad - u * u, 0)) + rad * rad * math.asin(u / rad)
+        ) / 2
+
+    corner = rad * h - (_f(rad) - _f(rad - h)) if rad > 0 else 0
+    return length * band - 2 * corner
+
+
+def polygon_area(pts):
+    """Area of a simple polygon with vertices pts."""
+    return abs(
+        sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(pts, [*pts[1:], pts[0]]))
+        / 2
+    )
+
+
+def profile_segments(profile):
+    """Returns a list of (z0, z1, t0, t1) tuples describing each level of
+    an extrusion profile as used by GridfinityObject.extrude_profile. t0 and
+    t1 are how far the extruded outline is inset at the bottom and top of
+    the level, i.e. positive for inward tapers and negative for outward."""
+    segs, z, t = [], 0, 0
+    for level in profile:
+        if isinstance(level, (tuple, list)):
+            h = level[0] / SQRT2
+            dt = h * math.tan(math.radians(level[1]))
+        else:
+            h, dt = level, 0
+        segs.append((z, z + h, t, t + dt))
+        z, t = z + h, t + dt
+    return segs
+
+
+def profile_height(profile):
+    """Total height of an extrusion profile."""
+    return profile_segments(profile)[-1][1]
+
+
+def profile_inset(profile, z):
+    """Returns the inset of an extrusion profile outline at height z."""
+    for z0, z1, t0, t1 in profile_segments(profile):
+        if z <= z1:
+            return t0 + (t1 - t0) * (max(z, z0) - z0) / (z1 - z0) if z1 > z0 else t1
+    return t1
+
+
+def profile_integral(profile, fn, z0=None, z1=None, steps=2):
+    """Integrates fn(z, t) over the height of an extrusion profile between
+    z0 and z1, where t is the inset of the outline at height z. Each level
+    is integrated with Simpson's rule which is exact for cross sections
+    whose area varies quadratically with height."""
+    total = 0
+    n = 2 * steps
+    for a, b, t0, t1 in profile_segments(profile):
+        lo = a if z0 is None else max(a, z0)
+        hi = b if z1 is None else min(b, z1)
+        if hi <= lo:
+            continue
+        dz = (hi - lo) / n
+        s = 0
+        for i in range(n + 1):
+            z = lo + i * dz
+            t = t0 + (t1 - t0) * (z - a) / (b - a)
+            w = 1 if i in (0, n) else (4 if i % 2 else 2)
+            s += w * fn(z, t)
+        total += s * dz / 3
+    return total
+
+
+def profile_volume(length, width, rad, profile, z0=None, z1=None):
+    """Volume of a rounded rectangle extruded with an extrusion profile,
+    optionally between heights z0 and z1."""
+    return profile_integral(
+        profile,
+        lambda z, t: rounded_rect_area(length - 2 * t, width - 2 * t, rad - t),
+        z0,
+        z1,
+    )
@@ -0,0 +1,336 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Gridfinity supervised render jobs
+
+from collections import deque
+import gc
+import multiprocessing
+from multiprocessing.connection import wait
+import os
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from cqgridfinity.gf_cache import GeometryCache
+from cqgridfinity.gf_costmodel import GridfinityCostModel
+from cqgridfinity.gf_memory import peak_rss, release_memory, reset_peak_rss, rss
+from cqgridfinity.gf_pool import preload, preloaded_cache, warm_context
+from cqgridfinity.gf_shared import SharedGeometryStore
+
+
+def export_file(obj, filename, file_format="step"):
+    """Saves a rendered object to a STEP, STL or SVG file."""
+    fmt = file_format.lower()
+    if fmt == "stl":
+        obj.save_stl_file(filename=filename)
+    elif fmt == "svg":
+        obj.save_svg_file(filename=filename)
+    else:
+        obj.save_step_file(filename=filename)
+
+
+def _limit_memory(max_memory):
+    if resource is None or max_memory is None:
+        return
+    limit = int(max_memory * 2**20)
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _worker(conn, max_memory, warm=False, shared=None):
+    """Worker process loop which renders and saves one job at a time until
+    it receives None. Sub-solids are shared between the jobs of a worker.
+    The peak memory used by each job is measured and the intermediate shapes
+    it leaves behind are released before the next job. A warm worker starts
+    with the preloaded geometry cache, which it usually inherits from the
+    process it was forked from. Sub-solids are also shared with the other
+    workers through an optional SharedGeometryStore."""
+    _limit_memory(max_memory)
+    cache = preload() if warm else preloaded_cache()
+    if cache is None:
+        cache = GeometryCache()
+    cache.shared = shared
+    # objects loaded before the first job are never garbage, so they are
+    # excluded from the collections which release each job's shapes
+    gc.freeze()
+    with cache:
+        while True:
+            job = conn.recv()
+            if job is None:
+                break
+            index, obj, filename, file_format = job
+            reset_peak_rss()
+            base = rss()
+            t0 = time.perf_counter()
+            try:
+                obj._cq_obj = obj.render()
+                export_file(obj, filename, file_format)
+                status, error = "ok", None
+            except Exception as e:
+                status, error = "error", "%s: %s" % (type(e).__name__, e)
+            elapsed = time.perf_counter() - t0
+            obj._cq_obj = None
+            memory = peak_rss() - base
+            release_memory()
+            conn.send((index, status, error, elapsed, memory))
+    conn.close()
+
+
+class _Worker:
+    """A supervised worker process and the job it is running."""
+
+    def __init__(self, context, max_memory, warm=False, shared=None):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_worker, args=(child, max_memory, warm, shared), daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.jobs = 0
+        self.job = None
+        self.started = None
+
+    def submit(self, job):
+        self.job = job
+        self.started = time.perf_counter()
+        self.conn.send(job)
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(5)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class GridfinityJobRunner:
+    """Gridfinity supervised job runner
+
+    This class renders and saves objects in a pool of supervised worker
+    processes so that a job which hangs or crashes inside OCCT cannot take
+    down the whole batch. Failed jobs are recorded and the remaining jobs
+    continue.
+      workers - number of worker processes (default is the number of CPUs)
+      timeout - wall-clock time limit in seconds for each job. A worker whose
+        job exceeds the limit is killed and replaced.
+      max_memory - address space limit in MB for each worker process which
+        includes the several hundred MB of loaded CadQuery and OCCT libraries.
+        A job which exceeds the limit fails or crashes its worker. Not
+        supported on Windows.
+      max_jobs - a worker is replaced with a fresh process after this many
+        jobs to reclaim memory held by OCCT
+      start_method - multiprocessing start method, e.g. "spawn"
+      memory_budget - total memory in MB which the jobs running at the same
+        time may use above the memory of their idle workers. A job is only
+        dispatched if its predicted peak memory fits within the budget
+        alongside the jobs already running, so heavy jobs are run one at a
+        time while lighter jobs fill the remaining workers. A job is always
+        run if no other job is running, even if it exceeds the budget.
+      cost_model - GridfinityCostModel which predicts the peak memory of each
+        job. Objects without a memory model are predicted to use none.
+      preload - start warm workers (see gf_pool.warm_context) which are
+        forked from a process which has already imported cqgridfinity and
+        rendered the unit sub-solids shared by most objects. The default
+        start method of warm workers is "forkserver" where available.
+      shared_cache - SharedGeometryStore or DiskGeometryCache through which
+        the workers share the sub-solids they render with each other, or True
+        to use a new store in shared memory for each run
+    The number of workers replaced after a crash or timeout and the number
+    recycled after max_jobs are counted in restarts and recycled.
+    """
+
+    def __init__(
+        self,
+        workers=None,
+        timeout=None,
+        max_memory=None,
+        max_jobs=None,
+        start_method=None,
+        memory_budget=None,
+        cost_model=None,
+        preload=False,
+        shared_cache=None,
+    ):
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_memory = max_memory
+        self.max_jobs = max_jobs
+        self.preload = preload
+        self.shared_cache = shared_cache
+        if preload:
+            self.context = warm_context(start_method)
+        else:
+            self.context = multiprocessing.get_context(start_method)
+        self.memory_budget = memory_budget
+        self.cost_model = (
+            cost_model if cost_model is not None else GridfinityCostModel()
+        )
+        self.restarts = 0
+        self.recycled = 0
+
+    def job_memory(self, obj):
+        """Returns the predicted peak memory in MB used to render and save
+        an object."""
+        try:
+            return self.cost_model.predict(obj, "memory")
+        except ValueError:
+            return 0.0
+
+    def run(self, jobs, callback=None):
+        """Runs a list of (obj, filename, file_format) jobs. Returns a list of
+        result dictionaries in the same order as the jobs with the job index,
+        filename, status ("ok", "error", "timeout" or "crash"), error message,
+        elapsed time and the peak memory in MB used by the job (None if its
+        worker did not finish it). callback(result) is called as each job
+        finishes."""
+        results = [None] * len(jobs)
+        pending = deque(enumerate(jobs))
+        pool = []
+        memory = [0.0] * len(jobs)
+        shared = self.shared_cache
+        if shared is True:
+            shared = SharedGeometryStore()
+        if self.memory_budget is not None:
+            memory = [self.job_memory(job[0]) for job in jobs]
+
+        def _next_job():
+            # the first pending job which fits within the memory budget
+            # alongside the running jobs
+            if self.memory_budget is None:
+                return pending.popleft()
+            running = [w.job[0] for w in pool if w.job is not None]
+            used = sum(memory[i] for i in running)
+            for k, (index, job) in enumerate(pending):
+                if not running or used + memory[index] <= self.memory_budget:
+                    del pending[k]
+                    return index, job
+            return None
+
+        def _finish(worker, status, error, elapsed, used=None):
+            index = worker.job[0]
+            results[index] = {
+                "index": index,
+                "filename": worker.job[2],
+                "status": status,
+                "error": error,
+                "time": elapsed,
+                "pid": worker.process.pid,
+                "memory": used,
+            }
+            worker.job = None
+            worker.jobs += 1
+            if callback is not None:
+                callback(results[index])
+
+        def _new_worker():
+            # every worker, including replacements, shares the same store
+            return _Worker(self.context, self.max_memory, self.preload, shared)
+
+        def _discard(worker):
+            # a replacement worker is started when the next job is dispatched
+            worker.kill()
+            pool.remove(worker)
+            self.restarts += 1
+
+        try:
+            while pending or any(w.job is not None for w in pool):
+                # dispatch pending jobs to idle workers, recycling workers
+                # which have reached their job limit
+                while pending and len(pool) < min(self.workers, len(jobs)):
+                    pool.append(_new_worker())
+                for i, worker in enumerate(pool):
+                    if worker.job is not None or not pending:
+                        continue
+                    job = _next_job()
+                    if job is None:
+                        break
+                    if self.max_jobs is not None and worker.jobs >= self.max_jobs:
+                        worker.stop()
+                        self.recycled += 1
+                        worker = pool[i] = _new_worker()
+                    index, (obj, filename, file_format) = job
+                    try:
+                        worker.submit((index, obj, filename, file_format))
+                    except (BrokenPipeError, OSError):
+                        # the worker died while it was idle, so the job is
+                        # returned to the queue for its replacement
+                        worker.job = None
+                        pending.appendleft(job)
+                        _discard(worker)
+                        break
+                busy = [w for w in pool if w.job is not None]
+                if not busy:
+                    continue
+                wait_time = None
+                if self.timeout is not None:
+                    now = time.perf_counter()
+                    deadline = min(w.started + self.timeout for w in busy)
+                    wait_time = max(deadline - now, 0)
+                handles = [w.conn for w in busy] + [w.process.sentinel for w in busy]
+                ready = wait(handles, wait_time)
+                for worker in busy:
+                    elapsed = time.perf_counter() - worker.started
+                    if worker.conn in ready:
+                        try:
+                            _, status, error, elapsed, used = worker.conn.recv()
+                            _finish(worker, status, error, elapsed, used)
+                            continue
+                        except (EOFError, OSError):
+                            pass
+                    if worker.conn in ready or worker.process.sentinel in ready:
+                        worker.process.join()
+                        code = worker.process.exitcode
+                        _finish(
+                            worker,
+                            "crash",
+                            "Worker process exited with code %s" % (code),
+                            elapsed,
+                        )
+                        _discard(worker)
+                    elif self.timeout is not None and elapsed >= self.timeout:
+                        _finish(
+                            worker,
+                            "timeout",
+                            "Job exceeded the %.1f s time limit" % (self.timeout),
+                            elapsed,
+                        )
+                        _discard(worker)
+        finally:
+            for worker in pool:
+                worker.stop()
+            if self.shared_cache is True:
+                shared.close()
+        return results
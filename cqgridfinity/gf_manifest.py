@@ -0,0 +1,180 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Gridfinity build manifests
+
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import re
+import sys
+import time
+
+import cadquery as cq
+
+import cqgridfinity
+from cqgridfinity import constants
+from cqgridfinity.gf_obj import spec_params
+
+# modules with shared geometry helpers used by every object class
+SHARED_MODULES = ["gf_spec", "gf_obj", "gf_helpers", "gf_csg", "gf_pattern"]
+
+_constant_names = {}
+
+
+def spec_hash(obj):
+    """Returns a hash of the object class and the parameters which specify
+    its geometry."""
+    params = sorted(spec_params(obj).items())
+    return hashlib.sha256(repr((type(obj).__name__, params)).encode()).hexdigest()
+
+
+def geometry_hash(obj):
+    """Returns a fingerprint of the geometry rendered for an object computed
+    from its canonical parameters and build fingerprint. Objects with equal
+    geometry hashes render identical geometry, even if their specifications
+    differ in parameters which are overridden or have no effect."""
+    params = sorted(obj.canonical_params().items())
+    key = (type(obj).__name__, params, build_fingerprint(obj))
+    return hashlib.sha256(repr(key).encode()).hexdigest()
+
+
+def file_hash(filename):
+    """Returns the SHA-256 hash of a file."""
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def constant_names(cls):
+    """Returns the names of the constants referenced by the modules which
+    render objects of class cls, i.e. the modules of the class and its base
+    classes, the shared helper modules and the modules of any other Gridfinity
+    classes which they use."""
+    if cls not in _constant_names:
+        shared = [importlib.import_module("cqgridfinity." + m) for m in SHARED_MODULES]
+        sources = {m: inspect.getsource(m) for m in shared}
+        pending = [
+            sys.modules[c.__module__]
+            for c in cls.__mro__
+            if c.__module__.startswith("cqgridfinity")
+        ]
+        while pending:
+            module = pending.pop()
+            if module in sources:
+                continue
+            sources[module] = inspect.getsource(module)
+            for name in set(re.findall(r"\bGridfinity\w+", sources[module])):
+                other = getattr(cqgridfinity, name, None)
+                if inspect.isclass(other):
+                    pending.append(sys.modules[other.__module__])
+        source = "\n".join(sources.values())
+        _constant_names[cls] = sorted(
+            name
+            for name in dir(constants)
+            if name.isupper() and re.search(r"\b%s\b" % (name), source)
+        )
+    return _constant_names[cls]
+
+
+def build_fingerprint(obj):
+    """Returns a hash of everything other than its parameters which determines
+    the geometry of an object: the cq-gridfinity and CadQuery versions and the
+    values of the constants used to render objects of its class. A change to
+    a constant only changes the fingerprint of the classes which use it."""
+    values = [(n, getattr(constants, n)) for n in constant_names(type(obj))]
+    key = (cqgridfinity.__version__, cq.__version__, values)
+    return hashlib.sha256(repr(key).encode()).hexdigest()
+
+
+class BuildManifest:
+    """Gridfinity build manifest
+
+    This class records the outputs of a batch run in an append-only JSON
+    lines file with one record per finished job. Each record is written and
+    flushed as soon as the job finishes so that an interrupted run leaves a
+    valid manifest. Records include the spec hash and build fingerprint of
+    the object, the output filename, its file hash, the job status and its
+    elapsed time. Outputs which are links to the identical output of another
+    object have the status "linked". When a batch is re-run, objects whose
+    outputs are still current are skipped, like make does for up to date
+    targets.
+      filename - manifest file name
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.records = {}
+        if os.path.isfile(filename):
+            with open(filename) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # a partial record left by an interrupted run
+                        continue
+                    self.records[record["filename"]] = record
+
+    def __len__(self):
+        return len(self.records)
+
+    def is_current(self, obj, filename):
+        """Returns True if the output file of an object was built successfully
+        from the same specification and build fingerprint and is unchanged."""
+        record = self.records.get(filename)
+        if record is None or record["status"] not in ("ok", "linked"):
+            return False
+        if record["spec"] != spec_hash(obj):
+            return False
+        if record["build"] != build_fingerprint(obj):
+            return False
+        if not os.path.isfile(filename):
+            return False
+        return record["file_hash"] == file_hash(filename)
+
+    def append(self, obj, result):
+        """Appends a record for the result of a job which built an object."""
+        fn = result["filename"]
+        ok = result["status"] in ("ok", "linked") and os.path.isfile(fn)
+        record = {
+            "filename": fn,
+            "class": type(obj).__name__,
+            "spec": spec_hash(obj),
+            "build": build_fingerprint(obj),
+            "file_hash": file_hash(fn) if ok else None,
+            "size": os.path.getsize(fn) if ok else None,
+            "status": result["status"],
+            "error": result["error"],
+            "time": result["time"],
+            "timestamp": time.time(),
+        }
+        with open(self.filename, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.records[fn] = record
+        return record
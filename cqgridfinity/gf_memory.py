@@ -0,0 +1,171 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Gridfinity render memory profiling
+
+import ctypes
+import ctypes.util
+import gc
+import os
+import sys
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+import cadquery as cq
+
+from cqgridfinity.gf_progress import RenderMonitor
+
+_libc = None
+
+
+def _proc_status(field):
+    # returns a memory size field of /proc/self/status in MB or None
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss():
+    """Returns the peak resident set size of this process in MB since it
+    started or since the peak was last reset with reset_peak_rss."""
+    peak = _proc_status("VmHWM")
+    if peak is None and resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kB elsewhere
+        peak /= 2**20 if sys.platform == "darwin" else 1024
+    return peak or 0.0
+
+
+def rss():
+    """Returns the current resident set size of this process in MB."""
+    current = _proc_status("VmRSS")
+    return current if current is not None else peak_rss()
+
+
+def reset_peak_rss():
+    """Resets the peak resident set size to the current size so that the
+    peak of the next render can be measured. Returns False if the peak
+    cannot be reset on this platform (only Linux supports it)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def live_shapes():
+    """Returns the number of CadQuery shapes (each wrapping an OCCT TopoDS
+    shape) which are still referenced by Python objects."""
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, cq.Shape))
+
+
+def release_memory():
+    """Collects unreachable Python objects, including intermediate shapes kept
+    alive by reference cycles, and returns freed heap memory to the operating
+    system where the C library supports it. Returns the number of objects
+    collected."""
+    global _libc
+    collected = gc.collect()
+    if _libc is None:
+        name = ctypes.util.find_library("c") if os.name == "posix" else None
+        try:
+            _libc = ctypes.CDLL(name) if name else False
+        except OSError:
+            _libc = False
+    if _libc and hasattr(_libc, "malloc_trim"):
+        _libc.malloc_trim(0)
+    return collected
+
+
+class MemoryProfiler(RenderMonitor):
+    """Gridfinity render memory profiler
+
+    This render monitor records the memory used by each stage of the renders
+    in progress while it is active, e.g.
+      with MemoryProfiler() as profiler:
+          box.render()
+      print(profiler.report())
+    Each stage record is a dictionary with the stage name, its depth of
+    render nesting, the resident set size in MB at the end of the stage, the
+    peak resident set size reached during the stage and the number of live
+    CadQuery shapes at the end of the stage. The peak of a stage is only
+    isolated from the earlier stages on Linux, elsewhere it is the peak
+    of the process so far.
+      progress - optional progress callback passed to RenderMonitor
+      cancel - optional CancelToken passed to RenderMonitor
+      shapes - count the live shapes at each stage. Counting visits every
+        object tracked by the garbage collector and takes a few ms.
+    """
+
+    def __init__(self, progress=None, cancel=None, shapes=True):
+        super().__init__(progress, cancel)
+        self.shapes = shapes
+        self.stages = []
+        self._record = None
+
+    def __exit__(self, *args):
+        self._end_stage()
+        super().__exit__(*args)
+
+    def _end_stage(self):
+        if self._record is None:
+            return
+        self._record["rss"] = rss()
+        self._record["peak_rss"] = peak_rss()
+        if self.shapes:
+            self._record["shapes"] = live_shapes()
+        self.stages.append(self._record)
+        self._record = None
+
+    def stage(self, name, fraction):
+        self._end_stage()
+        super().stage(name, fraction)
+        if name != "done" or self.depth > 1:
+            reset_peak_rss()
+            self._record = {"stage": name, "depth": self.depth}
+
+    @property
+    def peak(self):
+        """The peak resident set size in MB of the recorded stages."""
+        return max([s["peak_rss"] for s in self.stages] or [0.0])
+
+    def report(self):
+        """Returns a readable table of the recorded stages."""
+        s = ["  Stage              RSS MB   Peak MB   Shapes"]
+        for st in self.stages:
+            name = "  " * (st["depth"] - 1) + st["stage"]
+            shapes = "%8d" % (st["shapes"]) if "shapes" in st else "%8s" % ("-")
+            s.append(
+                "  %-16s %8.1f %9.1f %s" % (name, st["rss"], st["peak_rss"], shapes)
+            )
+        s.append("  Peak RSS %.1f MB" % (self.peak))
+        return "\n".join(s)
@@ -23,6 +23,9 @@
 #
 # Gridfinity base object class
 
+from contextvars import ContextVar
+import functools
+import json
 import math
 import os
 
@@ -31,7 +34,11 @@ from OCP.StlAPI import StlAPI_Writer
 import cadquery as cq
 from cadquery import exporters
 
-from cqgridfinity import *
+from cqgridfinity.constants import *
+from cqgridfinity import gf_async
+from cqgridfinity.gf_cache import GeometryCache
+from cqgridfinity.gf_helpers import detach, selector
+from cqgridfinity.gf_spec import GridfinitySpec, GridfinitySpecError, Param, SpecError
 from cqkit import export_step_file
 
 # Special test to see which version of CadQuery is installed and
@@ -45,11 +52,70 @@ if abs(_bb.zlen - 1.0) < 1e-3:
     ZLEN_FIX = False
 
 
-class GridfinityObject:
+def spec_params(obj):
+    """Returns a dictionary of the scalar parameters of an object which is
+    sufficient to re-create it, e.g. type(obj)(**spec_params(obj)). Private
+    attributes are only included if they are exposed by a property."""
+    params = {}
+    for k, v in obj.__dict__.items():
+        if not isinstance(v, (bool, int, float, str)):
+            continue
+        if k.startswith("_"):
+            k = k.lstrip("_")
+            if not isinstance(getattr(type(obj), k, None), property):
+                continue
+        params[k] = v
+    return params
+
+
+def _canonical_value(v):
+    # numbers which only differ by type or rounding noise describe the
+    # same geometry
+    if isinstance(v, bool) or isinstance(v, str):
+        return v
+    return round(float(v), 6)
+
+
+# depth of the part render calls in progress in the current thread or task
+_part_depth = ContextVar("gf_part_depth", default=0)
+
+
+def _detached(render_fn, *args):
+    return detach(render_fn(*args))
+
+
+def render_part(label):
+    """Decorator for the render methods of objects which are made of several
+    parts, e.g. the lid and latches of a rugged box. The part returned by an
+    outermost call becomes the current object which is saved by the save
+    methods, with label appended to its filename. Parts rendered inside
+    another part render, or by render_detached, leave the object unchanged."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            depth = _part_depth.get()
+            token = _part_depth.set(depth + 1)
+            try:
+                r = fn(self, *args, **kwargs)
+            finally:
+                _part_depth.reset(token)
+            if not depth and r is not None:
+                self._cq_obj, self._obj_label = r, label
+            return r
+
+        return wrapper
+
+    return decorator
+
+
+class GridfinityObject(GridfinitySpec):
     """Base Gridfinity object class
 
     This class bundles glabally relevant constants, properties, and methods
-    for derived Gridfinity object classes.
+    for derived Gridfinity object classes. The declared parameters,
+    specification rules and dimension properties are inherited from
+    GridfinitySpec (see gf_spec).
     """
 
     def __init__(self, **kwargs):
@@ -68,120 +134,91 @@ class GridfinityObject:
             return self.render()
         return self._cq_obj
 
-    @property
-    def length(self):
-        return self.length_u * GRU
-
-    @property
-    def width(self):
-        return self.width_u * GRU
-
-    @property
-    def height(self):
-        return 3.8 + GRHU * self.height_u
-
-    @property
-    def int_height(self):
-        h = self.height - GR_LIP_H - GR_BOT_H
-        if self.lite_style:
-            return h + self.wall_th
-        return h
-
-    @property
-    def max_height(self):
-        return self.int_height + GR_UNDER_H + GR_TOPSIDE_H
-
-    @property
-    def floor_h(self):
-        if self.lite_style:
-            return GR_FLOOR - self.wall_th
-        return GR_FLOOR
-
-    @property
-    def lip_width(self):
-        if self.no_lip:
-            return self.wall_th
-        return GR_UNDER_H + self.wall_th
-
-    @property
-    def outer_l(self):
-        return self.length_u * GRU - GR_TOL
-
-    @property
-    def outer_w(self):
-        return self.width_u * GRU - GR_TOL
-
-    @property
-    def outer_dim(self):
-        return self.outer_l, self.outer_w
-
-    @property
-    def inner_l(self):
-        return self.outer_l - 2 * self.wall_th
-
-    @property
-    def inner_w(self):
-        return self.outer_w - 2 * self.wall_th
-
-    @property
-    def inner_dim(self):
-        return self.inner_l, self.inner_w
-
-    @property
-    def half_l(self):
-        return (self.length_u - 1) * GRU2
-
-    @property
-    def half_w(self):
-        return (self.width_u - 1) * GRU2
-
-    @property
-    def half_dim(self):
-        return self.half_l, self.half_w
-
-    @property
-    def half_in(self):
-        return GRU2 - self.wall_th - GR_TOL / 2
-
-    @property
-    def outer_rad(self):
-        return GR_RAD - GR_TOL / 2
-
-    @property
-    def inner_rad(self):
-        return self.outer_rad - self.wall_th
-
-    @property
-    def under_h(self):
-        return GR_UNDER_H - (self.wall_th - GR_WALL)
-
-    @property
-    def safe_fillet_rad(self):
-        if not any([self.scoops, self.labels, self.length_div, self.width_div]):
-            return GR_FILLET
-        return min(GR_FILLET, (GR_UNDER_H + GR_WALL) - self.wall_th - 0.05)
+    def render_detached(self, method="render", *args, **kwargs):
+        """Returns the result of a render method, e.g. "render_lid", without
+        making it the current object. Detached renders do not modify the
+        object and can be called by several threads at once."""
+        token = _part_depth.set(_part_depth.get() + 1)
+        try:
+            return getattr(self, method)(*args, **kwargs)
+        finally:
+            _part_depth.reset(token)
+
+    async def render_async(self, method="render", executor=None):
+        """Renders the object without blocking the asyncio event loop (see
+        gf_async). Returns the result of the render method."""
+        return await gf_async.render_async(self, method, executor)
+
+    async def save_async(
+        self, formats=("step",), path=None, prefix=None, executor=None
+    ):
+        """Renders and saves the object to a file for each file format without
+        blocking the asyncio event loop (see gf_async). Returns the list of
+        saved filenames."""
+        return await gf_async.save_async(self, formats, path, prefix, executor)
 
-    @property
-    def grid_centres(self):
-        return [
-            (x * GRU, y * GRU)
-            for x in range(self.length_u)
-            for y in range(self.width_u)
-        ]
+    @classmethod
+    def from_dict(cls, d):
+        """Returns a new object with the parameters in a dictionary made by
+        to_dict. Parameters which are not specified take their declared
+        defaults. When called on GridfinityObject, the object class is
+        given by the "class" key."""
+        d = dict(d)
+        name = d.pop("class", cls.__name__)
+        if name != cls.__name__:
+            subclasses = [cls]
+            while subclasses:
+                sub = subclasses.pop()
+                if sub.__name__ == name:
+                    return sub.from_dict(d)
+                subclasses.extend(sub.__subclasses__())
+            raise ValueError("%s is not a %s class" % (name, cls.__name__))
+        params = cls.convert_params(d)
+        obj = cls(**params)
+        # parameters which are properties are not accepted by the constructor
+        for k, v in params.items():
+            if k not in obj.__dict__:
+                setattr(obj, k, v)
+        return obj
 
-    @property
-    def hole_centres(self):
-        return [
-            (x * GRU - GR_HOLE_DIST * i, -(y * GRU - GR_HOLE_DIST * j))
-            for x in range(self.length_u)
-            for y in range(self.width_u)
-            for i in (-1, 1)
-            for j in (-1, 1)
-        ]
-
-    def safe_fillet(self, obj, selector, rad):
-        if len(obj.edges(selector).vals()) > 0:
-            return obj.edges(selector).fillet(rad)
+    @classmethod
+    def from_json(cls, s):
+        return cls.from_dict(json.loads(s))
+
+    def canonical_params(self):
+        """Returns the parameters which determine the geometry of the object
+        with their effective values. Parameters which are overridden or have
+        no effect on the rendered geometry are removed, so objects which
+        render identical geometry have equal canonical parameters."""
+        return {k: _canonical_value(v) for k, v in spec_params(self).items()}
+
+    def cached(self, key, render_fn, *args):
+        """Returns the sub-solid rendered by render_fn(*args) from the active
+        geometry cache (if any). key is a tuple of the sub-solid kind followed
+        by every input which determines its geometry."""
+        cache = GeometryCache.active()
+        if cache is None:
+            return render_fn(*args)
+        # sub-solids are kept without the intermediate solids which made them
+        return cache.get_or_render(self.cache_key(key), _detached, render_fn, *args)
+
+    def cache_key(self, key):
+        """Returns the geometry cache key of a sub-solid of the object, i.e.
+        the key passed to cached() qualified with the object class name."""
+        return (key[0], type(self).__name__, *key[1:])
+
+    def sub_solids(self):
+        """Returns the sub-solids which are rendered through the geometry
+        cache when the object (and its accessories) are rendered. They are
+        returned as a list of stages, each a list of (obj, key, render_fn,
+        args) tuples such that obj.cached(key, render_fn, *args) renders the
+        sub-solid. Sub-solids may contain those of earlier stages."""
+        return []
+
+    def safe_fillet(self, obj, edges, rad):
+        edges = selector(edges)
+        if len(obj.edges(edges).vals()) > 0:
+            return obj.edges(edges).fillet(rad)
         return obj
 
     def filename(self, prefix=None, path=None):
@@ -277,10 +314,11 @@ class GridfinityObject:
         )
         if not fn.lower().endswith(".step"):
             fn = fn + ".step"
-        if isinstance(self.cq_obj, cq.Assembly):
-            self.cq_obj.save(fn)
+        obj = self.cq_obj
+        if isinstance(obj, cq.Assembly):
+            obj.save(fn)
         else:
-            export_step_file(self.cq_obj, fn)
+            export_step_file(obj, fn)
 
     def save_stl_file(
         self, filename=None, path=None, prefix=None, tol=1e-2, ang_tol=0.1
@@ -292,11 +330,17 @@ class GridfinityObject:
         )
         if not fn.lower().endswith(".stl"):
             fn = fn + ".stl"
+        obj = self.tessellate(tol=tol, ang_tol=ang_tol)
+        writer = StlAPI_Writer()
+        writer.Write(obj, fn)
+
+    def tessellate(self, tol=1e-2, ang_tol=0.1):
+        """Computes the triangle mesh of the rendered object which is written
+        to STL files. Returns the OCCT shape which holds the mesh."""
         obj = self.cq_obj.val().wrapped
         mesh = BRepMesh_IncrementalMesh(obj, tol, True, ang_tol, True)
         mesh.Perform()
-        writer = StlAPI_Writer()
-        writer.Write(obj, fn)
+        return obj
 
     def save_svg_file(self, filename=None, path=None, prefix=None):
         fn = (
@@ -340,9 +384,14 @@ class GridfinityObject:
                         if ZLEN_FIX
                         else level[0]
                     )
-                r = r.faces(">Z").wires().toPending().extrude(zlen, taper=level[1])
+                r = (
+                    r.faces(selector(">Z"))
+                    .wires()
+                    .toPending()
+                    .extrude(zlen, taper=level[1])
+                )
             else:
-                r = r.faces(">Z").wires().toPending().extrude(level)
+                r = r.faces(selector(">Z")).wires().toPending().extrude(level)
         return r
 
     @classmethod
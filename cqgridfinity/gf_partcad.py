@@ -0,0 +1,130 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# PartCAD shims and package parameters generated from the parameter schemas
+
+import os
+
+from cqgridfinity.gf_baseplate import GridfinityBaseplate
+from cqgridfinity.gf_box import GridfinityBox
+from cqgridfinity.gf_drawer import GridfinityDrawerSpacer
+from cqgridfinity.gf_ruggedbox import GridfinityRuggedBox
+
+# PartCAD part names and the class and module of each part in the order
+# they appear in partcad.yaml
+PARTCAD_PARTS = {
+    "baseplate": (GridfinityBaseplate, "gf_baseplate"),
+    "ruggedbox": (GridfinityRuggedBox, "gf_ruggedbox"),
+    "box": (GridfinityBox, "gf_box"),
+    "drawerspacer": (GridfinityDrawerSpacer, "gf_drawer"),
+}
+
+SHIM_PATH = "cqgridfinity/shims/cqgi_gf_%s.py"
+
+
+def _default(p):
+    # CQGI parameters cannot be None, so optional parameters use 0.0
+    if p.default is None:
+        return 0.0
+    return p.type(p.default)
+
+
+def _comment(p):
+    s = "  # %s" % (p.help) if p.help else ""
+    if p.default is None:
+        s += " (0 for automatic)"
+    return s
+
+
+def shim_source(part):
+    """Returns the source of the CQGI shim script of a PartCAD part. Every
+    declared parameter is a CQGI parameter with its declared default and the
+    object is made with from_dict."""
+    cls, module = PARTCAD_PARTS[part]
+    s = []
+    s.append("import sys")
+    s.append('sys.path.append(".") # Relative to `partcad.yaml`')
+    s.append("")
+    s.append("from cqgridfinity.%s import %s" % (module, cls.__name__))
+    s.append("")
+    for p in cls.PARAMS:
+        s.append("%s = %r%s" % (p.name, _default(p), _comment(p)))
+    optional = [p for p in cls.PARAMS if p.default is None]
+    if optional:
+        s.append("")
+    for p in optional:
+        s.append("if %s == 0.0:" % (p.name))
+        s.append("    %s = None" % (p.name))
+    s.append("")
+    s.append("result = %s.from_dict(" % (cls.__name__))
+    s.append("    dict(")
+    for p in cls.PARAMS:
+        s.append("        %s=%s," % (p.name, p.name))
+    s.append("    )")
+    s.append(").render().val()")
+    s.append("")
+    s.append("show_object(result)")
+    return "\n".join(s) + "\n"
+
+
+def partcad_parts():
+    """Returns the parts section of partcad.yaml with the parameters of each
+    part."""
+    s = ["parts:"]
+    for part, (cls, _) in PARTCAD_PARTS.items():
+        s.append("  %s:" % (part))
+        s.append("    type: cadquery")
+        s.append("    path: %s" % (SHIM_PATH % (part)))
+        s.append("    parameters:")
+        for p in cls.PARAMS:
+            s.append("      %s:" % (p.name))
+            s.append("        type: %s" % (p.type.__name__))
+            s.append("        default: %r%s" % (_default(p), _comment(p)))
+    return "\n".join(s) + "\n"
+
+
+def update_partcad(root="."):
+    """Re-generates the PartCAD shim scripts and the parts section of
+    partcad.yaml in the package root directory. Returns a list of the
+    files which were changed."""
+    files = {SHIM_PATH % (part): shim_source(part) for part in PARTCAD_PARTS}
+    fn = "partcad.yaml"
+    with open(os.path.join(root, fn)) as f:
+        yaml = f.read()
+    start, end = yaml.index("\nparts:\n") + 1, yaml.index("\nassemblies:")
+    files[fn] = yaml[:start] + partcad_parts() + yaml[end:]
+    changed = []
+    for fn, text in files.items():
+        path = os.path.join(root, fn)
+        with open(path) as f:
+            if f.read() == text:
+                continue
+        with open(path, "w") as f:
+            f.write(text)
+        changed.append(fn)
+    return changed
+
+
+if __name__ == "__main__":
+    for fn in update_partcad():
+        print("Updated %s" % (fn))
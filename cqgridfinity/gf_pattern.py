@@ -0,0 +1,103 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Gridfinity patterned features
+
+import cadquery as cq
+
+from cqgridfinity.constants import GRU
+
+
+class GridPattern:
+    """Gridfinity patterned feature
+
+    This class applies a single tool solid at every point of a point set.
+    The tool is rendered once and each instance is a located copy which
+    shares the underlying geometry of the tool. The instances are combined
+    with a target object in a single boolean operation rather than being
+    fused together first and then combined, which keeps the cost of a
+    feature roughly constant as the number of grid cells grows.
+      tool - CadQuery Workplane or Shape representing the feature at the origin
+      pts - sequence of (x, y) or (x, y, z) points to place the tool
+    """
+
+    def __init__(self, tool, pts):
+        self.tool = tool
+        self.pts = [(*pt, 0) if len(pt) == 2 else tuple(pt) for pt in pts]
+
+    def __len__(self):
+        return len(self.pts)
+
+    @classmethod
+    def grid(cls, tool, length_u, width_u, pitch=GRU, centred=False):
+        """Returns a pattern placing the tool at the centre of every grid cell.
+        Optionally, the grid can be centred about the origin."""
+        xo = (length_u - 1) * pitch / 2 if centred else 0
+        yo = (width_u - 1) * pitch / 2 if centred else 0
+        pts = [
+            (x * pitch - xo, y * pitch - yo)
+            for x in range(length_u)
+            for y in range(width_u)
+        ]
+        return cls(tool, pts)
+
+    @property
+    def tool_shape(self):
+        if isinstance(self.tool, cq.Workplane):
+            shapes = [s for s in self.tool.vals() if isinstance(s, cq.Shape)]
+            if len(shapes) == 1:
+                return shapes[0]
+            return cq.Compound.makeCompound(shapes)
+        return self.tool
+
+    def shapes(self):
+        """Returns a list of located copies of the tool, one per point."""
+        tool = self.tool_shape
+        return [tool.moved(cq.Location(cq.Vector(*pt))) for pt in self.pts]
+
+    def compound(self):
+        """Returns all of the tool instances as a single (unfused) compound."""
+        return cq.Compound.makeCompound(self.shapes())
+
+    def fused(self, clean=True):
+        """Returns a Workplane with all of the tool instances fused together."""
+        r = self.compound().fuse()
+        if clean:
+            r = r.clean()
+        return cq.Workplane("XY").newObject([r])
+
+    def cut_from(self, obj, clean=True):
+        """Cuts every instance of the tool from obj in one boolean operation."""
+        base = obj.findSolid()
+        r = base.cut(*self.shapes())
+        if clean:
+            r = r.clean()
+        return obj.newObject([r])
+
+    def union_with(self, obj, clean=True):
+        """Fuses every instance of the tool with obj in one boolean operation."""
+        base = obj.findSolid()
+        r = base.fuse(*self.shapes())
+        if clean:
+            r = r.clean()
+        return obj.newObject([r])
@@ -0,0 +1,88 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Gridfinity warm worker processes
+
+import gc
+import multiprocessing
+
+from cqgridfinity.gf_cache import GeometryCache
+
+_preloaded = None
+
+
+def preload_objects():
+    """Returns the objects rendered by preload. Between them they render the
+    unit sub-solids which are shared by most objects, i.e. the box foot and
+    the baseplate pocket, and exercise the first use of CadQuery and OCCT."""
+    from cqgridfinity import GridfinityBaseplate, GridfinityBox
+
+    return [
+        GridfinityBox(1, 1, 3),
+        GridfinityBaseplate(1, 1),
+        GridfinityBaseplate(1, 1, straight_bottom=True),
+    ]
+
+
+def preload(objs=None):
+    """Imports the geometry modules, including the CadQuery version probe of
+    gf_obj, and renders the preload objects into a geometry cache which is
+    used by the jobs run in this process. Worker processes forked from this
+    process inherit the modules and the cache copy-on-write, so they start
+    rendering without import or first use costs. The preloaded objects are
+    excluded from garbage collection. Returns the preloaded cache."""
+    global _preloaded
+    if _preloaded is None:
+        cache = GeometryCache()
+        with cache:
+            for obj in objs if objs is not None else preload_objects():
+                obj.render()
+        gc.collect()
+        gc.freeze()
+        _preloaded = cache
+    return _preloaded
+
+
+def preloaded_cache():
+    """Returns the geometry cache of a preloaded process or None."""
+    return _preloaded
+
+
+def warm_context(start_method=None):
+    """Returns a multiprocessing context whose processes start preloaded.
+    With the "forkserver" start method (the default where it is available),
+    a server process is started which imports cqgridfinity and preloads
+    once, and every worker is forked from it. With "fork", this process is
+    preloaded and the workers are forked from it. With "spawn", each worker
+    preloads itself when it starts. Note that a fork server is shared by all
+    of the processes started with the "forkserver" method, so that it is only
+    preloaded if no such process has been started before."""
+    methods = multiprocessing.get_all_start_methods()
+    if start_method is None:
+        start_method = "forkserver" if "forkserver" in methods else "spawn"
+    context = multiprocessing.get_context(start_method)
+    if start_method == "forkserver":
+        context.set_forkserver_preload(["cqgridfinity.gf_preload"])
+    elif start_method == "fork":
+        preload()
+    return context
@@ -0,0 +1,137 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Gridfinity render progress and cancellation
+
+from contextvars import ContextVar
+import functools
+import threading
+
+_active_monitor = ContextVar("gf_render_monitor", default=None)
+
+
+class RenderCancelled(Exception):
+    """Raised by a render which was cancelled with its CancelToken."""
+
+
+class CancelToken:
+    """Cooperative render cancellation token
+
+    A token is passed to a render method (or a RenderMonitor) and can be
+    cancelled from any thread. The render checks the token between its
+    boolean and fillet stages and raises RenderCancelled, so that a long
+    render stops at the end of the stage in progress. The object being
+    rendered is left unchanged.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        """Raises RenderCancelled if the token has been cancelled."""
+        if self._event.is_set():
+            raise RenderCancelled("Render was cancelled")
+
+
+class RenderMonitor:
+    """Gridfinity render monitor
+
+    This class reports the progress of the renders in progress in the current
+    thread (or asyncio task) and checks them for cancellation. It is active
+    inside a `with monitor:` block, or for the duration of a render method
+    called with progress or cancel keyword arguments.
+      progress - callback(stage, fraction) called as a render reaches each
+        stage with the stage name and the fraction of the render done
+      cancel - CancelToken checked at each stage
+    Renders nested inside another render, e.g. the baseplate inside a rugged
+    box, report their stages at the fraction reached by the outer render.
+    """
+
+    def __init__(self, progress=None, cancel=None):
+        self.progress = progress
+        self.cancel = cancel
+        self.depth = 0
+        self.fraction = 0.0
+        self._tokens = []
+
+    def __enter__(self):
+        self._tokens.append(_active_monitor.set(self))
+        return self
+
+    def __exit__(self, *args):
+        _active_monitor.reset(self._tokens.pop())
+
+    @staticmethod
+    def active():
+        """Returns the currently active monitor or None."""
+        return _active_monitor.get()
+
+    def stage(self, name, fraction):
+        if self.cancel is not None:
+            self.cancel.check()
+        if self.depth <= 1:
+            self.fraction = fraction
+        if self.progress is not None:
+            self.progress(name, self.fraction)
+
+
+def render_stage(name, fraction):
+    """Reports that the render in progress has reached a stage with a
+    fraction of the render done and checks it for cancellation."""
+    monitor = _active_monitor.get()
+    if monitor is not None:
+        monitor.stage(name, fraction)
+
+
+def monitored(fn):
+    """Decorator for render methods which adds the progress and cancel
+    keyword arguments (see RenderMonitor). An outermost monitored render
+    reports its start and end as the "start" and "done" stages."""
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, progress=None, cancel=None, **kwargs):
+        monitor = _active_monitor.get()
+        if progress is not None or cancel is not None:
+            monitor = RenderMonitor(progress, cancel)
+        if monitor is None:
+            return fn(self, *args, **kwargs)
+        with monitor:
+            monitor.depth += 1
+            try:
+                if monitor.depth == 1:
+                    monitor.stage("start", 0.0)
+                r = fn(self, *args, **kwargs)
+                if monitor.depth == 1:
+                    monitor.stage("done", 1.0)
+            finally:
+                monitor.depth -= 1
+        return r
+
+    return wrapper
@@ -26,7 +26,6 @@
 import math
 
 import cadquery as cq
-from cadquery.selectors import StringSyntaxSelector
 from cqkit import (
     HasXCoordinateSelector,
     HasYCoordinateSelector,
@@ -50,11 +49,40 @@ from cqkit import (
 )
 
 # from cqkit import Ribbon
-from cqgridfinity import *
+from cqgridfinity.constants import *
+from cqgridfinity.gf_baseplate import GridfinityBaseplate
+from cqgridfinity.gf_obj import GridfinityObject, Param, render_part
+from cqgridfinity.gf_pattern import GridPattern
+from cqgridfinity.gf_progress import monitored, render_stage
 from .gf_helpers import *
+from .gf_csg import csg
 
 
 class GridfinityRuggedBox(GridfinityObject):
+    PARAMS = [
+        Param("length_u", int, 4, 3, help="length in U (42 mm / U)"),
+        Param("width_u", int, 4, 3, help="width in U (42 mm / U)"),
+        Param("height_u", int, 4, 4, help="height in U (7 mm / U)"),
+        Param("lid_height", float, 10.0, help="height of the lid"),
+        Param("wall_vgrooves", bool, True, help="add vertical grooves to walls"),
+        Param("front_handle", bool, True, help="add a front handle"),
+        Param("stackable", bool, True, help="add stacking features"),
+        Param("side_clasps", bool, True, help="add side clasps"),
+        Param("lid_baseplate", bool, True, help="add a baseplate to the lid"),
+        Param("inside_baseplate", bool, True, help="add a baseplate inside"),
+        Param("side_handles", bool, True, help="add side handles"),
+        Param("front_label", bool, True, help="add a front label holder"),
+        Param("label_length", float, None, help="front label length"),
+        Param("label_height", float, None, help="front label height"),
+        Param("label_th", float, GR_LABEL_TH, help="front label thickness"),
+        Param("back_feet", bool, True, help="add feet to the back"),
+        Param("hinge_width", float, GR_HINGE_SZ, help="width of the hinges"),
+        Param("hinge_bolted", bool, False, help="bolted instead of printed hinges"),
+        Param("rib_style", bool, False, help="ribbed instead of smooth walls"),
+        Param("lid_window", bool, False, help="add a window to the lid"),
+        Param("window_th", float, 1.0, help="lid window thickness"),
+    ]
+
     def __init__(self, length_u, width_u, height_u, **kwargs):
         super().__init__()
         self.length_u = length_u
@@ -91,9 +119,236 @@ class GridfinityRuggedBox(GridfinityObject):
 
     def check_dimensions(self):
         """Verifies that the specified box dimensions are within specification."""
-        assert self.length_u >= 3
-        assert self.width_u >= 3
-        assert self.height_u >= 4
+        self.check_valid()
+
+    def estimate(self, density=GR_DENSITY):
+        """Returns analytic estimates of the size, material volume, mass and
+        interior capacity of the box and its lid computed from their
+        dimensions without rendering them. The estimate is returned as a
+        dictionary with:
+          size - overall length, width and height in mm of the closed box
+          footprint - base area in mm^2
+          volume, mass - volume in mm^3 and mass in g of the box body
+          lid_volume, lid_mass - volume in mm^3 and mass in g of the lid
+          capacity - volume of the empty interior in mm^3
+          interior - interior length, width and depth in mm
+        Masses are computed for a material density in g/cm^3. The estimate
+        includes the principal features of the box and approximates the
+        smaller details. Volumes are typically within 2% of the rendered box
+        body and lid."""
+        p = GR_RBOX_CWALL - GR_RBOX_WALL
+        inside = rounded_rect_area(self.length, self.width, GR_RAD)
+        depth = self.box_height - GR_RBOX_FLOOR
+        vol = self._shell_volume(self.box_height) - inside * depth
+        # registration features
+        reg = GR_REG_L * GR_REG_W * GR_REG_H - (GR_REG_L + GR_REG_W) / 4
+        qtr = math.pi / 4 * (GR_REG_R0**2 - GR_REG_R1**2) * GR_REG_H
+        vol += 6 * reg + 2 * qtr
+        if self.inside_baseplate:
+            bp = GridfinityBaseplate(self.length_u, self.width_u, ext_depth=1.6)
+            floor = bp.estimate()["volume"]
+        else:
+            floor = inside * (GR_RBOX_WALL - GR_RBOX_FLOOR)
+        vol += floor
+        if self.front_handle and self.long_enough_for_handle:
+            l1 = GR_HANDLE_L1 / 2
+            l2 = min(GR_HANDLE_L2 / 2, (self.box_height - 6) / 2)
+            holes = math.pi * (M3_DIAM**2 + M3_CLR_DIAM**2) / 8
+            vol += 4 * ((l1 + l2) * GR_HANDLE_H - holes) * GR_HANDLE_W
+            vol -= 2 * math.pi * M3_CB_DIAM**2 / 4 * M3_CB_DEPTH
+        if self.side_handles:
+            w = min(GR_SIDE_HANDLE_W, self.box_width - 2 * GR_RBOX_CORNER_W)
+            h2 = self.lid_height - GR_RBOX_VCUT_D + 2
+            vol += 2 * _handle_volume(GR_RBOX_WALL, 7, 4, h2, w)
+            # vertical under supports below the handle
+            xo = -7 * (h2 - 2.5) / (h2 - 2)
+            supports = 3 if w > GR_LID_HANDLE_W / 2 else 2
+            below = polygon_area([(0, 0), (0, 2.5 - h2), (xo, 0)])
+            vol += 2 * supports * GR_RBOX_WALL * below
+        if self.front_label:
+            l, h = self.label_size()
+            th = GR_LABEL_SLOT_TH
+            slot = profile_volume(l, h, GR_RAD, [(th * SQRT2, 45)])
+            slot -= (l - 8) * (h - 8) * th
+            slot -= ((l - 5) * (h - 5) - (l - 8) * (h - 8)) * th / 2
+            vol += slot
+        if self.back_feet:
+            foot = 2 * GR_HINGE_OFFS * 2 * GR_HINGE_RAD + math.pi * GR_HINGE_RAD**2
+            vol += foot * (self.hinge_width - 0.4)
+        lid = self._lid_volume()
+        return {
+            "size": (
+                self.box_length + 2 * p,
+                self.box_width + 2 * p,
+                self.box_height + self.lid_height,
+            ),
+            "footprint": self._outline_area(),
+            "volume": vol,
+            "mass": vol * density / 1000,
+            "lid_volume": lid,
+            "lid_mass": lid * density / 1000,
+            "capacity": inside * depth - floor,
+            "interior": (self.length, self.width, depth),
+        }
+
+    def _outline_area(self, sides=True):
+        """Area of the box outline including its protruding corners. The sides
+        of a rib style box between its corners are optionally excluded."""
+        p = GR_RBOX_CWALL - GR_RBOX_WALL
+        bl, bw = self.box_length, self.box_width
+        if self.rib_style:
+            area = (bl + 2 * p) * (bw + 2 * p)
+            area -= (bl - 2 * (GR_RBOX_FRONT_L - p)) * p
+            if not sides:
+                area -= 2 * p * (bw + 2 * p - 2 * GR_RBOX_CORNER_W)
+        else:
+            area = rounded_rect_area(bl, bw, GR_RAD)
+            area += (4 - math.pi) * GR_RAD * GR_RAD
+            for l in (GR_RBOX_BACK_L, GR_RBOX_BACK_L, GR_RBOX_FRONT_L, GR_RBOX_FRONT_L):
+                area += l * GR_RBOX_CORNER_W - (l - p) * (GR_RBOX_CORNER_W - p)
+        return area - 4 * (1 - math.pi / 4) * GR_RBOX_CRAD * GR_RBOX_CRAD
+
+    def _shell_volume(self, height, as_lid=False):
+        """Volume of the solid outer shell rendered by body_shell."""
+        p = GR_RBOX_CWALL - GR_RBOX_WALL
+        bl, bw = self.box_length, self.box_width
+        corners = 2 * (GR_RBOX_BACK_L + GR_RBOX_FRONT_L) + 4 * GR_RBOX_CORNER_W
+        corners -= 4 * (2 - math.pi / 2) * GR_RBOX_CRAD
+        if self.rib_style and not as_lid:
+            # the protruding outline remains only above and below the tapered
+            # cut outs of a rib style box and in its ribs
+            main = rounded_rect_area(bl, bw, GR_RAD)
+            lead = self.lid_height - GR_RBOX_VCUT_D
+            h = 2 * lead + p
+            hs = lead + p / 2 if self.side_handles else h
+            side = self._outline_area() - self._outline_area(sides=False)
+            vol = main * height + (self._outline_area(sides=False) - main) * h
+            vol += side * hs
+            ribs = GR_RBOX_CHAN_W + 3 * GR_RBOX_WALL
+            ribs *= GR_RBOX_CHAN_D * (6 if self.side_clasps else 2)
+            if not self.side_clasps:
+                ribs += 6 * GR_RBOX_CHAN_D * GR_RBOX_WALL
+            xs = [-self.int_length / 2 + x * GRU for x in range(self.length_u)]
+            n = 4 + sum(1 for x in xs if abs(x) < bl / 2 - GR_RBOX_BACK_L)
+            if not self.side_handles:
+                ylim = self.int_width / 2
+                ylim -= GR_RBOX_CORNER_W if self.side_clasps else 0
+                ys = [-self.int_width / 2 + y * GRU for y in range(self.width_u)]
+                n += 2 * sum(1 for y in ys if abs(y) < ylim)
+            ribs += n * 1.5 * GR_RBOX_WALL * p
+            vol += ribs * (height - h)
+        else:
+            sides = not (as_lid and self.side_handles)
+            vol = self._outline_area(sides) * height
+            if self.wall_vgrooves and not as_lid:
+                vol -= 2 * GR_RBOX_VCUT_D**2 * corners
+        # chamfered top and bottom edges
+        perimeter = 2 * (bl + bw) + 16 * p - 4 * (2 - math.pi / 2) * GR_RBOX_CRAD
+        vol -= perimeter * GR_RBOX_VCUT_D**2
+        # bottom stacking registration cut outs
+        if self.stackable or as_lid:
+            rq = GR_REG_H + 0.5
+            qtr = math.pi / 4 * (GR_BREG_R0**2 - GR_BREG_R1**2) * rq
+            vol -= (2 if as_lid else 4) * qtr
+            vol -= 6 * (GR_REG_L + 0.5) * (GR_REG_W + 0.5) * rq
+        # clasp channels and ribs
+        rib = GR_RIB_L * GR_RIB_W * GR_RIB_H - GR_RIB_W
+        channel = GR_RBOX_CHAN_D * GR_RBOX_CHAN_W * height
+        if as_lid:
+            ribs = 4
+        else:
+            ribs = 4 * (3 if self.stackable else 2)
+            zs = max(self.box_height, GR_CLASP_SLIDE_D + 5.2)
+            zo = -GR_CLASP_SLIDE_D / 2 + GR_CLASP_SLIDE_W / 2
+            for z in (zs + zo, zo):
+                z0 = max(z - GR_CLASP_SLIDE_D / 2, 0)
+                z1 = min(z + GR_CLASP_SLIDE_D / 2, height)
+                channel += GR_CLASP_SLIDE_W**2 * max(z1 - z0, 0)
+        clasps = 2 + (4 if self.side_clasps else 0)
+        vol -= clasps * (channel - ribs * rib)
+        # hinge mounts
+        hw = self.hinge_width
+        hinge = (hw + 2) * GR_HINGE_W1 * GR_HINGE_H1
+        hinge += (2 * hw - 2) * GR_HINGE_W2 * GR_HINGE_H2
+        return vol - 2 * hinge
+
+    def _lid_volume(self):
+        """Volume of the lid rendered by render_lid."""
+        p = GR_RBOX_CWALL - GR_RBOX_WALL
+        inside = rounded_rect_area(self.length, self.width, GR_RAD)
+        cells = self.length_u * self.width_u
+        vol = self._shell_volume(self.lid_height, as_lid=True)
+        w = min(GR_LID_HANDLE_W, self.box_length - 2 * GR_RBOX_FRONT_L)
+        vol += _handle_volume(3, 5, 4, self.lid_height - GR_RBOX_VCUT_D, w)
+        if self.lid_baseplate:
+            # hollowed top with an inset baseplate above the hollow bottom
+            vol -= profile_volume(
+                self.length - GR_TOL,
+                self.width - GR_TOL,
+                GR_RAD,
+                [self.lid_height - 0.5, (1.0, -45)],
+                z1=self.lid_height,
+            )
+            rim = inside - rounded_rect_area(
+                self.length - GR_TOL, self.width - GR_TOL, GR_RAD
+            )
+            vol -= rim * 4.6
+            bp = GridfinityBaseplate(
+                self.length_u, self.width_u, ext_depth=0.4, straight_bottom=True
+            )
+            t = GR_BASE_TOP_CHAMF
+            base = inside - cells * rounded_rect_area(
+                GRU_CUT - 2 * t, GRU_CUT - 2 * t, GR_RAD - t
+            )
+            vol += bp.estimate()["volume"] - base * 0.3
+            vol -= rim * (GR_BASE_HEIGHT + 0.4 - 0.3 - (GRU_CUT - GRU))
+            # hollow bottom grips
+            grip = [(2.82, -22.1), (5, -45)]
+            z1 = profile_segments(grip)[0][1]
+
+            def _cup(z, t):
+                a = 22.1 if z < z1 else 45
+                w = 35 - 2 * t - 2.4 / math.cos(math.radians(a))
+                return rounded_rect_area(w, w, 0)
+
+            vol += cells * (
+                profile_volume(35, 35, 0.8, grip, z1=4.6)
+                - profile_integral(grip, _cup, 1.2, 4.6)
+            )
+        else:
+            # solid bottom grips within the hollow bottom, less the tapered
+            # grid apertures of a lid with a window
+            hollow = 5 if self.lid_window else 4.6
+            grip = [(2.82, -22.1), (4.1, -45), (9, -85), 2]
+            cell = rounded_rect_area(GRU, GRU, GR_RAD)
+            he = GR_LID_WINDOW_H / math.cos(math.radians(34))
+            aperture = [(he * SQRT2, -34)]
+
+            def _grip(z, t):
+                area = min(rounded_rect_area(35 - 2 * t, 35 - 2 * t, 0.8 - t), cell)
+                if self.lid_window:
+                    ta = profile_inset(aperture, z)
+                    area -= rounded_rect_area(30 - 2 * ta, 30 - 2 * ta, 1 - ta)
+                return area
+
+            vol -= inside * hollow
+            vol += cells * profile_integral(grip, _grip, 0, hollow, 4)
+            if self.lid_window:
+                # apertures above the hollow and the recessed window slot
+                # which is clipped by the back of the lid
+                vol -= cells * profile_volume(
+                    30, 30, 1, aperture, hollow, GR_LID_WINDOW_H
+                )
+                l, w = self.lid_window_size(width_ext=18, tol=0)
+                w = min(w / 2 + 10, self.box_width / 2 + p) + w / 2 - 10
+                ht = self.lid_height - GR_LID_WINDOW_H - self.window_th - 0.5
+                vol -= l * w * self.window_th + (l - 3) * (w - 3) * ht
+                vol -= (l - 6) * (w - 6) * 0.5
+        if self.stackable:
+            # top stacking registration features
+            qtr = math.pi / 4 * (GR_REG_R0**2 - GR_REG_R1**2) * GR_REG_H
+            vol += 4 * qtr
+        return vol
 
     @property
     def box_length(self):
@@ -283,12 +538,15 @@ class GridfinityRuggedBox(GridfinityObject):
             height -= 8
         return length - 2 * tol, height - 2 * tol
 
-    def body_shell(self, as_lid=False):
-        """General purpose render function for both the box and the lid."""
+    def body_shell(self, as_lid=False, lazy=False):
+        """General purpose render function for both the box and the lid.
+        Optionally, the shell is returned as an unevaluated CSG expression so
+        that the boolean operations which follow it are combined with its
+        clasp features."""
         height = self.box_height if not as_lid else self.lid_height
         # render overall box shape
         rs = rounded_rect_sketch(self.box_length, self.box_width, GR_RAD)
-        r = cq.Workplane("XY").placeSketch(rs).extrude(height)
+        r = csg(cq.Workplane("XY").placeSketch(rs).extrude(height))
         # back corners
         if self.rib_style:
             lb = self.box_length + 2 * (GR_RBOX_CWALL - GR_RBOX_WALL)
@@ -309,14 +567,15 @@ class GridfinityRuggedBox(GridfinityObject):
             r = r.union(composite_from_pts(rc, self.back_corner_centres))
         # front corners
         rc = cq.Workplane("XY").rect(GR_RBOX_FRONT_L, GR_RBOX_CORNER_W).extrude(height)
-        r = r.union(composite_from_pts(rc, self.front_corner_centres))
+        r = r.union(composite_from_pts(rc, self.front_corner_centres)).evaluate()
         # fillet external edges
         vs = VerticalEdgeSelector()
-        cs = StringSyntaxSelector("(<XY) or (>X and <Y) or (<X and >Y) or (>XY)")
+        cs = selector("(<XY) or (>X and <Y) or (<X and >Y) or (>XY)")
         r = r.edges(vs - cs).fillet(GR_RBOX_RAD).edges(cs).fillet(GR_RBOX_CRAD)
 
         if self.stackable or as_lid:
             # bottom stacking mates
+            r = csg(r)
             for k, v in self.qtr_centres(back=not as_lid).items():
                 rq = quarter_circle(
                     GR_BREG_R0, GR_BREG_R1, GR_REG_H + 0.5, k, chamf=0, ext=0.25
@@ -326,9 +585,10 @@ class GridfinityRuggedBox(GridfinityObject):
             for pt, rot in zip(pts, rots):
                 rc = chamf_rect(GR_REG_L, GR_REG_W, GR_REG_H, angle=rot)
                 r = r.cut(rc.translate(pt))
+            r = r.evaluate()
 
         # chamfer top edges
-        r = r.edges(">Z").chamfer(GR_RBOX_VCUT_D)
+        r = r.edges(selector(">Z")).chamfer(GR_RBOX_VCUT_D)
 
         # front lid overhang
         if as_lid:
@@ -346,13 +606,14 @@ class GridfinityRuggedBox(GridfinityObject):
                 r = r.intersect(self.render_vcut())
 
         # chamfer bottom edges
-        r = r.edges("<Z").chamfer(GR_RBOX_VCUT_D)
+        r = r.edges(selector("<Z")).chamfer(GR_RBOX_VCUT_D)
 
         # apply rib style cutouts if applicable
         if self.rib_style and not as_lid:
             r = r.intersect(self.rib_style_cut())
 
         # add clasp features
+        r = csg(r)
         rc = self.clasp_cut(as_lid=as_lid)
         if self.side_clasps:
             for pt in self.side_clasp_centres:
@@ -363,7 +624,7 @@ class GridfinityRuggedBox(GridfinityObject):
         for pt in self.front_clasp_centres:
             r = r.cut(rc.translate(pt))
             r = r.union(self.clasp_ribs(side="front", as_lid=as_lid).translate(pt))
-        return r
+        return r if lazy else r.evaluate()
 
     def render_vcut(self):
         """Renders a matching box shape with side v-cuts to intersect with main box."""
@@ -472,7 +733,7 @@ class GridfinityRuggedBox(GridfinityObject):
         )
         r = cq.Workplane("YZ").placeSketch(rs).extrude(width).translate((-hw, 0, 0))
         vs = VerticalEdgeSelector([h1]) & HasXCoordinateSelector([-hw, hw])
-        r = r.edges(vs).fillet(2.45).faces("<Z").shell(-2.5)
+        r = r.edges(vs).fillet(2.45).faces(selector("<Z")).shell(-2.5)
         vs = VerticalEdgeSelector(3) & HasYCoordinateSelector(-l1 + 2.5)
         r = r.edges(vs).fillet(1)
         rc = cq.Workplane("XY").rect(4 * hw, 4 * hw).extrude(self.lid_height)
@@ -507,14 +768,14 @@ class GridfinityRuggedBox(GridfinityObject):
         )
         rw = cq.Workplane("YZ").placeSketch(rs).extrude(2.5)
         rw = inverse_fillet(
-            rw, ">Y", 5, (StringSyntaxSelector("<Z") & EdgeLengthSelector(GR_RBOX_WALL))
+            rw, selector(">Y"), 5, (selector("<Z") & EdgeLengthSelector(GR_RBOX_WALL))
         )
         rh = []
         bs = VerticalEdgeSelector() & (HasYCoordinateSelector("<0"))
         for coord in [[0, 2.5], [0], [2.5]]:
             es = bs & HasXCoordinateSelector(coord, min_points=2)
             rh.append(rw.edges(es - HasZCoordinateSelector(">4")).chamfer(0.5))
-        r = r.faces("<Z").shell(-2.5)
+        r = r.faces(selector("<Z")).shell(-2.5)
         bs = (
             HasZCoordinateSelector(0, min_points=2)
             - EdgeLengthSelector("<%.1f" % (width - 2.5))
@@ -552,7 +813,7 @@ class GridfinityRuggedBox(GridfinityObject):
             .rect(*self.label_size(as_insert=True))
             .extrude(GR_LABEL_SLOT_TH / 2)
         )
-        rc = rc.edges("|Y and <Z").fillet(GR_LABEL_SLOT_TH / 2)
+        rc = rc.edges(selector("|Y and <Z")).fillet(GR_LABEL_SLOT_TH / 2)
         r = r.cut(rc.translate((0, 0, GR_LABEL_SLOT_TH)))
 
         # simple restraining ramps to prevent the label slipping out
@@ -560,7 +821,7 @@ class GridfinityRuggedBox(GridfinityObject):
             cq.Workplane("XZ")
             .rect(10, 2.5)
             .extrude(1.25)
-            .edges("<Y")
+            .edges(selector("<Y"))
             .chamfer(1.25 - EPS)
         )
         pts = [(-xl / 4, 0, yl / 2 - 2.0), (xl / 4, 0, yl / 2 - 2.0)]
@@ -570,13 +831,13 @@ class GridfinityRuggedBox(GridfinityObject):
             r = r.union(rc.translate(pt))
         return r
 
+    @render_part("label")
+    @monitored
     def render_label(self):
         """Renders a label panel insert"""
         rs = rounded_rect_sketch(*self.label_size(tol=3), GR_RAD)
         r = cq.Workplane("XZ").placeSketch(rs).extrude(self.label_th)
-        self._obj_label = "label"
-        self._cq_obj = r
-        return self._cq_obj
+        return detach(r)
 
     def clasp_cut(self, as_lid=False):
         """Renders the vertical channel where the clasps / latch are installed."""
@@ -594,7 +855,7 @@ class GridfinityRuggedBox(GridfinityObject):
     def clasp_rib(self, chamfered=False):
         """Renders a single clasp rib feature."""
         r = cq.Workplane("XY").rect(GR_RIB_L, GR_RIB_W).extrude(GR_RIB_H)
-        r = r.faces(">Z").edges("<X or >X").chamfer(1.0)
+        r = r.faces(selector(">Z")).edges(selector("<X or >X")).chamfer(1.0)
         if chamfered:
             rc = (
                 cq.Workplane("XZ")
@@ -606,7 +867,11 @@ class GridfinityRuggedBox(GridfinityObject):
             )
             r = r.cut(rc.translate((-GR_RIB_L / 1.85, GR_RIB_W / 2, 0)))
             rc = cq.Workplane("XY").rect(GR_RIB_L / 2, GR_RIB_W).extrude(GR_RIB_H / 3)
-            rc = rc.faces(">Z").edges("<X or >X").chamfer(GR_RIB_H / 3 - EPS)
+            rc = (
+                rc.faces(selector(">Z"))
+                .edges(selector("<X or >X"))
+                .chamfer(GR_RIB_H / 3 - EPS)
+            )
             r = r.union(rc.translate((-GR_RIB_L / 2.33, 0, 0)))
         return r
 
@@ -648,8 +913,8 @@ class GridfinityRuggedBox(GridfinityObject):
                 .segment((l2, 0))
                 .close()
                 .assemble()
-                .vertices(">Y")
-                .vertices("<X or >X")
+                .vertices(selector(">Y"))
+                .vertices(selector("<X or >X"))
                 .fillet(GR_RAD)
                 .reset()
                 .push([(0, GR_HANDLE_H / 2)])
@@ -659,14 +924,16 @@ class GridfinityRuggedBox(GridfinityObject):
             if not small_hole:
                 face = ">X" if side == "left" else "<X"
                 r = (
-                    r.faces(face)
+                    r.faces(selector(face))
                     .workplane()
                     .pushPoints([(0, GR_HANDLE_H / 2)])
                     .hole(M3_CB_DIAM, M3_CB_DEPTH)
                 )
 
-            r = inverse_fillet(r, "<Z", GR_RAD, EdgeLengthSelector(GR_HANDLE_W))
-            r = r.faces(">Z").chamfer(0.75)
+            r = inverse_fillet(
+                r, selector("<Z"), GR_RAD, EdgeLengthSelector(GR_HANDLE_W)
+            )
+            r = r.faces(selector(">Z")).chamfer(0.75)
             return rotate_x(r, 90)
 
         h1 = _bracket(small_hole=True, side=side)
@@ -675,6 +942,8 @@ class GridfinityRuggedBox(GridfinityObject):
         r = recentre(h1.union(h2.translate((xo, 0, 0))), "xz")
         return r
 
+    @render_part("handle")
+    @monitored
     def render_handle(self):
         """Renders the front handle"""
         self.check_dimensions()
@@ -682,6 +951,10 @@ class GridfinityRuggedBox(GridfinityObject):
         if not self.long_enough_for_handle:
             print("Rugged box length dimension too small to include a handle")
             return None
+        return self.cached(("handle", x2), self._render_handle)
+
+    def _render_handle(self):
+        x2 = self.right_handle_centre[0]
         wt, h, rh = GR_HANDLE_TH, GR_HANDLE_SZ, GR_HANDLE_RAD
         lt, ht = (2 * x2) - 2 * rh, h - rh - wt / 2
         path = {
@@ -690,13 +963,17 @@ class GridfinityRuggedBox(GridfinityObject):
         }
         cw = Ribbon("XZ", path)
         cw.direction = -90
-        r = cw.render().extrude(wt).faces(">Z").edges("|X").fillet(wt / 2 - EPS)
+        r = (
+            cw.render()
+            .extrude(wt)
+            .faces(selector(">Z"))
+            .edges(selector("|X"))
+            .fillet(wt / 2 - EPS)
+        )
         r = recentre(r.edges().chamfer(1), "XY")
         rc = cq.Workplane("YZ").circle(M3_CLR_DIAM / 2).extrude(8 * lt)
         r = r.cut(rc.translate((-4 * lt, 0, h - M3_CLR_DIAM)))
-        self._obj_label = "handle"
-        self._cq_obj = r
-        return self._cq_obj
+        return detach(r)
 
     def render_back_foot(self):
         """Renders a corresponding rear foot the same depth as the hinge for standing
@@ -705,8 +982,40 @@ class GridfinityRuggedBox(GridfinityObject):
         rc = cq.Workplane("YZ").placeSketch(rs).extrude(self.hinge_width - 0.4)
         return recentre(rc).edges().chamfer(1).translate((0, 0, GR_HINGE_RAD))
 
+    def sub_solids(self):
+        stages = [
+            [
+                (self, ("hinge_mount", self.hinge_width), self._hinge_mount, ()),
+                (self, ("latch", self.lid_height), self._render_latch, ()),
+            ]
+        ]
+        key = ("hinge", self.hinge_width, self.hinge_bolted, False, None)
+        stages[0].append((self, key, self._render_hinge, (False, None)))
+        if self.front_handle and self.long_enough_for_handle:
+            key = ("handle", self.right_handle_centre[0])
+            stages[0].append((self, key, self._render_handle, ()))
+        baseplates = []
+        if self.inside_baseplate:
+            baseplates.append(
+                GridfinityBaseplate(self.length_u, self.width_u, ext_depth=1.6)
+            )
+        if self.lid_baseplate:
+            baseplates.append(
+                GridfinityBaseplate(
+                    self.length_u, self.width_u, ext_depth=0.4, straight_bottom=True
+                )
+            )
+        for bp in baseplates:
+            # baseplate pockets are single stage sub-solids
+            for stage in bp.sub_solids():
+                stages[0].extend(stage)
+        return stages
+
     def hinge_mount(self):
         """Mounting cutout for hinge"""
+        return self.cached(("hinge_mount", self.hinge_width), self._hinge_mount)
+
+    def _hinge_mount(self):
         l1, l2, l3 = self.hinge_width + 2, self.hinge_width, (self.hinge_width - 2) / 2
         r = cq.Workplane("XY").rect(l1, GR_HINGE_W1).extrude(GR_HINGE_H1)
         r = r.translate((0, -GR_HINGE_W1 / 2, -GR_HINGE_H1))
@@ -715,7 +1024,7 @@ class GridfinityRuggedBox(GridfinityObject):
         bs = HasZCoordinateSelector(-GR_HINGE_H1) & EdgeLengthSelector(
             [l2, GR_HINGE_W2]
         )
-        r = r.union(r2).edges(bs).edges(">Y or <X or >X").chamfer(0.75)
+        r = r.union(r2).edges(bs).edges(selector(">Y or <X or >X")).chamfer(0.75)
         rs = rounded_rect_sketch(l3, GR_HINGE_W3, 0.5)
         r3 = cq.Workplane("XY").placeSketch(rs).extrude(GR_HINGE_H2)
         xo, yo = GR_HINGE_SEP / 2 + l3 / 2, -GR_HINGE_W1 - 1.2 - GR_HINGE_W3 / 2
@@ -725,7 +1034,7 @@ class GridfinityRuggedBox(GridfinityObject):
         for pt in [(-xo, yo, -GR_HINGE_H2), (xo, yo, -GR_HINGE_H2)]:
             r = r.union(r3.translate(pt))
             r = r.union(rh.translate(pt))
-        return r
+        return detach(r)
 
     def hex_cut(self, depth=None):
         """Hexagonal shaped latch for hinge attachment"""
@@ -746,39 +1055,61 @@ class GridfinityRuggedBox(GridfinityObject):
         )
         r = cq.Workplane("XZ").placeSketch(rs).extrude(d).translate((0, d, -h / 2))
         if depth is not None:
-            r = r.edges("<Z and >Y").chamfer(depth - EPS)
+            r = r.edges(selector("<Z and >Y")).chamfer(depth - EPS)
         return r
 
+    @render_part("latch")
+    @monitored
     def render_latch(self):
         """Renders the latch element used to secure the box and the lid."""
+        return self.cached(("latch", self.lid_height), self._render_latch)
+
+    def _render_latch(self):
         l2, w2, h2 = GR_LATCH_L / 2, GR_LATCH_W / 2, GR_LATCH_H / 2
         c2, th = GR_RIB_CTR / 2, 2.5
         hf = GR_LATCH_H - th
         yc = (-1.575, 1.575)
         r = cq.Workplane("XY").rect(GR_LATCH_L, GR_LATCH_W).extrude(GR_LATCH_H)
-        r = r.edges("|Y").edges(">X").chamfer(1.0)
+        r = r.edges(selector("|Y")).edges(selector(">X")).chamfer(1.0)
         rs = cq.Sketch().slot(10, GR_LATCH_H, 0)
         rc = cq.Workplane("XZ").placeSketch(rs).extrude(GR_LATCH_W)
         r = r.union(rc.translate((-l2 + 4.5, w2, h2)))
-        rc = cq.Workplane("XY").rect(16, 15.6).extrude(10).edges("|Z").fillet(4.0)
+        rc = (
+            cq.Workplane("XY")
+            .rect(16, 15.6)
+            .extrude(10)
+            .edges(selector("|Z"))
+            .fillet(4.0)
+        )
         r = r.cut(rc.translate((-l2 - 8, 0, 0)))
 
         rc = cq.Workplane("XY").rect(5, GR_LATCH_W - 2.4).extrude(10)
-        rc = rc.faces("<Z").edges("|X").fillet(1.5).edges("|Z").fillet(1.0)
+        rc = (
+            rc.faces(selector("<Z"))
+            .edges(selector("|X"))
+            .fillet(1.5)
+            .edges(selector("|Z"))
+            .fillet(1.0)
+        )
         r = r.cut(rc.translate((l2, 0, 2.0))).edges().chamfer(0.25)
 
         rc = cq.Workplane("XY").rect(GR_LATCH_IL, GR_LATCH_IW).extrude(hf)
         for x in (-GR_RIB_CTR, 0, GR_RIB_CTR):
             r = r.cut(rc.translate((x - 1.25, 0, th)))
-        r = r.faces(">Z").edges(EdgeLengthSelector(GR_LATCH_IW)).chamfer(1.5)
-        r = r.faces(">Z").edges(EdgeLengthSelector(GR_LATCH_IL)).chamfer(0.25)
+        r = r.faces(selector(">Z")).edges(EdgeLengthSelector(GR_LATCH_IW)).chamfer(1.5)
+        r = r.faces(selector(">Z")).edges(EdgeLengthSelector(GR_LATCH_IL)).chamfer(0.25)
 
         rc = cq.Workplane("XY").rect(20, 2.4).extrude(hf)
         r = r.cut(rc.translate((0, 0, th)))
-        r = r.faces(">Z").edges(EdgeLengthSelector(1.8)).edges("|X").chamfer(0.25)
+        r = (
+            r.faces(selector(">Z"))
+            .edges(EdgeLengthSelector(1.8))
+            .edges(selector("|X"))
+            .chamfer(0.25)
+        )
 
         rc = cq.Workplane("XY").rect(8.5, 0.75).extrude(4.5)
-        rc = rc.faces(">Z").edges("|Y").chamfer(1.5)
+        rc = rc.faces(selector(">Z")).edges(selector("|Y")).chamfer(1.5)
         bs = EdgeLengthSelector(">0.8") - HasZCoordinateSelector(0, min_points=2)
         rc = rc.edges(bs).chamfer(0.2)
         (_, _, _), (xm, _, _) = bounds_3d(r)
@@ -791,7 +1122,13 @@ class GridfinityRuggedBox(GridfinityObject):
             for pt in [(x, y, th) for y in yc]:
                 r = r.union(rx.translate(pt))
 
-        rc = cq.Workplane("XZ").rect(2, 3.2).extrude(0.6).edges("<Y").chamfer(0.6 - EPS)
+        rc = (
+            cq.Workplane("XZ")
+            .rect(2, 3.2)
+            .extrude(0.6)
+            .edges(selector("<Y"))
+            .chamfer(0.6 - EPS)
+        )
         xo = xm - self.lid_height
         for angle, y in [(0, -w2), (180, w2)]:
             r = r.union(rotate_z(rc, angle).translate((xo, y, h2)))
@@ -805,17 +1142,27 @@ class GridfinityRuggedBox(GridfinityObject):
             .chamfer(0.3 - EPS)
         )
 
-        rc = cq.Workplane("XZ").circle(3.8 / 2).extrude(2).faces("<Y").chamfer(0.5)
+        rc = (
+            cq.Workplane("XZ")
+            .circle(3.8 / 2)
+            .extrude(2)
+            .faces(selector("<Y"))
+            .chamfer(0.5)
+        )
         re = cq.Workplane("XY").rect(50, 50).extrude(20).translate((0, 0, -1.7))
         rc = rc.intersect(rotate_x(re, -10))
         for angle, y in [(0, -w2), (180, w2)]:
             r = r.union(rotate_z(rc, angle).translate((-17.45, y, h2)))
-        self._cq_obj = rotate_z(recentre(r, "xy"), -90)
-        self._obj_label = "latch"
-        return self._cq_obj
+        return detach(rotate_z(recentre(r, "xy"), -90))
 
+    @render_part("hinge")
+    @monitored
     def render_hinge(self, as_closed=False, section=None):
         """Renders the rear hinge."""
+        key = ("hinge", self.hinge_width, self.hinge_bolted, as_closed, section)
+        return self.cached(key, self._render_hinge, as_closed, section)
+
+    def _render_hinge(self, as_closed=False, section=None):
         tol = 0.125
         cl = 2 * (GR_HINGE_OFFS + GR_HINGE_D + GR_HINGE_W2 / 2)
         wh, dh = GR_HINGE_W2 - GR_HINGE_TOL, GR_HINGE_H2 - 1
@@ -834,14 +1181,18 @@ class GridfinityRuggedBox(GridfinityObject):
             r = r.union(rc)
             bs = VerticalEdgeSelector() & HasYCoordinateSelector(ws)
             if side == "left":
-                r = r.edges(VerticalEdgeSelector()).edges("<XY").chamfer(1.0)
+                r = r.edges(VerticalEdgeSelector()).edges(selector("<XY")).chamfer(1.0)
                 bs = bs & HasXCoordinateSelector(wh)
             else:
-                r = r.edges(VerticalEdgeSelector()).edges(">X and <Y").chamfer(1.0)
+                r = (
+                    r.edges(VerticalEdgeSelector())
+                    .edges(selector(">X and <Y"))
+                    .chamfer(1.0)
+                )
                 bs = bs & HasXCoordinateSelector(cl)
             r = r.edges(bs).chamfer(1.1)
-            r = r.faces(">Y").edges(EdgeLengthSelector(wh)).chamfer(1.5)
-            return r
+            r = r.faces(selector(">Y")).edges(EdgeLengthSelector(wh)).chamfer(1.5)
+            return detach(r)
 
         rl = _bracket(side="left")
         for pt in [0, hc]:
@@ -887,14 +1238,15 @@ class GridfinityRuggedBox(GridfinityObject):
             r = rr if section == "outer" else rl
         else:
             r = rl.union(rr)
-        self._cq_obj = r
-        self._obj_label = "hinge"
-        return self._cq_obj
+        return detach(r)
 
+    @render_part("body")
+    @monitored
     def render(self):
         """Renders the rugged box body shell."""
         self.check_dimensions()
-        r = self.body_shell(as_lid=False)
+        render_stage("shell", 0.05)
+        r = self.body_shell(as_lid=False, lazy=True)
 
         # hollow out
         rc = (
@@ -905,6 +1257,7 @@ class GridfinityRuggedBox(GridfinityObject):
         r = r.cut(rc.translate((0, 0, GR_RBOX_FLOOR)))
 
         # add registration features
+        render_stage("registration", 0.3)
         pts, rots = self.align_centres
         for pt, rot in zip(pts, rots):
             rc = chamf_rect(
@@ -936,8 +1289,16 @@ class GridfinityRuggedBox(GridfinityObject):
         for pt in self.hinge_centres:
             r = r.cut(rc.translate(pt))
 
+        render_stage("body", 0.35)
+
         # add side handles
         if self.side_handles:
+            # the side handle fillets need the evaluated body, otherwise the
+            # body is combined with the remaining features and the floor
+            r = detach(r.evaluate())
+            # the tool solids of the body stage are no longer needed
+            del rc, rq
+            render_stage("side handles", 0.5)
             w = min(GR_SIDE_HANDLE_W, self.box_width - 2 * GR_RBOX_CORNER_W)
             rh = self.side_handle(width=w)
             rl = rotate_z(rh, -90)
@@ -947,36 +1308,41 @@ class GridfinityRuggedBox(GridfinityObject):
             r = r.union(rr.translate((self.box_length / 2, 0, zo)))
             hw, l2 = w / 2, self.box_length / 2
             vs = HasXCoordinateSelector([-l2, l2]) & HasYCoordinateSelector([-hw, hw])
-            r = r.edges("|Z").edges(vs).fillet(2.5)
+            r = detach(r.edges(selector("|Z")).edges(vs).fillet(2.5))
+            del rh, rl, rr
 
         # add front label slot
+        r = csg(r)
         if self.front_label:
             r = r.union(self.label_slot().translate(self.label_centre))
 
         # back feet
         if self.back_feet:
+            render_stage("back feet", 0.6)
             rc = self.render_back_foot()
             for pt in self.hinge_centres:
                 r = r.union(rc.translate((pt[0], pt[1], 0)))
 
         # add baseplate
+        render_stage("floor", 0.65)
         if self.inside_baseplate:
             rb = GridfinityBaseplate(self.length_u, self.width_u, ext_depth=1.6)
-            r = r.union(rb.render().translate((0, 0, GR_RBOX_FLOOR)))
+            r = r.union(rb.render().translate((0, 0, GR_RBOX_FLOOR))).evaluate()
             r = r.edges(FlatEdgeSelector(GR_RBOX_FLOOR)).chamfer(0.8)
         else:
             rb = self.extrude_profile(
                 rounded_rect_sketch(self.length, self.width, GR_RAD), [GR_RBOX_WALL]
             )
-            r = r.union(rb)
-        self._cq_obj = r
-        self._obj_label = "body"
-        return self._cq_obj
+            r = r.union(rb).evaluate()
+        return detach(r)
 
+    @render_part("lid")
+    @monitored
     def render_lid(self):
         """Renders the rugged box lid."""
         self.check_dimensions()
-        r = self.body_shell(as_lid=True)
+        render_stage("shell", 0.05)
+        r = self.body_shell(as_lid=True, lazy=True)
 
         if self.lid_baseplate:
             # hollow out top half
@@ -984,6 +1350,7 @@ class GridfinityRuggedBox(GridfinityObject):
             rc = self.extrude_profile(rs, [self.lid_height - 0.5, (1.0, -45)])
             r = r.cut(rc)
             # add topside baseplate
+            render_stage("baseplate", 0.2)
             rb = GridfinityBaseplate(
                 self.length_u, self.width_u, ext_depth=0.4, straight_bottom=True
             )
@@ -1004,7 +1371,7 @@ class GridfinityRuggedBox(GridfinityObject):
             rs = self.extrude_profile(
                 rounded_rect_sketch(35, 35, 0.8), [(2.82, -22.1), (5, -45)]
             )
-            rs = rs.faces(">Z").shell(-1.2)
+            rs = rs.faces(selector(">Z")).shell(-1.2)
         else:
             rs = self.extrude_profile(
                 rounded_rect_sketch(35, 35, 0.8),
@@ -1015,18 +1382,24 @@ class GridfinityRuggedBox(GridfinityObject):
         rs = rounded_rect_sketch(self.length, self.width, GR_RAD)
         ra = ra.intersect(cq.Workplane("XY").placeSketch(rs).extrude(GR_LID_WINDOW_H))
 
-        r = r.union(ra)
+        render_stage("feet", 0.4)
+        r = r.union(ra).evaluate()
         r = r.edges(
             EdgeLengthSelector(33.4) & HasZCoordinateSelector(0, min_points=2)
         ).chamfer(0.75)
+        r = detach(r)
+        # the tool solids of the shell and feet stages are no longer needed
+        del ra, rs
 
         # add optional stackable features
+        r = csg(r)
         if self.stackable:
             for k, v in self.qtr_centres(tol=0.125, at_height=self.lid_height).items():
                 rq = quarter_circle(GR_REG_R0, GR_REG_R1, GR_REG_H, k)
                 r = r.union(rq.translate(v))
 
         if self.lid_window:
+            render_stage("window", 0.6)
             # hollow the grid apertures
             ht, tp = GR_LID_WINDOW_H, 34
             he = GR_LID_WINDOW_H / math.cos(math.radians(tp))
@@ -1035,9 +1408,8 @@ class GridfinityRuggedBox(GridfinityObject):
                 .placeSketch(rounded_rect_sketch(30, 30, 1))
                 .extrude(he, taper=-tp)
             )
-            ra = composite_from_pts(rs, self.grid_centres)
-            ra = ra.translate((-self.half_l, -self.half_w, 0))
-            r = r.cut(ra)
+            ra = GridPattern.grid(rs, self.length_u, self.width_u, centred=True)
+            r = r.cut(*ra.shapes())
 
             # window slot
             ext = 20
@@ -1074,19 +1446,20 @@ class GridfinityRuggedBox(GridfinityObject):
                 cq.Workplane("XY")
                 .circle(M2_DIAM / 2)
                 .extrude(5)
-                .faces(">Z")
+                .faces(selector(">Z"))
                 .wires()
                 .toPending()
                 .extrude(0.8, taper=-45)
-                .faces("<Z")
+                .faces(selector("<Z"))
                 .chamfer(0.5)
             )
             for pt in self.lid_window_hole_pos(z=1):
                 r = r.cut(rc.translate(pt))
-        self._cq_obj = r
-        self._obj_label = "lid"
-        return self._cq_obj
+        render_stage("lid", 0.7)
+        return detach(r.evaluate())
 
+    @render_part("lid_window")
+    @monitored
     def render_lid_window(self):
         rs = rounded_rect_sketch(*self.lid_window_size(), 0.5)
         r = cq.Workplane("XY").placeSketch(rs).extrude(self.window_th)
@@ -1094,16 +1467,17 @@ class GridfinityRuggedBox(GridfinityObject):
         rc = cq.Workplane("XY").circle(M2_CLR_DIAM / 2).extrude(self.window_th)
         for pt in self.lid_window_hole_pos(z=0):
             r = r.cut(rc.translate(pt))
-        self._cq_obj = r
-        self._obj_label = "lid_window"
-        return self._cq_obj
+        return detach(r)
 
+    @render_part("acc")
+    @monitored
     def render_accessories(self):
         """Render functional accessories which are installed to main box body."""
         margin = 8
         latch_count = 2
         if self.side_clasps:
             latch_count += 4
+        render_stage("latches", 0.05)
         rl = self.render_latch()
         sx, sy = size_2d(rl)
         pts = [(x * (sx + margin) + sx / 2, sy / 2, 0) for x in range(latch_count)]
@@ -1111,11 +1485,13 @@ class GridfinityRuggedBox(GridfinityObject):
         oy = sy + margin
 
         if self.front_handle:
+            render_stage("handle", 0.3)
             rh = recentre(rotate_x(self.render_handle(), -90))
             hsx, hsy, hsz = size_3d(rh)
             r = r.union(rh.translate((hsx / 2, oy + hsy / 2, hsz / 2)))
             oy += hsy + margin
 
+        render_stage("hinges", 0.5)
         rh = self.render_hinge()
         hsx, hsy = size_2d(rh)
         r = r.union(rh.translate((margin, oy, 0)))
@@ -1123,20 +1499,23 @@ class GridfinityRuggedBox(GridfinityObject):
         r = r.union(rh.translate((3 * hsx + margin, oy, 0)))
         r = r.union(rh.translate((4.5 * hsx + margin, oy + hsy / 2, 0)))
 
+        render_stage("label", 0.8)
         rl = self.render_label()
         rl = rotate_x(rl, 90)
         r = r.union(rl.translate((40, -20, 0.5)))
 
-        self._cq_obj = r
-        self._obj_label = "acc"
-        return self._cq_obj
+        return detach(r)
 
+    @render_part("assembly")
+    @monitored
     def render_assembly(self):
         """Renders a CadQuery Assembly object representing the entire box with accessories"""
         self.check_dimensions()
+        render_stage("body", 0.0)
         r = self.render()
         a = cq.Assembly(obj=r, name="Gridfinity Rugged Box", color=self.box_color)
 
+        render_stage("lid", 0.4)
         r = self.render_lid()
         r = r.translate((0, 0, self.box_height))
         a.add(r, color=self.lid_color, name="Lid")
@@ -1152,6 +1531,7 @@ class GridfinityRuggedBox(GridfinityObject):
             r = r.translate((0, -self.box_width / 2 - GR_HANDLE_H / 2, zo))
             a.add(r, color=self.handle_color, name="Handle")
 
+        render_stage("latches", 0.7)
         rf = rotate_x(self.render_latch(), -90)
         idx = 1
         yo = GR_LATCH_H / 2
@@ -1174,6 +1554,7 @@ class GridfinityRuggedBox(GridfinityObject):
                     a.add(rr.translate(pt), color=self.latch_color, name=name)
                 idx += 1
 
+        render_stage("hinges", 0.8)
         for i, section in [(a, b) for a in (0, 1) for b in ("inner", "outer")]:
             r = recentre(self.render_hinge(as_closed=True, section=section), "yz")
             r = rotate_y(r, 90)
@@ -1186,8 +1567,21 @@ class GridfinityRuggedBox(GridfinityObject):
             )
 
         if self.front_label:
+            render_stage("label", 0.95)
             r = self.render_label()
             a.add(r.translate(self.label_centre), color=self.label_color, name="Label")
-        self._obj_label = "assembly"
-        self._cq_obj = a
-        return self._cq_obj
+        return a
+
+
+def _handle_volume(l0, l1, h1, h2, width, th=GR_RBOX_WALL):
+    """Volume of the hollow handle lip shape used by the lid and side handles
+    which protrudes from the box wall. The handle profile rises from h1 at
+    l1 from the wall to h2 + l0 at l0 inside the wall and is hollowed out from
+    below with a wall thickness of th."""
+    slope = (h2 + l0 - h1) / (l0 + l1)
+    outer = polygon_area([(0, 0), (-l1, 0), (-l1, h1), (0, h1 + slope * l1)])
+    xi = th - l1
+    yo = th * math.sqrt(1 + slope * slope)
+    yi = [h1 + slope * (x + l1) - yo for x in (xi, 0)]
+    inner = polygon_area([(xi, 0), (0, 0), (0, yi[1]), (xi, yi[0])])
+    return (outer - inner) * width + 2 * th * inner
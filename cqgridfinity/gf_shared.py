@@ -0,0 +1,233 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Gridfinity geometry shared between processes
+
+import glob
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+import cadquery as cq
+
+import cqgridfinity
+
+# directory of the RAM backed file system where it is available
+SHM_DIR = "/dev/shm"
+
+
+class SharedGeometryStore:
+    """Gridfinity shared geometry store
+
+    This class stores rendered sub-solids as serialized BREP blobs in a
+    directory which is shared by several processes, usually in the RAM backed
+    /dev/shm file system. A GeometryCache with a shared store looks up every
+    sub-solid which it does not hold itself in the store and adds the
+    sub-solids it renders to it, so that a sub-solid rendered by one worker
+    process is immediately re-used by all the others. Each blob is written
+    to a temporary file and renamed into place, so readers never see a
+    partial blob. Blobs are read through a memory map. The modification time
+    of a blob is its last access time, and the least recently used blobs are
+    evicted when the store exceeds its size limit. The total size of the
+    blobs is kept in a small file which every process updates as it adds
+    blobs, so the blobs are only listed when the store is over its limit.
+    A store is pickled by
+    its directory, so it can be passed to worker processes.
+      path - directory of the store. By default a new directory is created
+        in /dev/shm (or the temporary directory if /dev/shm is not available)
+        which is removed by close().
+      max_size - size limit of the store in MB
+    Keys are prefixed with the cq-gridfinity version, so that a store which
+    outlives an upgrade does not return stale geometry.
+    """
+
+    def __init__(self, path=None, max_size=512):
+        self.owner = path is None
+        if path is None:
+            base = SHM_DIR if os.path.isdir(SHM_DIR) else None
+            path = tempfile.mkdtemp(prefix="cqgridfinity-", dir=base)
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if not os.path.isfile(os.path.join(self.path, ".size")):
+            with self._lock():
+                self._set_total(self._total())
+
+    def __getstate__(self):
+        return {"path": self.path, "max_size": self.max_size}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["max_size"])
+
+    def __len__(self):
+        return len(self._blobs())
+
+    def __contains__(self, key):
+        return os.path.isfile(self._filename(key))
+
+    def __str__(self):
+        return "Shared geometry store in %s with %d solids (%.1f MB)" % (
+            self.path,
+            len(self),
+            self.size,
+        )
+
+    def _filename(self, key):
+        return os.path.join(self.path, "%s-%s.brep" % (cqgridfinity.__version__, key))
+
+    def _blobs(self):
+        return glob.glob(os.path.join(self.path, "*.brep"))
+
+    def _lock(self):
+        # returns an open lock file which serializes the updates of the
+        # blobs and their total size by all processes until it is closed
+        lock = open(os.path.join(self.path, ".lock"), "w")
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def _total(self):
+        # returns the total size of the blobs in bytes, which is only
+        # counted from the blobs if the size file is missing or unreadable
+        try:
+            with open(os.path.join(self.path, ".size")) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return sum(size for _, size, _ in self._blob_stats())
+
+    def _set_total(self, total):
+        with open(os.path.join(self.path, ".size"), "w") as f:
+            f.write(str(max(total, 0)))
+
+    def _blob_stats(self):
+        blobs = []
+        for fn in self._blobs():
+            try:
+                st = os.stat(fn)
+            except OSError:
+                continue
+            blobs.append((st.st_mtime_ns, st.st_size, fn))
+        return blobs
+
+    @property
+    def size(self):
+        """The total size of the stored blobs in MB."""
+        return self._total() / 2**20
+
+    def get(self, key):
+        """Returns a tuple of the sub-solid stored with a key (which may be
+        None) and the time it took to render, or None if it is not in the
+        store."""
+        fn = self._filename(key)
+        try:
+            with open(fn, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    render_time, shapes = pickle.loads(m)
+            # file times default to a coarse clock, so that the access
+            # order of blobs read in quick succession would be lost
+            now = time.time_ns()
+            os.utime(fn, ns=(now, now))
+        except (OSError, ValueError, EOFError):
+            # missing, or evicted by another process while being read
+            self.misses += 1
+            return None
+        self.hits += 1
+        if shapes is None:
+            return None, render_time
+        return cq.Workplane("XY").newObject(shapes), render_time
+
+    def put(self, key, r, render_time=0.0, spec=None):
+        """Adds a rendered sub-solid to the store with the time it took to
+        render. spec is the GeometryCache key tuple of the sub-solid, which
+        is not stored. The least recently used sub-solids are evicted if the
+        store exceeds its size limit."""
+        shapes = r.vals() if r is not None else None
+        data = pickle.dumps((render_time, shapes), protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_size * 2**20:
+            return
+        fn = self._filename(key)
+        tmp = "%s.%s.tmp" % (fn, uuid.uuid4().hex)
+        with open(tmp, "wb") as f:
+            f.write(data)
+        with self._lock():
+            try:
+                replaced = os.path.getsize(fn)
+            except OSError:
+                replaced = 0
+            os.replace(tmp, fn)
+            now = time.time_ns()
+            os.utime(fn, ns=(now, now))
+            total = self._total() + len(data) - replaced
+            if total > self.max_size * 2**20:
+                self.evictions += self._evict(self.max_size)
+            else:
+                self._set_total(total)
+
+    def evict(self, max_size=None):
+        """Removes the least recently used sub-solids until the store is
+        within max_size MB (default is the size limit of the store). Returns
+        the number of sub-solids removed."""
+        max_size = max_size if max_size is not None else self.max_size
+        with self._lock():
+            removed = self._evict(max_size)
+        self.evictions += removed
+        return removed
+
+    def _evict(self, max_size):
+        # evicts with the lock held, counting the total size from the blobs
+        # so that the size file is corrected if it has drifted
+        blobs = self._blob_stats()
+        total = sum(size for _, size, _ in blobs)
+        removed = 0
+        for _, size, fn in sorted(blobs):
+            if total <= max_size * 2**20:
+                break
+            try:
+                os.remove(fn)
+            except OSError:
+                pass
+            total -= size
+            removed += 1
+        self._set_total(total)
+        return removed
+
+    def clear(self):
+        """Removes every sub-solid from the store."""
+        return self.evict(0)
+
+    def close(self):
+        """Removes the store directory if it was created by this store."""
+        if self.owner:
+            shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,510 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Gridfinity lightweight specifications
+
+from collections import namedtuple
+import json
+import math
+
+from cqgridfinity.constants import *
+
+# A specification error identifying the offending parameter, its value and
+# a readable description of the problem
+SpecError = namedtuple("SpecError", ["param", "value", "message"])
+
+# A declared object parameter with its type, default value, optional valid
+# range and a short description. A default of None means the parameter is
+# optional and is computed from the other parameters when not specified.
+Param = namedtuple(
+    "Param",
+    ["name", "type", "default", "min", "max", "help"],
+    defaults=(None, None, ""),
+)
+
+
+class GridfinitySpecError(ValueError):
+    """Exception raised for an invalid object specification. The list of
+    SpecError tuples describing every problem is available as errors."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("; ".join(e.message for e in self.errors))
+
+
+class GridfinitySpec:
+    """Base Gridfinity specification class
+
+    This class bundles the declared parameters, specification rules and
+    dimension properties of Gridfinity objects which only depend on their
+    parameters. It does not depend on CadQuery so that specifications can
+    be planned and validated without loading the geometry libraries.
+
+    Each derived class declares its parameters in PARAMS as a list of Param
+    tuples. The schema is used to serialize objects with to_dict/to_json and
+    re-create them with from_dict/from_json, and to generate the command
+    line options and PartCAD shims. The defaults of required dimensions are
+    the example values used by the PartCAD shims.
+
+    Each derived class lists the rules for a valid specification in RULES as
+    (param, message, predicate) tuples where predicate(obj) is true if the
+    rule is broken. Rules only depend on object attributes and properties so
+    that specifications can be validated before any geometry is rendered.
+    The ranges of the declared parameters are checked before the rules.
+    """
+
+    __slots__ = ()
+
+    PARAMS = []
+    RULES = []
+
+    @property
+    def length(self):
+        return self.length_u * GRU
+
+    @property
+    def width(self):
+        return self.width_u * GRU
+
+    @property
+    def height(self):
+        return 3.8 + GRHU * self.height_u
+
+    @property
+    def int_height(self):
+        h = self.height - GR_LIP_H - GR_BOT_H
+        if self.lite_style:
+            return h + self.wall_th
+        return h
+
+    @property
+    def max_height(self):
+        return self.int_height + GR_UNDER_H + GR_TOPSIDE_H
+
+    @property
+    def floor_h(self):
+        if self.lite_style:
+            return GR_FLOOR - self.wall_th
+        return GR_FLOOR
+
+    @property
+    def lip_width(self):
+        if self.no_lip:
+            return self.wall_th
+        return GR_UNDER_H + self.wall_th
+
+    @property
+    def outer_l(self):
+        return self.length_u * GRU - GR_TOL
+
+    @property
+    def outer_w(self):
+        return self.width_u * GRU - GR_TOL
+
+    @property
+    def outer_dim(self):
+        return self.outer_l, self.outer_w
+
+    @property
+    def inner_l(self):
+        return self.outer_l - 2 * self.wall_th
+
+    @property
+    def inner_w(self):
+        return self.outer_w - 2 * self.wall_th
+
+    @property
+    def inner_dim(self):
+        return self.inner_l, self.inner_w
+
+    @property
+    def half_l(self):
+        return (self.length_u - 1) * GRU2
+
+    @property
+    def half_w(self):
+        return (self.width_u - 1) * GRU2
+
+    @property
+    def half_dim(self):
+        return self.half_l, self.half_w
+
+    @property
+    def half_in(self):
+        return GRU2 - self.wall_th - GR_TOL / 2
+
+    @property
+    def outer_rad(self):
+        return GR_RAD - GR_TOL / 2
+
+    @property
+    def inner_rad(self):
+        return self.outer_rad - self.wall_th
+
+    @property
+    def under_h(self):
+        return GR_UNDER_H - (self.wall_th - GR_WALL)
+
+    @property
+    def safe_fillet_rad(self):
+        if not any([self.scoops, self.labels, self.length_div, self.width_div]):
+            return GR_FILLET
+        return min(GR_FILLET, (GR_UNDER_H + GR_WALL) - self.wall_th - 0.05)
+
+    @property
+    def grid_centres(self):
+        return [
+            (x * GRU, y * GRU)
+            for x in range(self.length_u)
+            for y in range(self.width_u)
+        ]
+
+    @property
+    def hole_centres(self):
+        return [
+            (x * GRU - GR_HOLE_DIST * i, -(y * GRU - GR_HOLE_DIST * j))
+            for x in range(self.length_u)
+            for y in range(self.width_u)
+            for i in (-1, 1)
+            for j in (-1, 1)
+        ]
+
+    @classmethod
+    def param(cls, name):
+        """Returns the declared Param of a parameter."""
+        for p in cls.PARAMS:
+            if p.name == name:
+                return p
+        raise ValueError("%s has no parameter %s" % (cls.__name__, name))
+
+    @classmethod
+    def parse_param(cls, text):
+        """Returns the name and value of a "name=value" parameter assignment,
+        e.g. from a command line option, with the value converted to the
+        declared type of the parameter."""
+        name, sep, value = (x.strip() for x in text.partition("="))
+        if not sep:
+            raise ValueError("Parameter %s must be assigned as name=value" % (text))
+        p = cls.param(name)
+        if p.default is None and value.lower() == "none":
+            return name, None
+        if p.type is bool:
+            if value.lower() in ("1", "true", "yes", "on"):
+                return name, True
+            if value.lower() in ("0", "false", "no", "off"):
+                return name, False
+            raise ValueError("Parameter %s must be true or false" % (name))
+        return name, p.type(value)
+
+    @classmethod
+    def rules(cls):
+        """Returns the specification rules of the class, i.e. the declared
+        parameter ranges followed by RULES."""
+        rules = []
+        for p in cls.PARAMS:
+            if p.min is not None:
+                rules.append(
+                    (
+                        p.name,
+                        "%s must be at least %s" % (p.name, p.min),
+                        lambda obj, p=p: getattr(obj, p.name) < p.min,
+                    )
+                )
+            if p.max is not None:
+                rules.append(
+                    (
+                        p.name,
+                        "%s cannot exceed %s" % (p.name, p.max),
+                        lambda obj, p=p: getattr(obj, p.name) > p.max,
+                    )
+                )
+        return rules + cls.RULES
+
+    def validate(self):
+        """Returns a list of SpecError tuples for every broken specification
+        rule of this object. An empty list means the object can be rendered."""
+        return [
+            SpecError(param, getattr(self, param), message)
+            for param, message, broken in self.rules()
+            if broken(self)
+        ]
+
+    def check_valid(self):
+        """Raises a GridfinitySpecError if the object specification is invalid."""
+        errors = self.validate()
+        if errors:
+            raise GridfinitySpecError(errors)
+
+    def to_dict(self):
+        """Returns a dictionary of the object class name and the values of its
+        declared parameters which can be serialized to JSON."""
+        d = {"class": type(self).__name__}
+        for p in self.PARAMS:
+            d[p.name] = getattr(self, p.name)
+        return d
+
+    @classmethod
+    def convert_params(cls, d):
+        """Returns a dictionary of every declared parameter with the values
+        in d converted to their declared types and the declared defaults of
+        the parameters which are not in d. Raises a ValueError for unknown
+        parameters."""
+        unknown = [k for k in d if k not in [p.name for p in cls.PARAMS]]
+        if unknown:
+            raise ValueError(
+                "Unknown %s parameters: %s" % (cls.__name__, ", ".join(unknown))
+            )
+        params = {}
+        for p in cls.PARAMS:
+            v = d.get(p.name, p.default)
+            params[p.name] = v if v is None else p.type(v)
+        return params
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+
+class GridfinityBoxDimensions(GridfinitySpec):
+    """Gridfinity box parameters, specification rules and the dimension
+    properties which are specific to boxes."""
+
+    __slots__ = ()
+
+    PARAMS = [
+        Param("length_u", int, 2, 1, help="length in U (42 mm / U)"),
+        Param("width_u", int, 2, 1, help="width in U (42 mm / U)"),
+        Param("height_u", int, 2, 1, help="height in U (7 mm / U)"),
+        Param("length_div", int, 0, 0, help="number of length-wise divider walls"),
+        Param("width_div", int, 0, 0, help="number of width-wise divider walls"),
+        Param("scoops", bool, False, help="add interior scoops"),
+        Param("labels", bool, False, help="add label strips"),
+        Param("solid", bool, False, help="make a solid box"),
+        Param("holes", bool, False, help="add bottom mounting holes"),
+        Param("no_lip", bool, False, help="remove the stacking lip"),
+        Param("solid_ratio", float, 1.0, 0.0, 1.0, "solid box fill ratio"),
+        Param("lite_style", bool, False, help="make a lite style box"),
+        Param("unsupported_holes", bool, False, help="print friendly holes"),
+        Param("label_width", float, 12.0, help="width of the label strip"),
+        Param("label_height", float, 10.0, help="thickness of label overhang"),
+        Param("label_lip_height", float, 0.8, help="thickness of label vertical lip"),
+        Param("scoop_rad", float, 14.0, help="radius of optional interior scoops"),
+        Param("fillet_interior", bool, True, help="fillet the interior edges"),
+        Param("wall_th", float, GR_WALL, 0.5, 2.5, "wall thickness"),
+        Param("hole_diam", float, GR_HOLE_D, help="magnet/bolt hole diameter"),
+        Param("template", bool, False, help="stretch a cached canonical bin"),
+        Param("fillet_free", bool, False, help="cut pre-rounded compartments"),
+    ]
+
+    # rules are written with element-wise operators so that they also apply
+    # to the array columns of a GridfinitySpecTable, as are the ranges of
+    # the table column parameters
+    RULES = [
+        (
+            "solid",
+            "Cannot select both solid and lite box styles together",
+            lambda b: b.lite_style & b.solid,
+        ),
+        (
+            "holes",
+            "Cannot select both holes and lite box styles together",
+            lambda b: b.lite_style & b.holes,
+        ),
+        (
+            "wall_th",
+            "Wall thickness cannot exceed 1.5 mm for lite box style",
+            lambda b: b.lite_style & (b.wall_th > 1.5),
+        ),
+    ]
+
+    @property
+    def top_ref_height(self):
+        """The height of the top surface of a solid box or the floor
+        height of an empty box."""
+        if self.solid:
+            return self.max_height * self.solid_ratio + GR_BOT_H
+        if self.lite_style:
+            return self.floor_h
+        return GR_BOT_H
+
+    @property
+    def bin_height(self):
+        return self.height - GR_BASE_HEIGHT
+
+    def safe_label_height(self, backwall=False, from_bottom=False):
+        lw = self.label_width
+        if backwall:
+            lw += self.lip_width
+        lh = self.label_height * (lw / self.label_width)
+        yl = self.max_height - self.label_height + self.wall_th
+        if backwall:
+            yl -= self.lip_width
+        if yl < 0:
+            lh = self.max_height - 1.5 * GR_FILLET - 0.1
+        elif yl < 1.5 * GR_FILLET:
+            lh -= 1.5 * GR_FILLET - yl + 0.1
+        if from_bottom:
+            ws = math.sin(math.atan2(self.label_height, self.label_width))
+            if backwall:
+                lh = self.max_height + GR_FLOOR - lh + ws * self.wall_th
+            else:
+                lh = self.max_height + GR_FLOOR - lh + ws * GR_DIV_WALL
+        return lh
+
+    @property
+    def has_dividers(self):
+        return self.length_div > 0 or self.width_div > 0
+
+    @property
+    def rendered_divs(self):
+        """The lengthwise and widthwise divisions which are rendered. Lite
+        style boxes are divided at every grid cell in each divided direction
+        rather than raising an exception."""
+        if not self.lite_style:
+            return self.length_div, self.width_div
+        ld = self.length_u - 1 if self.length_div else 0
+        wd = self.width_u - 1 if self.width_div else 0
+        return ld, wd
+
+    @property
+    def can_render_fillet_free(self):
+        """True if the box interior can be made from pre-rounded compartments."""
+        return self.fillet_interior and not any(
+            [self.solid, self.scoops, self.labels, self.lite_style]
+        )
+
+    def compartment_spans(self, divs, inner):
+        """Returns the (start, end) extents of each compartment between the
+        inside walls and dividing walls along one dimension of the box."""
+        xl = inner / (divs + 1)
+        return [
+            (
+                i * xl - self.half_in + (GR_DIV_WALL / 2 if i > 0 else 0),
+                (i + 1) * xl - self.half_in - (GR_DIV_WALL / 2 if i < divs else 0),
+            )
+            for i in range(divs + 1)
+        ]
+
+
+class GridfinityBoxSpec(GridfinityBoxDimensions):
+    """Gridfinity box specification
+
+    This class is a compact and immutable specification of a Gridfinity box
+    with the same parameters, rules and dimension properties as
+    GridfinityBox. Its parameters are stored in slots rather than a
+    dictionary and it does not depend on CadQuery, so that very many
+    candidate boxes can be created, validated and sized cheaply. The
+    geometry is only loaded when the specification is rendered, e.g.
+      spec = GridfinityBoxSpec(3, 2, 5, holes=True)
+      if spec.int_height > 25 and spec.is_valid:
+          r = spec.render()
+    Modified copies are made with replace(), e.g. spec.replace(height_u=6)
+    """
+
+    __slots__ = tuple(p.name for p in GridfinityBoxDimensions.PARAMS)
+
+    def __init__(self, length_u, width_u, height_u, **kwargs):
+        kwargs.update(length_u=length_u, width_u=width_u, height_u=height_u)
+        params = {p.name: p.default for p in self.PARAMS}
+        unknown = [k for k in kwargs if k not in params]
+        if unknown:
+            raise ValueError(
+                "Unknown %s parameters: %s" % (type(self).__name__, ", ".join(unknown))
+            )
+        params.update(kwargs)
+        for k, v in params.items():
+            object.__setattr__(self, k, v)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s objects are immutable" % (type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError("%s objects are immutable" % (type(self).__name__))
+
+    def __reduce__(self):
+        return type(self).from_dict, (self.to_dict(),)
+
+    @property
+    def values(self):
+        """Tuple of the parameter values in declared order."""
+        return tuple(getattr(self, k) for k in self.__slots__)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.values == self.values
+
+    def __hash__(self):
+        return hash(self.values)
+
+    def __repr__(self):
+        params = ", ".join(
+            "%s=%r" % (p.name, getattr(self, p.name))
+            for p in self.PARAMS
+            if getattr(self, p.name) != p.default or p.name.endswith("_u")
+        )
+        return "%s(%s)" % (type(self).__name__, params)
+
+    @property
+    def is_valid(self):
+        return not self.validate()
+
+    def replace(self, **kwargs):
+        """Returns a copy of the specification with some parameters changed."""
+        params = {k: getattr(self, k) for k in self.__slots__}
+        params.update(kwargs)
+        return type(self)(**params)
+
+    def to_dict(self):
+        """Returns the parameters as a dictionary which re-creates either this
+        specification with from_dict or the box it specifies with
+        GridfinityObject.from_dict."""
+        d = super().to_dict()
+        d["class"] = "GridfinityBox"
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        d = dict(d)
+        name = d.pop("class", "GridfinityBox")
+        if name not in ("GridfinityBox", cls.__name__):
+            raise ValueError("%s is not a box specification" % (name))
+        return cls(**cls.convert_params(d))
+
+    @classmethod
+    def from_json(cls, s):
+        return cls.from_dict(json.loads(s))
+
+    @classmethod
+    def from_obj(cls, box):
+        """Returns the specification of a GridfinityBox object."""
+        return cls(**{p.name: getattr(box, p.name) for p in cls.PARAMS})
+
+    def to_obj(self):
+        """Returns a new GridfinityBox object with this specification. The
+        geometry modules are imported on first use."""
+        from cqgridfinity.gf_box import GridfinityBox
+
+        return GridfinityBox.from_dict(self.to_dict())
+
+    def render(self, progress=None, cancel=None):
+        """Renders the box and returns a CadQuery Workplane object. progress
+        and cancel are passed to the box render (see gf_progress)."""
+        return self.to_obj().render(progress=progress, cancel=cancel)
@@ -0,0 +1,237 @@
+#! /usr/bin/env python3
+#
+# Copyright (C) 2023  Michael Gale
+# This file is part of the cq-gridfinity python module.
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Gridfinity box specification table
+
+import numpy as np
+
+from cqgridfinity.constants import *
+from cqgridfinity.gf_spec import GridfinityBoxDimensions, SpecError
+
+# column data types of each type of box parameter
+_COLUMN_TYPES = {int: np.int32, bool: np.bool_, float: np.float64}
+
+# box parameters stored as table columns and their column data types. Every
+# box parameter is a column, so that objects round-trip through a table.
+SPEC_COLUMNS = {p.name: _COLUMN_TYPES[p.type] for p in GridfinityBoxDimensions.PARAMS}
+
+
+class GridfinitySpecTable:
+    """Gridfinity box specification table
+
+    This class stores a table of Gridfinity box specifications with one NumPy
+    array column per box parameter and one row per box. The derived dimension
+    properties of GridfinityBox are available as vectorized properties which
+    are evaluated over every row at once. This allows very large design spaces
+    to be filtered and sized before any boxes are created or rendered, e.g.
+      table = GridfinitySpecTable.matrix(length_u=range(1, 8), ...)
+      table = table[(table.inner_l > 100) & (table.int_height < 40)]
+      boxes = table.objs()
+    Parameters which are not specified take their declared defaults. The
+    table only depends on the box parameter schema of gf_spec, so it does
+    not load CadQuery until boxes are created by objs().
+    """
+
+    def __init__(self, **kwargs):
+        n = max([np.size(v) for v in kwargs.values()] or [1])
+        self.columns = {}
+        for k, dtype in SPEC_COLUMNS.items():
+            v = kwargs.pop(k, GridfinityBoxDimensions.param(k).default)
+            self.columns[k] = np.broadcast_to(np.asarray(v, dtype=dtype), (n,))
+        if kwargs:
+            raise ValueError(
+                "Unknown specification table columns: %s" % (", ".join(kwargs))
+            )
+
+    def __len__(self):
+        return len(self.columns["length_u"])
+
+    def __getattr__(self, attr):
+        columns = self.__dict__.get("columns", {})
+        if attr in columns:
+            return columns[attr]
+        raise AttributeError(
+            "'%s' object has no attribute '%s'" % (type(self).__name__, attr)
+        )
+
+    def __getitem__(self, index):
+        """Returns a new table with the rows selected by a boolean mask, an
+        index array or a slice. An integer index returns a single row as a
+        dictionary of box parameters."""
+        if isinstance(index, (int, np.integer)):
+            return self.row(index)
+        return GridfinitySpecTable(
+            **{k: np.atleast_1d(v[index]) for k, v in self.columns.items()}
+        )
+
+    def __str__(self):
+        return "Gridfinity box specification table with %d rows" % (len(self))
+
+    @classmethod
+    def matrix(cls, **kwargs):
+        """Returns a table with one row for every combination of keyword
+        argument values. Arguments with a list, tuple, range or array value are
+        varied and all other arguments are shared by every row, e.g.
+        GridfinitySpecTable.matrix(length_u=range(1, 8), width_u=range(1, 8),
+        height_u=range(2, 13), holes=[False, True])"""
+        multi = {
+            k: np.asarray(v)
+            for k, v in kwargs.items()
+            if isinstance(v, (list, tuple, range, np.ndarray))
+        }
+        fixed = {k: v for k, v in kwargs.items() if k not in multi}
+        grids = np.meshgrid(*multi.values(), indexing="ij") if multi else []
+        return cls(**fixed, **{k: g.ravel() for k, g in zip(multi, grids)})
+
+    @classmethod
+    def from_objs(cls, objs):
+        """Returns a table with one row for each GridfinityBox object or
+        GridfinityBoxSpec specification."""
+        return cls(**{k: [getattr(obj, k) for obj in objs] for k in SPEC_COLUMNS})
+
+    @property
+    def valid(self):
+        """Boolean mask of the rows which are valid box specifications."""
+        broken = np.zeros(len(self), dtype=bool)
+        for _, _, rule in GridfinityBoxDimensions.rules():
+            broken |= rule(self)
+        return ~broken
+
+    def validate(self):
+        """Applies the GridfinityBox specification rules to every row at once.
+        Returns a dictionary of the invalid rows keyed by row index with the
+        list of SpecError tuples for each row."""
+        errors = {}
+        for param, message, rule in GridfinityBoxDimensions.rules():
+            column = self.columns[param]
+            for i in np.flatnonzero(rule(self)):
+                errors.setdefault(int(i), []).append(
+                    SpecError(param, column[i].item(), message)
+                )
+        return dict(sorted(errors.items()))
+
+    def row(self, index):
+        """Returns a dictionary of box parameters for one row of the table."""
+        return {k: v[index].item() for k, v in self.columns.items()}
+
+    def objs(self, indices=None):
+        """Returns a list of GridfinityBox objects for every row of the table
+        or for the rows with the specified indices."""
+        from cqgridfinity.gf_box import GridfinityBox
+
+        indices = range(len(self)) if indices is None else indices
+        return [GridfinityBox(**self.row(i)) for i in indices]
+
+    @property
+    def length(self):
+        return self.length_u * GRU
+
+    @property
+    def width(self):
+        return self.width_u * GRU
+
+    @property
+    def height(self):
+        return 3.8 + GRHU * self.height_u
+
+    @property
+    def bin_height(self):
+        return self.height - GR_BASE_HEIGHT
+
+    @property
+    def int_height(self):
+        h = self.height - GR_LIP_H - GR_BOT_H
+        return np.where(self.lite_style, h + self.wall_th, h)
+
+    @property
+    def max_height(self):
+        return self.int_height + GR_UNDER_H + GR_TOPSIDE_H
+
+    @property
+    def floor_h(self):
+        return np.where(self.lite_style, GR_FLOOR - self.wall_th, GR_FLOOR)
+
+    @property
+    def lip_width(self):
+        return np.where(self.no_lip, self.wall_th, GR_UNDER_H + self.wall_th)
+
+    @property
+    def outer_l(self):
+        return self.length_u * GRU - GR_TOL
+
+    @property
+    def outer_w(self):
+        return self.width_u * GRU - GR_TOL
+
+    @property
+    def outer_dim(self):
+        return self.outer_l, self.outer_w
+
+    @property
+    def inner_l(self):
+        return self.outer_l - 2 * self.wall_th
+
+    @property
+    def inner_w(self):
+        return self.outer_w - 2 * self.wall_th
+
+    @property
+    def inner_dim(self):
+        return self.inner_l, self.inner_w
+
+    @property
+    def compartment_dim(self):
+        """Length and width of each compartment between dividing walls."""
+        xl = (self.inner_l - GR_DIV_WALL * self.length_div) / (self.length_div + 1)
+        yl = (self.inner_w - GR_DIV_WALL * self.width_div) / (self.width_div + 1)
+        return xl, yl
+
+    @property
+    def safe_fillet_rad(self):
+        features = self.scoops | self.labels | (self.length_div > 0)
+        features |= self.width_div > 0
+        rad = np.minimum(GR_FILLET, (GR_UNDER_H + GR_WALL) - self.wall_th - 0.05)
+        return np.where(features, rad, GR_FILLET)
+
+    @property
+    def top_ref_height(self):
+        """The height of the top surface of a solid box or the floor
+        height of an empty box."""
+        h = np.where(self.lite_style, self.floor_h, GR_BOT_H)
+        return np.where(self.solid, self.max_height * self.solid_ratio + GR_BOT_H, h)
+
+    def safe_label_height(self, backwall=False, from_bottom=False):
+        lw = self.label_width
+        if backwall:
+            lw = lw + self.lip_width
+        lh = self.label_height * (lw / self.label_width)
+        yl = self.max_height - self.label_height + self.wall_th
+        if backwall:
+            yl = yl - self.lip_width
+        lh = np.where(yl < 1.5 * GR_FILLET, lh - (1.5 * GR_FILLET - yl + 0.1), lh)
+        lh = np.where(yl < 0, self.max_height - 1.5 * GR_FILLET - 0.1, lh)
+        if from_bottom:
+            ws = np.sin(np.arctan2(self.label_height, self.label_width))
+            th = self.wall_th if backwall else GR_DIV_WALL
+            lh = self.max_height + GR_FLOOR - lh + ws * th
+        return lh
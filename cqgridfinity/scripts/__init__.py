@@ -0,0 +1,46 @@
+import sys
+import textwrap
+
+from cqgridfinity.gf_progress import RenderMonitor
+
+
+def add_param_option(parser, cls, example):
+    """Adds a --param option to a command line parser which sets any declared
+    parameter of an object class."""
+    names = textwrap.fill(", ".join(p.name for p in cls.PARAMS), 60)
+    parser.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Set any parameter, e.g. --param %s\n%s" % (example, names),
+    )
+
+
+def apply_params(obj, assignments):
+    """Sets the object parameters assigned with --param options."""
+    for text in assignments:
+        setattr(obj, *obj.parse_param(text))
+
+
+class ProgressBar:
+    """A render progress bar which is redrawn on one line of a terminal."""
+
+    def __init__(self, width=30, stream=None):
+        self.width = width
+        self.stream = stream if stream is not None else sys.stderr
+
+    def __call__(self, stage, fraction):
+        n = int(round(fraction * self.width))
+        bar = "#" * n + "-" * (self.width - n)
+        self.stream.write("\r  [%s] %3d%% %-20s" % (bar, 100 * fraction, stage))
+        if stage == "done":
+            self.stream.write("\n")
+        self.stream.flush()
+
+
+def progress_monitor():
+    """Returns a RenderMonitor which shows a progress bar for the renders in
+    its with block when stderr is a terminal."""
+    progress = ProgressBar() if sys.stderr.isatty() else None
+    return RenderMonitor(progress=progress)
@@ -2,10 +2,13 @@
 """
 command line script to make a Gridfinity baseplate
 """
+
 import argparse
+import os
 
 import cqgridfinity
 from cqgridfinity import *
+from cqgridfinity.scripts import add_param_option, apply_params, progress_monitor
 
 title = """
   _____      _     _  __ _       _ _           ____
@@ -27,6 +30,9 @@ example usage:
 
   6 x 3 baseplate to default STL file:
   $ gridfinitybase 6 3 -f stl
+
+  12 x 9 baseplate split into tiles which fit a 220 x 220 mm print bed:
+  $ gridfinitybase 12 9 -b 220 -f stl
 """
 
 
@@ -69,22 +75,40 @@ def main():
         "--holediam",
         default=None,
         action="store",
-        help="Corner mounting screw hole diameter (default=5)",
+        help="Corner mounting screw hole diameter (default=%g)"
+        % (GridfinityBaseplate.param("csk_hole").default),
     )
     parser.add_argument(
         "-hc",
         "--cskdiam",
         default=None,
         action="store",
-        help="Corner mounting screw countersink diameter (default=10)",
+        help="Corner mounting screw countersink diameter (default=%g)"
+        % (GridfinityBaseplate.param("csk_diam").default),
     )
     parser.add_argument(
         "-ca",
         "--cskangle",
         default=None,
         action="store",
-        help="Corner mounting screw countersink angle (deg) (default=82)",
+        help="Corner mounting screw countersink angle (deg) (default=%g)"
+        % (GridfinityBaseplate.param("csk_angle").default),
+    )
+    parser.add_argument(
+        "-b",
+        "--bed",
+        default=None,
+        action="store",
+        help="Split baseplate into tiles which fit this print bed size in mm\n(e.g. 220 or 250x210)",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        default=None,
+        action="store",
+        help="Number of parallel processes used to save baseplate tiles",
+    )
+    add_param_option(parser, GridfinityBaseplate, "corner_tab_size=18")
     parser.add_argument(
         "-o",
         "--output",
@@ -108,6 +132,7 @@ def main():
         csk_diam=argsd["cskdiam"],
         csk_angle=argsd["cskangle"],
     )
+    apply_params(base, argsd["param"])
     print(
         "Gridfinity baseplate: %dU x %dU (%.1f mm x %.1f mm)"
         % (
@@ -117,26 +142,46 @@ def main():
             base.width,
         )
     )
+    if argsd["bed"] is not None:
+        bed = [float(x) for x in argsd["bed"].lower().split("x")]
+        jobs = int(argsd["jobs"]) if argsd["jobs"] is not None else None
+        path, prefix, fmt = None, None, argsd["format"]
+        if argsd["output"] is not None:
+            # the output filename names the tile files, e.g. plate.stl saves
+            # plate_12x9_tile_6x5.stl etc. in STL format
+            path, name = os.path.split(argsd["output"])
+            stem, ext = os.path.splitext(name)
+            if ext.lower() in (".stl", ".svg", ".step"):
+                name, fmt = stem, ext[1:].lower()
+            path, prefix = path or None, name + "_"
+        manifest = base.save_tiles(
+            *bed, path=path, prefix=prefix, file_format=fmt, workers=jobs
+        )
+        print("\nBaseplate split into %d tiles:" % (len(manifest["tiles"])))
+        for size, tile in manifest["files"].items():
+            print("  %dx %sU tile saved as %s" % (tile["count"], size, tile["file"]))
+        return
     if argsd["output"] is not None:
         fn = argsd["output"]
     else:
         fn = base.filename()
     s = ["\nBaseplate generated and saved as"]
-    if argsd["format"].lower() == "stl" or fn.lower().endswith(".stl"):
-        if not fn.endswith(".stl"):
-            fn = fn + ".stl"
-        base.save_stl_file(filename=argsd["output"])
-        s.append("%s in STL format" % (fn))
-    elif argsd["format"].lower() == "svg" or fn.lower().endswith(".svg"):
-        if not fn.endswith(".svg"):
-            fn = fn + ".svg"
-        base.save_svg_file(filename=argsd["output"])
-        s.append("%s in SVG format" % (fn))
-    else:
-        if not fn.endswith(".step"):
-            fn = fn + ".step"
-        base.save_step_file(filename=argsd["output"])
-        s.append("%s in STEP format" % (fn))
+    with progress_monitor():
+        if argsd["format"].lower() == "stl" or fn.lower().endswith(".stl"):
+            if not fn.endswith(".stl"):
+                fn = fn + ".stl"
+            base.save_stl_file(filename=argsd["output"])
+            s.append("%s in STL format" % (fn))
+        elif argsd["format"].lower() == "svg" or fn.lower().endswith(".svg"):
+            if not fn.endswith(".svg"):
+                fn = fn + ".svg"
+            base.save_svg_file(filename=argsd["output"])
+            s.append("%s in SVG format" % (fn))
+        else:
+            if not fn.endswith(".step"):
+                fn = fn + ".step"
+            base.save_step_file(filename=argsd["output"])
+            s.append("%s in STEP format" % (fn))
     print(" ".join(s))
 
 
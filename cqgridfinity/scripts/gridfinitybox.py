@@ -2,10 +2,12 @@
 """
 command line script to make a Gridfinity box
 """
+
 import argparse
 
 import cqgridfinity
 from cqgridfinity import *
+from cqgridfinity.scripts import add_param_option, apply_params, progress_monitor
 
 title = """
   _____      _     _  __ _       _ _           ____
@@ -109,7 +111,7 @@ def main():
         "-r",
         "--ratio",
         action="store",
-        default=1.0,
+        default=GridfinityBox.param("solid_ratio").default,
         help="Solid box fill ratio 0.0 = minimum, 1.0 = full height",
     )
     parser.add_argument(
@@ -130,8 +132,9 @@ def main():
         "-wt",
         "--wall",
         action="store",
-        default=1.0,
-        help="Wall thickness (default=1 mm)",
+        default=GridfinityBox.param("wall_th").default,
+        help="Wall thickness (default=%.1f mm)"
+        % (GridfinityBox.param("wall_th").default),
     )
     parser.add_argument(
         "-f",
@@ -139,6 +142,7 @@ def main():
         default="step",
         help="Output file format (STEP, STL, SVG) default=STEP",
     )
+    add_param_option(parser, GridfinityBox, "scoop_rad=10")
     parser.add_argument(
         "-o",
         "--output",
@@ -167,6 +171,7 @@ def main():
         width_div=width_div,
         wall_th=wall,
     )
+    apply_params(box, argsd["param"])
     if argsd["ecolite"]:
         bs = "lite "
     elif argsd["solid"]:
@@ -216,21 +221,22 @@ def main():
     else:
         fn = box.filename()
     s = ["\nBox generated and saved as"]
-    if argsd["format"].lower() == "stl" or fn.lower().endswith(".stl"):
-        if not fn.endswith(".stl"):
-            fn = fn + ".stl"
-        box.save_stl_file(filename=argsd["output"])
-        s.append("%s in STL format" % (fn))
-    elif argsd["format"].lower() == "svg" or fn.lower().endswith(".svg"):
-        if not fn.endswith(".svg"):
-            fn = fn + ".svg"
-        box.save_svg_file(filename=argsd["output"])
-        s.append("%s in SVG format" % (fn))
-    else:
-        if not fn.endswith(".step"):
-            fn = fn + ".step"
-        box.save_step_file(filename=argsd["output"])
-        s.append("%s in STEP format" % (fn))
+    with progress_monitor():
+        if argsd["format"].lower() == "stl" or fn.lower().endswith(".stl"):
+            if not fn.endswith(".stl"):
+                fn = fn + ".stl"
+            box.save_stl_file(filename=argsd["output"])
+            s.append("%s in STL format" % (fn))
+        elif argsd["format"].lower() == "svg" or fn.lower().endswith(".svg"):
+            if not fn.endswith(".svg"):
+                fn = fn + ".svg"
+            box.save_svg_file(filename=argsd["output"])
+            s.append("%s in SVG format" % (fn))
+        else:
+            if not fn.endswith(".step"):
+                fn = fn + ".step"
+            box.save_step_file(filename=argsd["output"])
+            s.append("%s in STEP format" % (fn))
     print(" ".join(s))
 
 
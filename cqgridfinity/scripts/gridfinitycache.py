@@ -0,0 +1,165 @@
+#! /usr/bin/env python3
+"""
+command line script to manage the Gridfinity on-disk geometry cache
+"""
+
+import argparse
+import sys
+
+import cqgridfinity
+from cqgridfinity import *
+from cqgridfinity.gf_diskcache import (
+    DEFAULT_CACHE_SIZE,
+    DiskGeometryCache,
+    default_cache_dir,
+)
+
+DESC = """
+Show, prune, warm or clear the on-disk cache of rendered Gridfinity sub-solids.
+"""
+
+EPILOG = """
+example usages:
+
+  summary of the cache contents:
+  $ gridfinity-cache stats
+
+  remove solids of other versions and shrink the cache to 500 MB:
+  $ gridfinity-cache prune --max-size 500
+
+  render the sub-solids of 2x1 and 2x2 boxes 3U to 6U high into the cache
+  with 4 worker processes:
+  $ gridfinity-cache warm box length_u=2 width_u=1,2 height_u=3,4,5,6 -j 4
+
+  remove everything from the cache:
+  $ gridfinity-cache clear
+"""
+
+OBJECT_CLASSES = {
+    "box": GridfinityBox,
+    "baseplate": GridfinityBaseplate,
+    "ruggedbox": GridfinityRuggedBox,
+}
+
+
+def parse_matrix(cls, assignments):
+    """Returns the keyword arguments of GridfinityBatch.matrix for a list of
+    NAME=VALUE[,VALUE...] assignments of object parameters."""
+    kwargs = {}
+    for text in assignments:
+        name, sep, values = text.partition("=")
+        if not sep:
+            cls.parse_param(text)
+        parsed = [cls.parse_param("%s=%s" % (name, v))[1] for v in values.split(",")]
+        kwargs[name.strip()] = parsed if len(parsed) > 1 else parsed[0]
+    return kwargs
+
+
+def print_stats(cache):
+    st = cache.stats
+    print("Geometry cache: %s" % (st["path"]))
+    print(
+        "  %d solids, %.1f MB of %.0f MB, %d hits"
+        % (st["solids"], st["size"], st["max_size"], st["hits"])
+    )
+    for title, key in [("Kind", "kinds"), ("Version", "versions")]:
+        if st[key]:
+            print("  %-12s %8s %10s %8s" % (title, "Solids", "Size MB", "Hits"))
+        for name, ks in sorted(st[key].items(), key=lambda x: str(x[0])):
+            print(
+                "  %-12s %8d %10.1f %8d" % (name, ks["solids"], ks["size"], ks["hits"])
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="gridfinity-cache",
+        description=DESC,
+        epilog=EPILOG,
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument(
+        "command",
+        choices=["stats", "prune", "warm", "clear"],
+        help="Cache command",
+    )
+    parser.add_argument(
+        "spec",
+        nargs="*",
+        help="warm: object class (%s) followed by NAME=VALUE[,VALUE...]\n"
+        "parameter assignments. Every combination of values is rendered."
+        % (", ".join(OBJECT_CLASSES)),
+    )
+    parser.add_argument(
+        "-c",
+        "--cache",
+        default=None,
+        help="Cache directory (default=%s)" % (default_cache_dir()),
+    )
+    parser.add_argument(
+        "-m",
+        "--max-size",
+        default=DEFAULT_CACHE_SIZE,
+        type=float,
+        help="Cache size limit in MB (default=%g)" % (DEFAULT_CACHE_SIZE),
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        default=None,
+        type=int,
+        help="warm: number of worker processes (default=number of CPUs)",
+    )
+    args = parser.parse_args()
+    print("Version: %s" % (cqgridfinity.__version__))
+    cache = DiskGeometryCache(args.cache, max_size=args.max_size)
+    if args.command == "stats":
+        print_stats(cache)
+    elif args.command == "prune":
+        n = cache.prune()
+        print("Removed %d solids, %s" % (n, cache))
+    elif args.command == "clear":
+        n = cache.clear()
+        print("Removed %d solids" % (n))
+    elif args.command == "warm":
+        if not args.spec or args.spec[0] not in OBJECT_CLASSES:
+            parser.error(
+                "warm requires an object class: %s" % (", ".join(OBJECT_CLASSES))
+            )
+        cls = OBJECT_CLASSES[args.spec[0]]
+        try:
+            batch = GridfinityBatch.matrix(cls, **parse_matrix(cls, args.spec[1:]))
+        except (ValueError, TypeError) as e:
+            parser.error(str(e))
+        invalid = batch.remove_invalid()
+        if invalid:
+            print("Skipped %d invalid objects" % (len(invalid)))
+        solids = batch.sub_solids()
+        print(
+            "Warming %d distinct sub-solids of %d objects" % (len(solids), len(batch))
+        )
+        done = []
+
+        def _done(result):
+            done.append(result)
+            print(
+                "  %d %-12s used by %3d objects  %6.2f s  %s"
+                % (
+                    len(done),
+                    result["kind"],
+                    result["count"],
+                    result["time"],
+                    result["error"] or "",
+                )
+            )
+
+        batch.warm(cache, workers=args.jobs, callback=_done)
+        failed = sum(1 for r in done if r["status"] != "ok")
+        print(
+            "Rendered %d sub-solids, %d already cached, %d failed, %s"
+            % (len(done) - failed, len(solids) - len(done), failed, cache)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,12 @@
 """
 command line script to make a rugged Gridfinity box
 """
+
 import argparse
 
 import cqgridfinity
 from cqgridfinity import *
+from cqgridfinity.scripts import add_param_option, apply_params, progress_monitor
 
 title = """
  ____                             _ ____
@@ -228,6 +230,7 @@ def main():
         default="step",
         help="Output file format (STEP, STL, SVG) default=STEP",
     )
+    add_param_option(parser, GridfinityRuggedBox, "hinge_width=48")
     parser.add_argument(
         "-o",
         "--output",
@@ -340,6 +343,7 @@ def main():
         box.rib_style = False
     if argsd["windowthickness"] is not None:
         box.window_th = float(argsd["windowthickness"])
+    apply_params(box, argsd["param"])
 
     print(title)
     print("Version: %s" % (cqgridfinity.__version__))
@@ -397,60 +401,61 @@ def main():
         fn = argsd["output"]
     else:
         fn = box.filename()
-    g = False
-    if argsd["box"]:
-        print("Rendering box...")
-        box.render()
-        save_asset(box, argsd)
-        g = True
-    if argsd["lid"]:
-        print("Rendering lid...")
-        box.render_lid()
-        save_asset(box, argsd)
-        g = True
-    if argsd["acc"]:
-        print("Rendering accessory components...")
-        r = box.render_accessories()
-        save_asset(box, argsd)
-        g = True
-    if argsd["hinge"]:
-        print("Rendering hinge components...")
-        r = box.render_hinge()
-        save_asset(box, argsd)
-        g = True
-    if argsd["genlabel"]:
-        print("Rendering label panel...")
-        r = box.render_label()
-        save_asset(box, argsd)
-        g = True
-    if argsd["genhandle"]:
-        print("Rendering front handle...")
-        r = box.render_handle()
-        save_asset(box, argsd)
-        g = True
-    if argsd["genlatch"]:
-        print("Rendering latch component...")
-        r = box.render_latch()
-        save_asset(box, argsd)
-        g = True
-    if argsd["genwindow"]:
-        print(
-            "Rendering lid window (%.2f x %.2f mm, %.2f mm thickness)..."
-            % (*box.lid_window_size(), box.window_th)
-        )
-        r = box.render_lid_window()
-        save_asset(box, argsd)
-        g = True
-    if not g:
-        print("Rendering full assembly...")
-        a = box.render_assembly()
-        if argsd["output"] is not None:
-            fn = argsd["output"]
-        else:
-            fn = box.filename()
-        if not fn.endswith(".step"):
-            fn = fn + ".step"
-        a.save(fn)
+    with progress_monitor():
+        g = False
+        if argsd["box"]:
+            print("Rendering box...")
+            box.render()
+            save_asset(box, argsd)
+            g = True
+        if argsd["lid"]:
+            print("Rendering lid...")
+            box.render_lid()
+            save_asset(box, argsd)
+            g = True
+        if argsd["acc"]:
+            print("Rendering accessory components...")
+            r = box.render_accessories()
+            save_asset(box, argsd)
+            g = True
+        if argsd["hinge"]:
+            print("Rendering hinge components...")
+            r = box.render_hinge()
+            save_asset(box, argsd)
+            g = True
+        if argsd["genlabel"]:
+            print("Rendering label panel...")
+            r = box.render_label()
+            save_asset(box, argsd)
+            g = True
+        if argsd["genhandle"]:
+            print("Rendering front handle...")
+            r = box.render_handle()
+            save_asset(box, argsd)
+            g = True
+        if argsd["genlatch"]:
+            print("Rendering latch component...")
+            r = box.render_latch()
+            save_asset(box, argsd)
+            g = True
+        if argsd["genwindow"]:
+            print(
+                "Rendering lid window (%.2f x %.2f mm, %.2f mm thickness)..."
+                % (*box.lid_window_size(), box.window_th)
+            )
+            r = box.render_lid_window()
+            save_asset(box, argsd)
+            g = True
+        if not g:
+            print("Rendering full assembly...")
+            a = box.render_assembly()
+            if argsd["output"] is not None:
+                fn = argsd["output"]
+            else:
+                fn = box.filename()
+            if not fn.endswith(".step"):
+                fn = fn + ".step"
+            a.save(fn)
 
 
 if __name__ == "__main__":
@@ -3,26 +3,30 @@ sys.path.append(".") # Relative to `partcad.yaml`
 
 from cqgridfinity.gf_baseplate import GridfinityBaseplate
 
-length_u = 2
-width_u = 2
-ext_depth = 0.0
-straight_bottom = False
-corner_screws = False
-corner_tab_size = 21
-csk_hole = 5.0
-csk_diam = 10.0
-csk_angle = 82
+length_u = 2  # length in U (42 mm / U)
+width_u = 2  # width in U (42 mm / U)
+ext_depth = 0.0  # extra depth under the baseplate
+straight_bottom = False  # straight instead of chamfered
+corner_screws = False  # add corner mounting screw tabs
+corner_tab_size = 21.0  # size of the corner tabs
+csk_hole = 5.0  # mounting screw hole diameter
+csk_diam = 10.0  # mounting screw countersink diameter
+csk_angle = 82.0  # mounting screw countersink angle
+lattice = False  # build from the 2D pocket lattice
 
-result = GridfinityBaseplate(
-    length_u=int(length_u),
-    width_u=int(width_u),
-    ext_depth=ext_depth,
-    straight_bottom=straight_bottom,
-    corner_screws=corner_screws,
-    corner_tab_size=corner_tab_size,
-    csk_hole=csk_hole,
-    csk_diam=csk_diam,
-    csk_angle=csk_angle,
+result = GridfinityBaseplate.from_dict(
+    dict(
+        length_u=length_u,
+        width_u=width_u,
+        ext_depth=ext_depth,
+        straight_bottom=straight_bottom,
+        corner_screws=corner_screws,
+        corner_tab_size=corner_tab_size,
+        csk_hole=csk_hole,
+        csk_diam=csk_diam,
+        csk_angle=csk_angle,
+        lattice=lattice,
+    )
 ).render().val()
 
-show_object(result)
\ No newline at end of file
+show_object(result)
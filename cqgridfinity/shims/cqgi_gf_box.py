@@ -3,46 +3,54 @@ sys.path.append(".") # Relative to `partcad.yaml`
 
 from cqgridfinity.gf_box import GridfinityBox
 
-length_u = 2
-width_u = 2
-height_u = 2
-length_div = 0.0
-width_div = 0.0
-scoops = False
-labels = False
-solid = False
-holes = False
-no_lip = False
-solid_ratio = 1.0
-lite_style = False
-unsupported_holes = False
+length_u = 2  # length in U (42 mm / U)
+width_u = 2  # width in U (42 mm / U)
+height_u = 2  # height in U (7 mm / U)
+length_div = 0  # number of length-wise divider walls
+width_div = 0  # number of width-wise divider walls
+scoops = False  # add interior scoops
+labels = False  # add label strips
+solid = False  # make a solid box
+holes = False  # add bottom mounting holes
+no_lip = False  # remove the stacking lip
+solid_ratio = 1.0  # solid box fill ratio
+lite_style = False  # make a lite style box
+unsupported_holes = False  # print friendly holes
 label_width = 12.0  # width of the label strip
 label_height = 10.0  # thickness of label overhang
 label_lip_height = 0.8  # thickness of label vertical lip
-scoop_rad = 12.0  # radius of optional interior scoops
-fillet_interior = True
-wall_th = 1.0
+scoop_rad = 14.0  # radius of optional interior scoops
+fillet_interior = True  # fillet the interior edges
+wall_th = 1.0  # wall thickness
+hole_diam = 6.5  # magnet/bolt hole diameter
+template = False  # stretch a cached canonical bin
+fillet_free = False  # cut pre-rounded compartments
 
-result = GridfinityBox(
-    length_u=int(length_u),
-    width_u=int(width_u),
-    height_u=int(height_u),
-    length_div=length_div,
-    width_div=width_div,
-    scoops=scoops,
-    labels=labels,
-    solid=solid,
-    holes=holes,
-    no_lip=no_lip,
-    solid_ratio=solid_ratio,
-    lite_style=lite_style,
-    unsupported_holes=unsupported_holes,
-    label_width=label_width,
-    label_height=label_height,
-    label_lip_height=label_lip_height,
-    scoop_rad=scoop_rad,
-    fillet_interior=fillet_interior,
-    wall_th=wall_th,
+result = GridfinityBox.from_dict(
+    dict(
+        length_u=length_u,
+        width_u=width_u,
+        height_u=height_u,
+        length_div=length_div,
+        width_div=width_div,
+        scoops=scoops,
+        labels=labels,
+        solid=solid,
+        holes=holes,
+        no_lip=no_lip,
+        solid_ratio=solid_ratio,
+        lite_style=lite_style,
+        unsupported_holes=unsupported_holes,
+        label_width=label_width,
+        label_height=label_height,
+        label_lip_height=label_lip_height,
+        scoop_rad=scoop_rad,
+        fillet_interior=fillet_interior,
+        wall_th=wall_th,
+        hole_diam=hole_diam,
+        template=template,
+        fillet_free=fillet_free,
+    )
 ).render().val()
 
-show_object(result)
\ No newline at end of file
+show_object(result)
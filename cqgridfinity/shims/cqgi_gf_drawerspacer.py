@@ -3,40 +3,42 @@ sys.path.append(".") # Relative to `partcad.yaml`
 
 from cqgridfinity.gf_drawer import GridfinityDrawerSpacer
 
-length_u = 2
-width_u = 2
-length_th = 10.0
-width_th = 10.0
-thickness = 5.0
-chamf_rad = 1.0
-show_arrows = True
-arrow_h = 0.8
-length_fill = 0.0
-width_fill = 0.0
-align_features = True
-align_l = 16.0
-align_tol = 0.15
-align_min = 8.0
-min_margin = 4.0
-tolerance = 0.5
+length_u = 1  # length of the corner spacers in U
+width_u = 1  # width of the corner spacers in U
+length_th = 10.0  # front and back spacer thickness
+width_th = 10.0  # left and right spacer thickness
+thickness = 4.75  # spacer height
+chamf_rad = 1.0  # spacer chamfer radius
+show_arrows = True  # add arrows to the spacers
+arrow_h = 0.8  # arrow height
+length_fill = 0.0  # length of front and back spacers
+width_fill = 0.0  # length of left and right spacers
+align_features = True  # add alignment features
+align_l = 16.0  # alignment feature length
+align_tol = 0.15  # alignment feature tolerance
+align_min = 8.0  # minimum alignment feature length
+min_margin = 4.0  # minimum margin requiring spacers
+tolerance = 0.5  # fit tolerance
 
-result = GridfinityDrawerSpacer(
-    length_u=int(length_u),
-    width_u=int(width_u),
-    length_th=length_th,
-    width_th=width_th,
-    thickness=thickness,
-    chamf_rad=chamf_rad,
-    show_arrows=show_arrows,
-    arrow_h=arrow_h,
-    length_fill=length_fill,
-    width_fill=width_fill,
-    align_features=align_features,
-    align_l=align_l,
-    align_tol=align_tol,
-    align_min=align_min,
-    min_margin=min_margin,
-    tolerance=tolerance,
+result = GridfinityDrawerSpacer.from_dict(
+    dict(
+        length_u=length_u,
+        width_u=width_u,
+        length_th=length_th,
+        width_th=width_th,
+        thickness=thickness,
+        chamf_rad=chamf_rad,
+        show_arrows=show_arrows,
+        arrow_h=arrow_h,
+        length_fill=length_fill,
+        width_fill=width_fill,
+        align_features=align_features,
+        align_l=align_l,
+        align_tol=align_tol,
+        align_min=align_min,
+        min_margin=min_margin,
+        tolerance=tolerance,
+    )
 ).render().val()
 
-show_object(result)
\ No newline at end of file
+show_object(result)
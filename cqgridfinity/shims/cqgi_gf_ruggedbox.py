@@ -3,54 +3,57 @@ sys.path.append(".") # Relative to `partcad.yaml`
 
 from cqgridfinity.gf_ruggedbox import GridfinityRuggedBox
 
-length_u = 4
-width_u = 4
-height_u = 4
-lid_height = 10.0
-wall_vgrooves = True
-front_handle = True
-stackable = True
-side_clasps = True
-lid_baseplate = True
-inside_baseplate = True
-side_handles = True
-front_label = True
-# TODO(clairbee): uncomment the below when annotations are supported by CQGI
-# label_length: float = None
-# label_height: float = None
-label_length = 0.0
-label_height = 0.0
+length_u = 4  # length in U (42 mm / U)
+width_u = 4  # width in U (42 mm / U)
+height_u = 4  # height in U (7 mm / U)
+lid_height = 10.0  # height of the lid
+wall_vgrooves = True  # add vertical grooves to walls
+front_handle = True  # add a front handle
+stackable = True  # add stacking features
+side_clasps = True  # add side clasps
+lid_baseplate = True  # add a baseplate to the lid
+inside_baseplate = True  # add a baseplate inside
+side_handles = True  # add side handles
+front_label = True  # add a front label holder
+label_length = 0.0  # front label length (0 for automatic)
+label_height = 0.0  # front label height (0 for automatic)
+label_th = 0.8  # front label thickness
+back_feet = True  # add feet to the back
+hinge_width = 32.0  # width of the hinges
+hinge_bolted = False  # bolted instead of printed hinges
+rib_style = False  # ribbed instead of smooth walls
+lid_window = False  # add a window to the lid
+window_th = 1.0  # lid window thickness
+
 if label_length == 0.0:
     label_length = None
 if label_height == 0.0:
     label_height = None
 
-label_th = 0.8
-back_feet = True
-hinge_width = 48.0
-hinge_bolted = False
-rib_style = False
-
-result = GridfinityRuggedBox(
-    length_u=int(length_u),
-    width_u=int(width_u),
-    height_u=int(height_u),
-    lid_height=lid_height,
-    wall_vgrooves=wall_vgrooves,
-    front_handle=front_handle,
-    stackable=stackable,
-    side_clasps=side_clasps,
-    lid_baseplate=lid_baseplate,
-    inside_baseplate=inside_baseplate,
-    side_handles=side_handles,
-    front_label=front_label,
-    label_length=label_length,
-    label_height=label_height,
-    label_th=label_th,
-    back_feet=back_feet,
-    hinge_width=hinge_width,
-    hinge_bolted=hinge_bolted,
-    rib_style=rib_style,
+result = GridfinityRuggedBox.from_dict(
+    dict(
+        length_u=length_u,
+        width_u=width_u,
+        height_u=height_u,
+        lid_height=lid_height,
+        wall_vgrooves=wall_vgrooves,
+        front_handle=front_handle,
+        stackable=stackable,
+        side_clasps=side_clasps,
+        lid_baseplate=lid_baseplate,
+        inside_baseplate=inside_baseplate,
+        side_handles=side_handles,
+        front_label=front_label,
+        label_length=label_length,
+        label_height=label_height,
+        label_th=label_th,
+        back_feet=back_feet,
+        hinge_width=hinge_width,
+        hinge_bolted=hinge_bolted,
+        rib_style=rib_style,
+        lid_window=lid_window,
+        window_th=window_th,
+    )
 ).render().val()
 
-show_object(result)
\ No newline at end of file
+show_object(result)
@@ -10,7 +10,7 @@ import setuptools
 PACKAGE_NAME = "cqgridfinity"
 
 
-required = ["cadquery", "cqkit>=0.5.6"]
+required = ["cadquery", "cqkit>=0.5.6", "numpy"]
 dependency_links = []
 
 
@@ -54,6 +54,7 @@ setuptools.setup(
                 "gridfinitybox=cqgridfinity.scripts.gridfinitybox:main",
                 "gridfinitybase=cqgridfinity.scripts.gridfinitybase:main",
                 "ruggedbox=cqgridfinity.scripts.ruggedbox:main",
+                "gridfinity-cache=cqgridfinity.scripts.gridfinitycache:main",
             ],
         },    
 )
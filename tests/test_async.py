@@ -0,0 +1,101 @@
+# Gridfinity tests
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import os
+import threading
+
+import pytest
+
+# my modules
+from cqgridfinity import *
+from cqgridfinity.gf_progress import RenderMonitor
+from cqkit.cq_helpers import size_3d
+
+from common_test import _almost_same
+
+
+def test_render_async():
+    b1 = GridfinityBox(1, 1, 2)
+    v0 = b1.render().val().Volume()
+    with ThreadPoolExecutor(2) as pool:
+        r = asyncio.run(b1.render_async(executor=pool))
+    assert _almost_same(r.val().Volume(), v0)
+    with ProcessPoolExecutor(1) as pool:
+        r = asyncio.run(b1.render_async(executor=pool))
+    assert _almost_same(r.val().Volume(), v0)
+
+
+def test_save_async(tmp_path):
+    b1 = GridfinityBox(1, 1, 2)
+    with ThreadPoolExecutor(1) as pool:
+        fns = asyncio.run(
+            b1.save_async(formats=["step", "stl"], path=str(tmp_path), executor=pool)
+        )
+    assert [os.path.basename(fn) for fn in fns] == [
+        "gf_box_1x1x2.step",
+        "gf_box_1x1x2.stl",
+    ]
+    assert all(os.path.getsize(fn) > 0 for fn in fns)
+    assert b1._cq_obj is None
+
+
+def test_as_rendered():
+    specs = [GridfinityBoxSpec(1, 1, h) for h in (1, 2, 3)]
+
+    async def _render_all():
+        return [(s, r) async for s, r in as_rendered(specs, limit=2, executor=pool)]
+
+    with ThreadPoolExecutor(2) as pool:
+        results = asyncio.run(_render_all())
+    assert sorted(s.height_u for s, _ in results) == [1, 2, 3]
+    for s, r in results:
+        assert _almost_same(size_3d(r)[2], s.height)
+
+
+def test_render_async_cancel():
+    started = threading.Event()
+    release = threading.Event()
+
+    def _block():
+        started.set()
+        release.wait(10)
+
+    async def _cancel():
+        busy = asyncio.get_running_loop().run_in_executor(pool, _block)
+        task = asyncio.ensure_future(GridfinityBox(1, 1, 1).render_async(executor=pool))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        release.set()
+        await busy
+
+    with ThreadPoolExecutor(1) as pool:
+        asyncio.run(_cancel())
+    assert started.is_set()
+
+
+def test_render_async_cancel_started(monkeypatch):
+    started = threading.Event()
+    stages = []
+    stage = RenderMonitor.stage
+
+    def _stage(self, name, fraction):
+        started.set()
+        stage(self, name, fraction)
+        stages.append(name)
+
+    monkeypatch.setattr(RenderMonitor, "stage", _stage)
+
+    async def _cancel():
+        b1 = GridfinityBox(3, 3, 4, holes=True, scoops=True, labels=True)
+        task = asyncio.ensure_future(b1.render_async(executor=pool))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 10)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    # the started render stops at its next stage
+    with ThreadPoolExecutor(1) as pool:
+        asyncio.run(_cancel())
+    assert started.is_set() and "done" not in stages
@@ -32,3 +32,55 @@ def test_make_ext_baseplate():
     assert _almost_same(size_3d(r), (210, 168, 9.75))
     edge_diff = abs(len(r.edges(FlatEdgeSelector(0)).vals()) - 188)
     assert edge_diff < 3
+
+
+def test_lattice_baseplate():
+    for kwargs in [{}, {"ext_depth": 5, "corner_screws": True}]:
+        r0 = GridfinityBaseplate(4, 3, **kwargs).render()
+        bp = GridfinityBaseplate(4, 3, lattice=True, **kwargs)
+        r = bp.render()
+        assert len(r.solids().vals()) == 1
+        assert r.val().isValid()
+        assert _almost_same(size_3d(r), size_3d(r0))
+        v0, v = r0.val().Volume(), r.val().Volume()
+        assert abs(v - v0) / v0 < 1e-3
+    r = GridfinityBaseplate(2, 2, lattice=True, straight_bottom=True).render()
+    assert _almost_same(size_3d(r), (84, 84, 4.75))
+    assert _faces_match(r, "<Z", 1)
+
+
+def test_baseplate_estimate():
+    for kwargs in [{}, {"ext_depth": 5, "corner_screws": True}]:
+        bp = GridfinityBaseplate(4, 3, **kwargs)
+        est = bp.estimate()
+        r = bp.render()
+        v = r.val().Volume()
+        assert abs(est["volume"] - v) / v < 0.005
+        assert _almost_same(est["size"], size_3d(r))
+        assert est["pockets"] == 12
+
+
+def test_baseplate_tile_layout():
+    bp = GridfinityBaseplate(12, 9)
+    tiles = bp.tile_layout(220)
+    assert len(tiles) == 6
+    assert sorted(set(t["size_u"] for t in tiles)) == [(4, 4), (4, 5)]
+    assert sum(t["size_u"][0] * t["size_u"][1] for t in tiles) == 12 * 9
+    assert tiles[0]["offset_u"] == (0, 0)
+    assert _almost_same(tiles[0]["centre"], (-4 * GRU, -2 * GRU))
+    assert _almost_same(tiles[-1]["centre"], (4 * GRU, 2.5 * GRU))
+    tiles = bp.tile_layout(250, 130)
+    assert len(tiles) == 9
+    assert all(t["size_u"] == (4, 3) for t in tiles)
+
+
+def test_baseplate_tiles(tmp_path):
+    bp = GridfinityBaseplate(3, 2)
+    rt = bp.render_tiles(100)
+    assert sorted(rt.keys()) == [(1, 2), (2, 2)]
+    assert _almost_same(size_3d(rt[(2, 2)]), (84, 84, 4.75))
+    m = bp.save_tiles(100, path=str(tmp_path), file_format="stl", workers=1)
+    assert m["files"]["2x2"]["count"] == 1
+    assert m["files"]["1x2"]["file"] == "gf_baseplate_3x2_tile_1x2.stl"
+    assert (tmp_path / "gf_baseplate_3x2_tile_2x2.stl").exists()
+    assert (tmp_path / "gf_baseplate_3x2_tiles.json").exists()
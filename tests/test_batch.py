@@ -0,0 +1,372 @@
+# Gridfinity tests
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import json
+import os
+import signal
+import time
+
+import cadquery as cq
+import pytest
+
+# my modules
+from cqgridfinity import *
+from cqgridfinity import constants
+from cqgridfinity.gf_cache import geometry_key
+from cqgridfinity.gf_diskcache import DiskGeometryCache
+from cqgridfinity.gf_pool import preload, preloaded_cache
+from cqgridfinity.gf_shared import SharedGeometryStore
+from cqkit.cq_helpers import size_3d
+
+from common_test import _almost_same
+
+
+def test_geometry_cache():
+    assert geometry_key("shell", 2, 3, 4) == geometry_key("shell", 2, 3, 4)
+    assert geometry_key("shell", 2, 3, 4) != geometry_key("shell", 2, 3, 5)
+    cache = GeometryCache()
+    assert GeometryCache.active() is None
+    b1 = GridfinityBox(2, 1, 3)
+    with cache:
+        assert GeometryCache.active() is cache
+        r1 = b1.render_shell(as_solid=True)
+        r2 = GridfinityBox(2, 1, 3, holes=True).render_shell(as_solid=True)
+    assert GeometryCache.active() is None
+    assert _almost_same(r1.val().Volume(), r2.val().Volume())
+    assert cache.misses == 3
+    assert cache.hits == 1
+    assert cache.stats["kinds"]["shell"]["hits"] == 1
+    assert cache.stats["kinds"]["feet"]["misses"] == 1
+    assert cache.stats["kinds"]["foot"]["misses"] == 1
+
+
+def test_threaded_geometry_cache():
+    cache = GeometryCache()
+
+    def _render(holes):
+        with cache:
+            return GridfinityBox(2, 1, 3, holes=holes).render_shell(as_solid=True)
+
+    with ThreadPoolExecutor(4) as pool:
+        rs = list(pool.map(_render, [False, True, False, True]))
+    assert GeometryCache.active() is None
+    assert all(_almost_same(r.val().Volume(), rs[0].val().Volume()) for r in rs)
+    assert cache.misses == 3
+    assert cache.hits == 3
+
+
+def test_batch_render():
+    batch = GridfinityBatch.matrix(
+        GridfinityBox, length_u=2, width_u=1, height_u=[3, 4], holes=[False, True]
+    )
+    assert len(batch) == 4
+    assert batch.objs[3].height_u == 4 and batch.objs[3].holes
+    rs = batch.render()
+    assert _almost_same(size_3d(rs[3]), (83.5, 41.5, 31.8))
+    r0 = GridfinityBox(2, 1, 4, holes=True).render()
+    assert _almost_same(rs[3].val().Volume(), r0.val().Volume())
+    st = batch.stats
+    assert st["objects"] == 4
+    assert st["kinds"]["shell"]["hits"] == 2
+    assert st["kinds"]["shell"]["misses"] == 2
+    assert st["kinds"]["interior"]["hits"] == 2
+    assert st["saved_time"] > 0
+    assert "Rendered 4 objects" in batch.report()
+
+
+def test_batch_save(tmp_path):
+    batch = GridfinityBatch.matrix(
+        GridfinityBox, length_u=1, width_u=1, height_u=[2, 3, 4]
+    )
+    fns = batch.save(path=str(tmp_path), file_format="stl", queue_size=1)
+    assert len(fns) == 3
+    assert all(os.path.getsize(fn) > 0 for fn in fns)
+    assert all(obj._cq_obj is None for obj in batch.objs)
+    st = batch.stats
+    assert st["tessellate_time"] > 0 and st["write_time"] > 0
+    assert "Tessellated" in batch.report()
+
+
+def test_batch_validate():
+    batch = GridfinityBatch.matrix(
+        GridfinityBox, length_u=2, width_u=1, height_u=3, wall_th=[1.0, 3.0, 0.2]
+    )
+    errors = batch.validate()
+    assert list(errors.keys()) == [1, 2]
+    assert errors[2][0].param == "wall_th"
+    with pytest.raises(GridfinitySpecError) as exc:
+        batch.render()
+    assert len(exc.value.errors) == 2
+    assert batch.cache.misses == 0
+    invalid = batch.remove_invalid()
+    assert len(invalid) == 2 and len(batch) == 1
+
+
+class _CrashBox(GridfinityBox):
+    def render(self):
+        os._exit(3)
+
+
+class _HangBox(GridfinityBox):
+    def render(self):
+        time.sleep(60)
+
+
+class _ErrorBox(GridfinityBox):
+    def render(self):
+        raise RuntimeError("BRep_API: command not done")
+
+
+def test_batch_run(tmp_path):
+    objs = [
+        GridfinityBox(1, 1, 2),
+        _CrashBox(1, 1, 3),
+        _HangBox(1, 1, 4),
+        GridfinityBox(1, 1, 5, wall_th=3.0),
+        _ErrorBox(1, 1, 6),
+        GridfinityBox(1, 1, 3, holes=True),
+    ]
+    batch = GridfinityBatch(objs)
+    manifest = str(tmp_path / "manifest.jsonl")
+    results = batch.run(
+        path=str(tmp_path),
+        file_format="stl",
+        manifest=manifest,
+        workers=2,
+        timeout=5,
+        max_jobs=1,
+    )
+    status = [r["status"] for r in results]
+    assert status == ["ok", "crash", "timeout", "invalid", "error", "ok"]
+    assert "code 3" in results[1]["error"]
+    assert "BRep_API" in results[4]["error"]
+    assert os.path.isfile(results[0]["filename"])
+    assert os.path.isfile(results[5]["filename"])
+    assert batch.runner.restarts == 2
+    assert batch.runner.recycled >= 1
+    with open(manifest) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 6
+    assert (
+        BuildManifest(manifest).records[results[2]["filename"]]["status"] == "timeout"
+    )
+
+
+def test_idle_worker_crash(tmp_path):
+    objs = [GridfinityBox(1, 1, 2), GridfinityBox(1, 1, 3)]
+    jobs = [
+        (obj, str(tmp_path / ("%d.stl" % (i))), "stl") for i, obj in enumerate(objs)
+    ]
+
+    def _kill(result):
+        # the worker dies while it waits for its next job
+        if result["index"] == 0:
+            os.kill(result["pid"], signal.SIGKILL)
+            time.sleep(0.5)
+
+    runner = GridfinityJobRunner(workers=1)
+    results = runner.run(jobs, callback=_kill)
+    assert [r["status"] for r in results] == ["ok", "ok"]
+    assert runner.restarts == 1
+
+
+def test_batch_resume(tmp_path, monkeypatch):
+    def _batch():
+        objs = [
+            GridfinityBox(1, 1, 2),
+            GridfinityBaseplate(1, 1),
+            GridfinityBox(1, 1, 3),
+        ]
+        return GridfinityBatch(objs)
+
+    manifest = str(tmp_path / "manifest.jsonl")
+    kwargs = {"path": str(tmp_path), "manifest": manifest, "workers": 2}
+    results = _batch().run(**kwargs)
+    assert [r["status"] for r in results] == ["ok", "ok", "ok"]
+    # an interrupted run leaves a partial record which is ignored
+    with open(manifest, "a") as f:
+        f.write('{"filename": "gf_box')
+    results = _batch().run(**kwargs)
+    assert [r["status"] for r in results] == ["skipped", "skipped", "skipped"]
+    # outputs which were changed or built from a different spec are rebuilt
+    with open(results[0]["filename"], "a") as f:
+        f.write("modified")
+    batch = _batch()
+    batch.objs[2].fillet_interior = False
+    results = batch.run(**kwargs)
+    assert [r["status"] for r in results] == ["ok", "skipped", "ok"]
+    # a change to a constant only rebuilds the objects which use it (the
+    # last box is also rebuilt since its output was built from another spec)
+    monkeypatch.setattr(constants, "GR_BASE_RIDGE", 0.2)
+    results = _batch().run(**kwargs)
+    assert [r["status"] for r in results] == ["skipped", "ok", "ok"]
+    results = _batch().run(resume=False, **kwargs)
+    assert [r["status"] for r in results] == ["ok", "ok", "ok"]
+
+
+def test_batch_dedupe(tmp_path):
+    b1 = GridfinityBox(3, 1, 2, lite_style=True, length_div=1)
+    b2 = GridfinityBox(3, 1, 2, lite_style=True, length_div=2)
+    b3 = GridfinityBox(3, 1, 2, solid=True, scoops=True, length_div=2)
+    b4 = GridfinityBox(3.0, 1, 2, solid=True)
+    assert b1.canonical_params() == b2.canonical_params()
+    assert b3.canonical_params() == b4.canonical_params()
+    assert b1.filename() != b2.filename()
+    p1 = GridfinityBaseplate(2, 2, corner_screws=True)
+    p2 = GridfinityBaseplate(2, 2, corner_screws=True, ext_depth=5)
+    p3 = GridfinityBaseplate(2, 2, csk_hole=4.0)
+    assert p1.canonical_params() == p2.canonical_params()
+    assert p3.canonical_params() == GridfinityBaseplate(2, 2).canonical_params()
+
+    batch = GridfinityBatch([b1, b3, b2, b4, GridfinityBox(3, 1, 2)])
+    assert batch.duplicates() == [0, 1, 0, 1, 4]
+    fns = batch.save(path=str(tmp_path), file_format="stl")
+    assert os.path.samefile(fns[0], fns[2])
+    assert not os.path.samefile(fns[0], fns[4])
+    assert batch.stats["linked"] == 1
+
+    manifest = str(tmp_path / "manifest.jsonl")
+    kwargs = {"path": str(tmp_path), "manifest": manifest, "workers": 2}
+    batch = GridfinityBatch([b1, b2, GridfinityBox(3, 1, 2)])
+    results = batch.run(**kwargs)
+    assert [r["status"] for r in results] == ["ok", "linked", "ok"]
+    assert os.path.samefile(results[0]["filename"], results[1]["filename"])
+    results = batch.run(**kwargs)
+    assert [r["status"] for r in results] == ["skipped"] * 3
+
+
+class _LoggedBox(GridfinityBox):
+    def render(self):
+        t0 = time.time()
+        time.sleep(0.5)
+        with open(self.log, "a") as f:
+            f.write("%d %f %f\n" % (self.height_u, t0, time.time()))
+        return super().render()
+
+
+def test_batch_memory_budget(tmp_path):
+    # predicted memory of 10 MB per height unit
+    coef = [2.302585, 0, 1, 0, 0, 0, 0, 0, 0, 0]
+    model = GridfinityCostModel({"GridfinityBox": {"memory": {"coef": coef}}})
+    objs = [_LoggedBox(1, 1, h) for h in (6, 7, 1, 2)]
+    for obj in objs:
+        obj.log = str(tmp_path / "log.txt")
+    batch = GridfinityBatch(objs)
+    results = batch.run(
+        path=str(tmp_path), workers=3, memory_budget=100, cost_model=model
+    )
+    assert [r["status"] for r in results] == ["ok"] * 4
+    assert all(r["memory"] >= 0 for r in results)
+    with open(str(tmp_path / "log.txt")) as f:
+        spans = {int(h): (float(t0), float(t1)) for h, t0, t1 in map(str.split, f)}
+    # the two heavy jobs are serialized and the light jobs run beside them
+    assert spans[6][0] >= spans[7][1] or spans[7][0] >= spans[6][1]
+    assert spans[1][0] < max(spans[6][1], spans[7][1])
+
+
+def test_unit_solids_shared():
+    cache = GeometryCache()
+    with cache:
+        GridfinityBox(1, 1, 3).render()
+        GridfinityBox(3, 2, 4).render()
+        GridfinityBaseplate(2, 2).render()
+        GridfinityBaseplate(4, 3).render()
+    assert cache.stats["kinds"]["foot"]["hits"] == 1
+    assert cache.stats["kinds"]["foot"]["misses"] == 1
+    assert cache.stats["kinds"]["pocket"]["hits"] == 1
+
+
+def test_warm_job_runner(tmp_path):
+    objs = [GridfinityBox(2, 1, 3), GridfinityBaseplate(2, 1)]
+    jobs = [
+        (obj, str(tmp_path / ("%d.stl" % (i))), "stl") for i, obj in enumerate(objs)
+    ]
+    runner = GridfinityJobRunner(workers=2, start_method="fork", preload=True)
+    results = runner.run(jobs)
+    assert [r["status"] for r in results] == ["ok", "ok"]
+    cache = preloaded_cache()
+    assert cache is not None and preload() is cache
+    assert "foot" in cache.stats["kinds"] and "pocket" in cache.stats["kinds"]
+
+
+def test_shared_geometry_store(tmp_path):
+    store = SharedGeometryStore(str(tmp_path / "store"))
+    c1, c2 = GeometryCache(shared=store), GeometryCache(shared=store)
+    with c1:
+        r1 = GridfinityBox(3, 2, 4, holes=True).render()
+    with c2:
+        r2 = GridfinityBox(3, 2, 4).render()
+    assert c1.misses == 5 and len(store) == 5
+    assert c2.misses == 0 and c2.shared_hits == 3
+    assert c2.stats["kinds"]["shell"]["shared"] == 1
+    assert _almost_same(
+        r2.val().Volume(), GridfinityBox(3, 2, 4).render().val().Volume()
+    )
+    # least recently used sub-solids are evicted
+    store.clear()
+    rs = [cq.Workplane("XY").box(10, 10, h) for h in (1, 2, 3)]
+    store.put("a", rs[0], 1.0)
+    store.put("b", rs[1], 2.0)
+    r, t = store.get("a")
+    assert _almost_same(size_3d(r), (10, 10, 1)) and t == 1.0
+    store.max_size = 2.5 * store.size / 2
+    evictions = store.evictions
+    store.put("c", rs[2])
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+    assert store.evictions == evictions + 1
+    store.put("none", None)
+    assert store.get("none") == (None, 0.0)
+
+
+def test_shared_store_size(tmp_path, monkeypatch):
+    store = SharedGeometryStore(str(tmp_path / "store"))
+    rs = [cq.Workplane("XY").box(10, 10, h) for h in (1, 2, 3)]
+    scans = []
+    blob_stats = store._blob_stats
+    monkeypatch.setattr(store, "_blob_stats", lambda: scans.append(1) or blob_stats())
+    # blobs are only listed when the store is over its size limit
+    for i, r in enumerate(rs):
+        store.put("k%d" % (i), r)
+    store.put("k0", rs[2])
+    assert not scans
+    sizes = sum(os.path.getsize(fn) for fn in store._blobs())
+    assert store._total() == sizes
+    store.max_size = store.size / 2
+    store.put("k3", rs[0])
+    assert scans and store._total() == sum(os.path.getsize(fn) for fn in store._blobs())
+    # threads of one process writing the same blob do not collide
+    store.max_size = 512
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        list(ex.map(lambda r: store.put("same", r), rs * 4))
+    assert store.get("same") is not None
+    assert not glob.glob(os.path.join(store.path, "*.tmp"))
+
+
+def test_shared_job_runner(tmp_path):
+    objs = [GridfinityBox(2, 2, 3), GridfinityBox(2, 2, 3, holes=True)]
+    jobs = [
+        (obj, str(tmp_path / ("%d.stl" % (i))), "stl") for i, obj in enumerate(objs)
+    ]
+    store = SharedGeometryStore(str(tmp_path / "store"))
+    runner = GridfinityJobRunner(workers=2, shared_cache=store)
+    results = runner.run(jobs)
+    assert [r["status"] for r in results] == ["ok", "ok"]
+    assert len(store) >= 4
+    assert os.path.isdir(store.path)
+
+
+def test_shared_recycled_workers(tmp_path):
+    objs = [GridfinityBox(2, 2, 3, holes=h) for h in (False, True, False)]
+    jobs = [
+        (obj, str(tmp_path / ("%d.stl" % (i))), "stl") for i, obj in enumerate(objs)
+    ]
+    runner = GridfinityJobRunner(workers=1, max_jobs=1, shared_cache=True)
+    results = runner.run(jobs)
+    assert [r["status"] for r in results] == ["ok"] * 3 and runner.recycled == 2
+    # workers which replace recycled workers keep sharing sub-solids
+    disk = DiskGeometryCache(str(tmp_path / "cache"))
+    runner = GridfinityJobRunner(workers=1, max_jobs=1, shared_cache=disk)
+    results = runner.run(jobs)
+    assert [r["status"] for r in results] == ["ok"] * 3 and runner.recycled == 2
+    assert disk.stats["kinds"]["shell"]["hits"] == 2
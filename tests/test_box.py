@@ -1,4 +1,7 @@
 # Gridfinity tests
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
 import pytest
 
 # my modules
@@ -50,6 +53,14 @@ def test_invalid_box():
     with pytest.raises(ValueError):
         b1 = GridfinityBox(2, 3, 5, wall_th=3.0)
         b1.render()
+    b1 = GridfinityBox(2, 3, 5, lite_style=True, holes=True, wall_th=2.0)
+    errors = b1.validate()
+    assert [e.param for e in errors] == ["holes", "wall_th"]
+    assert errors[1].value == 2.0
+    with pytest.raises(GridfinitySpecError) as exc:
+        b1.render()
+    assert exc.value.errors == errors
+    assert GridfinityBox(2, 3, 5, lite_style=True).validate() == []
 
 
 def test_lite_box():
@@ -147,6 +158,123 @@ def test_divided_box():
     assert b1.filename() == "gf_box_3x3x3_div2x1_holes"
 
 
+def test_fillet_free_box():
+    kwargs = {"holes": True, "length_div": 2, "width_div": 1}
+    b1 = GridfinityBox(3, 2, 5, fillet_free=True, **kwargs)
+    assert b1.can_render_fillet_free
+    r = b1.render()
+    r0 = GridfinityBox(3, 2, 5, **kwargs).render()
+    assert _almost_same(size_3d(r), size_3d(r0))
+    assert len(r.solids().vals()) == 1
+    v0, v = r0.val().Volume(), r.val().Volume()
+    assert abs(v - v0) / v0 < 1e-3
+    assert _faces_match(r, "<Z", 6)
+    spans = b1.compartment_spans(2, b1.inner_l)
+    assert len(spans) == 3
+    assert _almost_same(spans[0][0], -b1.half_in)
+    assert _almost_same(spans[1][1] - spans[1][0], b1.inner_l / 3 - GR_DIV_WALL)
+    b2 = GridfinityBox(2, 2, 3, fillet_free=True, scoops=True)
+    assert not b2.can_render_fillet_free
+
+
+def test_box_estimate():
+    for kwargs in [
+        {"holes": True, "scoops": True, "labels": True},
+        {"length_div": 2, "width_div": 1, "no_lip": True},
+        {"lite_style": True, "length_div": 1},
+        {"solid": True, "solid_ratio": 0.5},
+    ]:
+        b1 = GridfinityBox(3, 2, 5, **kwargs)
+        est = b1.estimate()
+        r = b1.render()
+        v = r.val().Volume()
+        assert abs(est["volume"] - v) / v < 0.01
+        assert _almost_same(est["size"], size_3d(r))
+        assert _almost_same(est["mass"], est["volume"] * GR_DENSITY / 1000)
+    est = GridfinityBox(2, 2, 3, length_div=1).estimate()
+    assert len(est["compartments"]) == 2
+    shell = GridfinityBox(2, 2, 3).render_shell(as_solid=True).val().Volume()
+    assert abs(est["capacity"] + est["volume"] - shell) / shell < 0.01
+
+
+def test_template_box():
+    kwargs = {"holes": True, "length_div": 2, "width_div": 1}
+    b1 = GridfinityBox(3, 2, 7, template=True, **kwargs)
+    assert b1.template_height_u() == 3
+    r = b1.render()
+    r0 = GridfinityBox(3, 2, 7, **kwargs).render()
+    assert _almost_same(size_3d(r), size_3d(r0))
+    assert abs(r.val().Volume() - r0.val().Volume()) < 1e-3
+    assert len(r.faces().vals()) == len(r0.faces().vals())
+    b2 = GridfinityBox(3, 2, 2, template=True, **kwargs)
+    assert b2.render_from_template() is None
+    assert _almost_same(size_3d(b2.render()), (125.5, 83.5, 17.8))
+    b3 = GridfinityBox(2, 2, 6, solid=True, template=True)
+    assert b3.template_height_u() is None
+
+
+def test_template_store():
+    GridfinityBox.clear_templates()
+    boxes = [GridfinityBox(1, 1, 4, template=True, length_div=n) for n in (0, 1, 2)]
+    default = GridfinityBox.MAX_TEMPLATES
+    GridfinityBox.MAX_TEMPLATES = 2
+    try:
+        for box in boxes:
+            box.render()
+    finally:
+        GridfinityBox.MAX_TEMPLATES = default
+    # least recently used templates are evicted
+    assert len(GridfinityBox._templates) == 2
+    assert list(GridfinityBox._templates) == [
+        ("template", *b.template_key, b.template_height_u()) for b in boxes[1:]
+    ]
+    GridfinityBox.clear_templates()
+    # templates are kept in the active geometry cache
+    with GeometryCache() as cache:
+        r = GridfinityBox(1, 1, 5, template=True).render()
+    assert cache.kinds["template"]["misses"] == 1
+    assert len(GridfinityBox._templates) == 0
+    assert _almost_same(size_3d(r), size_3d(GridfinityBox(1, 1, 5).render()))
+
+
+class _SlowTemplateBox(GridfinityBox):
+    started = threading.Event()
+    release = threading.Event()
+
+    def _render_template(self, height_u):
+        if self.length_u == 2:
+            self.started.set()
+            assert self.release.wait(60)
+        return super()._render_template(height_u)
+
+
+def test_concurrent_templates():
+    GridfinityBox.clear_templates()
+    with ThreadPoolExecutor(2) as pool:
+        slow = pool.submit(_SlowTemplateBox(2, 1, 4, template=True).render)
+        try:
+            assert _SlowTemplateBox.started.wait(60)
+            # a different template renders while the first is still rendering
+            fast = pool.submit(_SlowTemplateBox(1, 1, 4, template=True).render)
+            assert fast.result(timeout=60) is not None
+            assert not slow.done()
+        finally:
+            _SlowTemplateBox.release.set()
+        assert slow.result() is not None
+    assert len(GridfinityBox._templates) == 2
+
+
+def test_threaded_box_render():
+    b1 = GridfinityBox(2, 3, 3, lite_style=True, length_div=3, scoops=True)
+    with ThreadPoolExecutor(3) as pool:
+        rs = list(pool.map(lambda _: b1.render(), range(3)))
+    assert b1.length_div == 3 and b1.width_div == 0
+    assert b1.rendered_divs == (1, 0)
+    r0 = GridfinityBox(2, 3, 3, lite_style=True, length_div=1, scoops=True).render()
+    for r in rs:
+        assert abs(r.val().Volume() - r0.val().Volume()) < 1e-3
+
+
 def test_all_features_box():
     b1 = GridfinityBox(
         4, 2, 5, holes=True, length_div=2, width_div=1, scoops=True, labels=True
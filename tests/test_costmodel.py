@@ -0,0 +1,65 @@
+# Gridfinity tests
+
+# my modules
+from cqgridfinity import *
+from cqgridfinity.gf_benchmark import (
+    benchmark_objects,
+    load_history,
+    save_history,
+    spec_params,
+)
+
+from common_test import _almost_same
+
+
+def test_benchmark_history(tmp_path):
+    objs = [GridfinityBaseplate(1, 1), GridfinityBox(1, 1, 2, lite_style=True)]
+    records = benchmark_objects(objs)
+    assert records[0]["class"] == "GridfinityBaseplate"
+    assert records[1]["params"] == spec_params(GridfinityBox(1, 1, 2, lite_style=True))
+    assert all(r["render"] > 0 and r["export"] > 0 for r in records)
+    fn = str(tmp_path / "history.jsonl")
+    save_history(records, fn)
+    save_history(records[:1], fn)
+    assert len(load_history(fn)) == 3
+
+
+def test_cost_model_fit():
+    # synthetic timings with render time proportional to cells x compartments
+    # and doubled by scoops
+    records = []
+    for l, w, div, scoops in [(1, 1, 0, 0), (2, 3, 1, 0), (4, 2, 3, 1), (3, 3, 2, 1)]:
+        box = GridfinityBox(l, w, 3, length_div=div, scoops=bool(scoops))
+        t = 0.1 * l * w * (div + 1) * 2**scoops
+        records.append(
+            {
+                "class": "GridfinityBox",
+                "params": spec_params(box),
+                "render": t,
+                "export": t / 4,
+            }
+        )
+    model = GridfinityCostModel.fit(records)
+    fit = model.costs["GridfinityBox"]["render"]
+    assert fit["samples"] == 4
+    assert fit["error"] < 1e-6
+    box = GridfinityBox(5, 4, 3, length_div=1, scoops=True)
+    assert _almost_same(model.predict(box), 0.1 * 20 * 2 * 2, tol=1e-3)
+    assert _almost_same(model.total(box), 10, tol=1e-3)
+    # features which do not vary in the records have no effect
+    box.labels = True
+    assert _almost_same(model.predict(box), 8, tol=1e-3)
+
+
+def test_cost_model_schedule():
+    model = GridfinityCostModel()
+    objs = [GridfinityBox(n, 1, 3) for n in range(1, 7)]
+    objs.append(GridfinityBaseplate(6, 6, lattice=True))
+    objs.append(GridfinityRuggedBox(5, 4, 6))
+    times = [model.total(obj) for obj in objs]
+    assert times[5] > times[0]
+    jobs, completion = model.schedule(objs, workers=3)
+    assert sorted(sum(jobs, [])) == list(range(len(objs)))
+    assert jobs[0][0] == times.index(max(times))
+    assert _almost_same(sum(completion), sum(times))
+    assert max(completion) < sum(times)
@@ -0,0 +1,59 @@
+# Gridfinity tests
+import cadquery as cq
+
+# my modules
+from cqgridfinity.gf_csg import *
+from cqkit.cq_helpers import size_3d
+
+from common_test import _almost_same
+
+
+def _box(x, y, z, size=10):
+    return cq.Workplane("XY").box(size, size, size).translate((x, y, z))
+
+
+def test_csg_optimize():
+    a, b, c = _box(0, 0, 0), _box(8, 0, 0), _box(16, 0, 0)
+    r = csg(a).union(b).union(c, None)
+    assert isinstance(r, CSGUnion)
+    assert r.op_count == 2
+    ro = r.optimized()
+    assert len(ro.children) == 3
+    assert ro.op_count == 1
+    assert _almost_same(ro.bbox, (-5, -5, -5, 21, 5, 5))
+
+    # consecutive cuts merge and disjoint tools are dropped
+    t1, t2, t3 = _box(0, 0, 5, 4), _box(0, 5, 0, 4), _box(50, 0, 0, 4)
+    r = csg(a).cut(t1).cut(t2).cut(t3)
+    assert r.op_count == 3
+    ro = r.optimized()
+    assert isinstance(ro, CSGCut)
+    assert len(ro.tools) == 2
+    assert ro.op_count == 1
+    assert isinstance(csg(a).cut(t3).optimized(), CSGShape)
+
+    # tools which only overlap one operand of a union are pushed down
+    r = csg(a).union(c).cut(t1)
+    ro = r.optimized()
+    assert isinstance(ro, CSGUnion)
+    assert isinstance(ro.children[0], CSGCut)
+    assert isinstance(ro.children[1], CSGShape)
+    ro = csg(a).union(b).cut(_box(4, 0, 5, 2)).optimized()
+    assert isinstance(ro, CSGCut)
+    assert isinstance(ro.base, CSGUnion)
+
+    assert csg(a).intersect(c).bbox is None
+
+
+def test_csg_evaluate():
+    a, b = _box(0, 0, 0), _box(8, 0, 0)
+    t1, t2 = _box(0, 0, 5, 4), _box(8, 0, -5, 4)
+    r = csg(a).union(b).cut(t1).cut(t2, _box(50, 0, 0))
+    rx = a.union(b).cut(t1).cut(t2)
+    re = r.evaluate()
+    assert _almost_same(re.val().Volume(), rx.val().Volume())
+    assert len(re.faces().vals()) == len(rx.faces().vals())
+    assert _almost_same(re.val().Volume(), r.evaluate(optimize=False).val().Volume())
+    assert _almost_same(size_3d(re), (18, 10, 10))
+    ri = csg(a).intersect(b).evaluate()
+    assert _almost_same(size_3d(ri), (2, 10, 10))
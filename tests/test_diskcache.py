@@ -0,0 +1,122 @@
+# Gridfinity tests
+import json
+import os
+
+import cadquery as cq
+
+# my modules
+import cqgridfinity
+from cqgridfinity import *
+from cqgridfinity.gf_cache import geometry_key
+from cqgridfinity.gf_diskcache import DiskGeometryCache
+from cqgridfinity.scripts.gridfinitycache import parse_matrix
+
+from common_test import _almost_same
+
+
+def test_disk_geometry_cache(tmp_path):
+    path = str(tmp_path / "cache")
+    with GeometryCache(shared=DiskGeometryCache(path)) as c1:
+        r1 = GridfinityBox(2, 1, 3, length_div=1).render()
+    # a later run re-uses the cached sub-solids
+    disk = DiskGeometryCache(path)
+    with GeometryCache(shared=disk) as c2:
+        r2 = GridfinityBox(2, 1, 3, length_div=1, holes=True).render()
+    assert c1.misses == len(disk) == 5
+    assert c2.misses == 0 and c2.shared_hits == 3
+    assert _almost_same(
+        r2.val().Volume(),
+        GridfinityBox(2, 1, 3, length_div=1, holes=True).render().val().Volume(),
+    )
+    st = disk.stats
+    assert st["solids"] == 5 and st["hits"] == 3
+    assert st["kinds"]["shell"]["solids"] == st["kinds"]["shell"]["hits"] == 1
+    assert list(st["versions"]) == [cqgridfinity.__version__]
+    row = disk._query("SELECT spec FROM solids WHERE kind = 'shell'")[0]
+    assert json.loads(row[0]) == ["shell", "GridfinityBox", 2, 1, 3]
+
+
+def test_disk_cache_eviction(tmp_path):
+    disk = DiskGeometryCache(str(tmp_path / "cache"))
+    rs = [cq.Workplane("XY").box(10, 10, h) for h in (1, 2, 3)]
+    disk.put("a1", rs[0], 1.0)
+    disk.put("b2", rs[1], 2.0)
+    # the total size is kept by the index as sub-solids are replaced
+    disk.put("b2", rs[2], 2.0)
+    sizes = disk._query("SELECT SUM(size) FROM solids")[0][0]
+    assert disk.size == sizes / 2**20 == disk.stats["size"]
+    r, t = disk.get("a1")
+    assert t == 1.0 and _almost_same(r.val().Volume(), 100)
+    disk.max_size = 2.5 * disk.size / 2
+    disk.put("c3", rs[2])
+    assert disk.get("b2") is None and not os.path.isfile(disk._filename("b2"))
+    assert disk.get("a1") is not None and disk.evictions == 1
+    # sub-solids of other versions are never returned and are pruned
+    disk._query("UPDATE solids SET version = '0.0.1' WHERE key = 'a1'")
+    assert disk.get("a1") is None
+    os.remove(disk._filename("c3"))
+    assert disk.prune() == 2 and len(disk) == 0
+    disk.put("none", None)
+    assert disk.get("none") == (None, 0.0)
+    assert disk.clear() == 1 and disk.size == 0
+
+
+def test_disk_cache_job_runner(tmp_path):
+    disk = DiskGeometryCache(str(tmp_path / "cache"))
+    objs = [GridfinityBox(2, 2, 3), GridfinityBaseplate(2, 2)]
+    jobs = [
+        (obj, str(tmp_path / ("%d.stl" % (i))), "stl") for i, obj in enumerate(objs)
+    ]
+    results = GridfinityJobRunner(workers=2, shared_cache=disk).run(jobs)
+    assert [r["status"] for r in results] == ["ok", "ok"]
+    assert disk.stats["kinds"]["shell"]["solids"] == 1
+    assert parse_matrix(GridfinityBox, ["height_u=2,3", "holes=true"]) == {
+        "height_u": [2, 3],
+        "holes": True,
+    }
+
+
+def test_sub_solids():
+    objs = [
+        GridfinityBox(2, 1, 3, length_div=1, scoops=True),
+        GridfinityBox(1, 1, 4, length_div=1, fillet_free=True),
+        GridfinityBox(1, 1, 5, length_div=1, template=True),
+        GridfinityBaseplate(2, 1),
+    ]
+    for obj in objs:
+        with GeometryCache() as cache:
+            obj.render()
+        keys = [
+            geometry_key(*owner.cache_key(key))
+            for stage in obj.sub_solids()
+            for owner, key, _, _ in stage
+        ]
+        assert set(keys) == set(cache.solids) and len(keys) == len(cache.solids)
+    stages = GridfinityRuggedBox(5, 4, 6).sub_solids()
+    kinds = [key[0] for _, key, _, _ in stages[0]]
+    assert kinds == ["hinge_mount", "latch", "hinge", "handle", "pocket", "pocket"]
+
+
+def test_batch_warm(tmp_path):
+    disk = DiskGeometryCache(str(tmp_path / "cache"))
+    batch = GridfinityBatch.matrix(
+        GridfinityBox, length_u=[1, 2], width_u=1, height_u=[2, 3]
+    )
+    solids = batch.sub_solids()
+    # the foot is shared by every box and the shells contain the feet
+    assert [(s[0], s[1], s[3][0]) for s in solids[:2]] == [
+        (0, 4, "foot"),
+        (0, 1, "interior"),
+    ]
+    assert [(s[0], s[1], s[3][0]) for s in solids[-6:-4]] == [(1, 2, "feet")] * 2
+    assert [s[3][0] for s in solids[-4:]] == ["shell"] * 4
+    assert len(solids) == 1 + 4 + 4 + 2 + 4
+    results = batch.warm(disk, workers=2)
+    assert len(results) == len(disk) == len(solids)
+    assert all(r["status"] == "ok" for r in results)
+    assert results[0]["kind"] == "foot" and results[0]["count"] == 4
+    with GeometryCache(shared=disk) as cache:
+        for obj in batch.objs:
+            obj.render()
+    assert cache.misses == 0
+    assert batch.warm(disk) == []
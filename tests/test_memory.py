@@ -0,0 +1,80 @@
+# Gridfinity tests
+import gc
+
+from cadquery.selectors import StringSyntaxSelector
+
+# my modules
+from cqgridfinity import *
+from cqgridfinity import gf_helpers
+from cqgridfinity.gf_memory import (
+    MemoryProfiler,
+    live_shapes,
+    peak_rss,
+    release_memory,
+    rss,
+)
+
+
+def test_memory_profiler():
+    b1 = GridfinityBox(2, 2, 3, holes=True, scoops=True)
+    with MemoryProfiler() as profiler:
+        r = b1.render()
+    names = [s["stage"] for s in profiler.stages]
+    assert names[0] == "start" and "fillets" in names and "done" not in names
+    assert all(s["peak_rss"] >= s["rss"] > 0 for s in profiler.stages)
+    assert profiler.peak >= rss() / 2
+    assert max(s["shapes"] for s in profiler.stages) > 0
+    assert "Peak RSS" in profiler.report()
+    assert peak_rss() > 0
+    assert r.val().isValid()
+
+
+def _held_shapes(make):
+    # renders a new object with the garbage collector disabled and returns
+    # the number of shapes which are kept alive until it is released
+    make().render()
+    release_memory()
+    shapes = live_shapes()
+    gc.disable()
+    try:
+        obj = make()
+        r = obj.render()
+        held = live_shapes() - shapes
+        assert held == len(r.vals())
+    finally:
+        gc.enable()
+    del obj, r
+    release_memory()
+    assert live_shapes() == shapes
+    return held
+
+
+def test_render_releases_shapes():
+    # intermediate shapes are freed by reference counting as soon as the
+    # render no longer needs them, only the rendered solid is kept
+    assert _held_shapes(
+        lambda: GridfinityBox(2, 1, 3, holes=True, length_div=1, labels=True)
+    )
+    assert _held_shapes(lambda: GridfinityBaseplate(3, 2, corner_screws=True))
+
+
+def test_rugged_box_releases_shapes():
+    assert _held_shapes(lambda: GridfinityRuggedBox(3, 3, 4))
+
+
+def test_selector_cache_releases_shapes(monkeypatch):
+    b1 = GridfinityBox(2, 1, 3, scoops=True)
+    b1.render()
+    release_memory()
+    gc.disable()
+    try:
+        b1.render()
+        assert gc.collect() == 0
+        # selectors parsed on every use leave reference cycles behind
+        monkeypatch.setattr(
+            gf_helpers, "_parse_selector", lambda s: StringSyntaxSelector(s)
+        )
+        b1.render()
+        assert gc.collect() > 0
+    finally:
+        gc.enable()
@@ -0,0 +1,39 @@
+# Gridfinity tests
+import cadquery as cq
+
+# my modules
+from cqgridfinity import *
+from cqkit.cq_helpers import size_3d, composite_from_pts
+
+from common_test import _almost_same
+
+
+def test_grid_pattern_points():
+    rc = cq.Workplane("XY").rect(10, 10).extrude(2)
+    gp = GridPattern.grid(rc, 3, 2)
+    assert len(gp) == 6
+    assert (2 * GRU, GRU, 0) in gp.pts
+    gp = GridPattern.grid(rc, 3, 2, centred=True)
+    assert (-GRU, -GRU2, 0) in gp.pts
+    assert (GRU, GRU2, 0) in gp.pts
+    gp = GridPattern(rc, [(1, 2), (3, 4, 5)])
+    assert gp.pts == [(1, 2, 0), (3, 4, 5)]
+    assert len(gp.compound().Solids()) == 2
+
+
+def test_grid_pattern_booleans():
+    rb = cq.Workplane("XY").rect(4 * GRU, 3 * GRU).extrude(5)
+    rc = cq.Workplane("XY").circle(8).extrude(3)
+    gp = GridPattern.grid(rc, 4, 3, centred=True)
+    r = gp.cut_from(rb)
+    assert _almost_same(size_3d(r), (4 * GRU, 3 * GRU, 5))
+    rx = rb.cut(composite_from_pts(rc, gp.pts))
+    assert _almost_same(r.val().Volume(), rx.val().Volume())
+    assert len(r.faces(">Z").vals()) == 1
+    assert len(r.faces(">Z").edges().vals()) == 4
+
+    r = gp.union_with(rb.translate((0, 0, -5)))
+    assert len(r.solids().vals()) == 1
+    assert _almost_same(size_3d(r), (4 * GRU, 3 * GRU, 8))
+    rf = gp.fused()
+    assert len(rf.solids().vals()) == 12
@@ -0,0 +1,59 @@
+# Gridfinity tests
+import io
+
+import pytest
+
+# my modules
+from cqgridfinity import *
+from cqgridfinity.gf_progress import CancelToken, RenderCancelled, RenderMonitor
+from cqgridfinity.scripts import ProgressBar
+
+
+def test_render_progress():
+    stages = []
+    b1 = GridfinityBox(2, 2, 3, holes=True, length_div=1, scoops=True)
+    r = b1.render(progress=lambda stage, f: stages.append((stage, f)))
+    assert r is not None
+    names = [s for s, _ in stages]
+    assert names[0] == "start" and names[-1] == "done"
+    assert "fillets" in names and "holes" in names
+    fractions = [f for _, f in stages]
+    assert fractions == sorted(fractions)
+    assert fractions[-1] == 1.0
+
+
+def test_nested_render_progress():
+    stages = []
+    s1 = GridfinityDrawerSpacer(4 * GRU + 30, 3 * GRU + 30)
+    with RenderMonitor(progress=lambda stage, f: stages.append((stage, f))):
+        s1.render_full_set(include_baseplate=True)
+    names = [s for s, _ in stages]
+    assert names.count("start") == 1 and names.count("done") == 1
+    assert "baseplate" in names and "pockets" in names
+    fractions = [f for _, f in stages]
+    assert fractions == sorted(fractions)
+    assert s1._obj_label == "full_set"
+
+
+def test_render_cancel():
+    token = CancelToken()
+
+    def _progress(stage, fraction):
+        if stage == "dividers":
+            token.cancel()
+
+    b1 = GridfinityBox(2, 2, 3, length_div=1)
+    with pytest.raises(RenderCancelled):
+        b1.render(progress=_progress, cancel=token)
+    assert token.cancelled
+    assert b1.length_div == 1
+    assert b1.render() is not None
+
+
+def test_progress_bar():
+    out = io.StringIO()
+    bar = ProgressBar(width=10, stream=out)
+    bar("fillets", 0.5)
+    bar("done", 1.0)
+    assert "[#####-----]  50% fillets" in out.getvalue()
+    assert out.getvalue().endswith("\n")
@@ -1,4 +1,5 @@
 # Gridfinity tests
+import pytest
 
 # my modules
 from cqgridfinity import *
@@ -34,6 +35,8 @@ def test_rugged_box():
     r = b1.render()
     assert r is not None
     assert _almost_same(size_3d(r), (230.0, 194.15, 47.5))
+    est = b1.estimate()
+    assert abs(est["volume"] / r.val().Volume() - 1) < 0.02
     if _export_files("rbox"):
         b1.save_step_file(path=EXPORT_STEP_FILE_PATH)
 
@@ -43,11 +46,22 @@ def test_rugged_box_lid():
     r = b1.render_lid()
     assert r is not None
     assert _almost_same(size_3d(r), (230.0, 188, 12.5))
+    est = b1.estimate()
+    assert abs(est["lid_volume"] / r.val().Volume() - 1) < 0.02
+    assert _almost_same(est["size"][:2], (230.0, 188))
     assert b1.filename() == "gf_ruggedbox_5x4x6_lid_fr-hl_sd-hc_stack_lidbp"
     if _export_files("rbox"):
         b1.save_step_file(path=EXPORT_STEP_FILE_PATH)
 
 
+def test_rugged_box_validate():
+    b1 = GridfinityRuggedBox(2, 4, 3)
+    assert [e.param for e in b1.validate()] == ["length_u", "height_u"]
+    with pytest.raises(ValueError):
+        b1.render()
+    assert _rugged_box().validate() == []
+
+
 def test_rugged_box_acc():
     b1 = _rugged_box()
     r = b1.render_accessories()
@@ -83,6 +97,10 @@ def test_rugged_box_parts():
     if _export_files("rbox"):
         b1.save_step_file(path=EXPORT_STEP_FILE_PATH)
 
+    r = b1.render_detached("render_label")
+    assert r is not None and r is not b1.cq_obj
+    assert b1.filename() == "gf_ruggedbox_5x4x6_latch_fr-hl_sd-hc_stack_lidbp"
+
 
 def test_rugged_box_assembly():
     if _export_files("rbox"):
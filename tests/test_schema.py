@@ -0,0 +1,71 @@
+# Gridfinity tests
+import os
+
+import pytest
+
+# my modules
+from cqgridfinity import *
+from cqgridfinity.gf_partcad import PARTCAD_PARTS, SHIM_PATH, partcad_parts, shim_source
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+SCHEMA_CLASSES = [
+    GridfinityBox,
+    GridfinityBaseplate,
+    GridfinityRuggedBox,
+    GridfinityDrawerSpacer,
+]
+
+
+def test_schema_defaults():
+    for cls in SCHEMA_CLASSES:
+        dims = [p for p in cls.PARAMS if p.name in ("length_u", "width_u", "height_u")]
+        obj = cls(**{p.name: p.default for p in dims})
+        for p in cls.PARAMS:
+            assert getattr(obj, p.name) == p.default, (cls.__name__, p.name)
+
+
+def test_schema_dict():
+    b1 = GridfinityBox(3, 2, 5, holes=True, length_div=2, scoop_rad=10)
+    d = b1.to_dict()
+    assert d["class"] == "GridfinityBox"
+    assert d["length_u"] == 3 and d["scoop_rad"] == 10
+    b2 = GridfinityBox.from_dict(d)
+    assert b2.to_dict() == d
+    assert b2.filename() == b1.filename()
+    assert GridfinityObject.from_json(b1.to_json()).to_dict() == d
+    assert GridfinityBox.from_dict({"length_u": 4}).width_u == 2
+    r1 = GridfinityRuggedBox(5, 4, 6, rib_style=True)
+    r1.lid_window = True
+    r2 = GridfinityObject.from_json(r1.to_json())
+    assert isinstance(r2, GridfinityRuggedBox)
+    assert r2.lid_window and not r2.lid_baseplate and r2.label_length is None
+    with pytest.raises(ValueError):
+        GridfinityBox.from_dict({"length_u": 2, "colour": "red"})
+    with pytest.raises(ValueError):
+        GridfinityBaseplate.from_dict(d)
+
+
+def test_schema_params():
+    assert GridfinityBox.parse_param("scoops=yes") == ("scoops", True)
+    assert GridfinityBox.parse_param("wall_th = 1.2") == ("wall_th", 1.2)
+    assert GridfinityRuggedBox.parse_param("label_length=none") == (
+        "label_length",
+        None,
+    )
+    with pytest.raises(ValueError):
+        GridfinityBox.parse_param("scoop_radius=10")
+    with pytest.raises(ValueError):
+        GridfinityBox.parse_param("holes=maybe")
+    b1 = GridfinityBox(2, 2, 3, solid_ratio=1.5, length_div=-1)
+    assert [e.param for e in b1.validate()] == ["length_div", "solid_ratio"]
+
+
+def test_partcad_shims():
+    # the PartCAD shims and partcad.yaml are generated from the parameter
+    # schemas with python -m cqgridfinity.gf_partcad
+    for part in PARTCAD_PARTS:
+        with open(os.path.join(ROOT, SHIM_PATH % (part))) as f:
+            assert f.read() == shim_source(part)
+    with open(os.path.join(ROOT, "partcad.yaml")) as f:
+        assert partcad_parts() in f.read()
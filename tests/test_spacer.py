@@ -103,3 +103,11 @@ def test_spacer_render():
 #     # assert s1.filename() == "gf_drawer_4x3_half_set"
 #     # if _export_files("spacer"):
 #     s1.save_step_file(path=EXPORT_STEP_FILE_PATH)
+
+
+def test_spacer_validate():
+    s1 = GridfinityDrawerSpacer(4 * GRU + 4, 3 * GRU + 4, tolerance=0.25)
+    assert [e.param for e in s1.validate()] == ["min_margin"]
+    assert s1.render() is None
+    s1.best_fit_to_dim(4 * GRU + 30, 3 * GRU + 4)
+    assert s1.validate() == []
@@ -0,0 +1,53 @@
+# Gridfinity tests
+import pickle
+import subprocess
+import sys
+
+import pytest
+
+# my modules
+from cqgridfinity import *
+
+from common_test import _almost_same
+
+
+def test_spec_no_cadquery():
+    code = "import sys, cqgridfinity.gf_spec; print('cadquery' in sys.modules)"
+    r = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert r.stdout.strip() == "False"
+
+
+def test_box_spec():
+    s1 = GridfinityBoxSpec(3, 2, 5, holes=True, length_div=2, labels=True)
+    b1 = GridfinityBox(3, 2, 5, holes=True, length_div=2, labels=True)
+    assert not hasattr(s1, "__dict__")
+    for attr in [
+        "int_height",
+        "max_height",
+        "floor_h",
+        "inner_dim",
+        "outer_dim",
+        "top_ref_height",
+        "safe_fillet_rad",
+        "hole_centres",
+    ]:
+        assert getattr(s1, attr) == getattr(b1, attr)
+    assert _almost_same(
+        s1.safe_label_height(True, True), b1.safe_label_height(True, True)
+    )
+    with pytest.raises(AttributeError):
+        s1.height_u = 6
+    s2 = s1.replace(height_u=6)
+    assert s2.height_u == 6 and s1.height_u == 5
+    assert s2 != s1 and s2.replace(height_u=5) == s1
+    assert len({s1, s2, s2.replace(height_u=5)}) == 2
+    assert pickle.loads(pickle.dumps(s1)) == s1
+    assert GridfinityBoxSpec.from_json(s1.to_json()) == s1
+    assert GridfinityBoxSpec.from_obj(b1) == s1
+    assert s1.to_obj().to_dict() == b1.to_dict()
+    assert GridfinityObject.from_dict(s1.to_dict()).filename() == b1.filename()
+    s3 = s1.replace(lite_style=True, wall_th=2.0)
+    assert not s3.is_valid
+    assert s3.validate() == s3.to_obj().validate()
+    with pytest.raises(ValueError):
+        GridfinityBoxSpec(2, 2, 3, colour="red")
@@ -0,0 +1,82 @@
+# Gridfinity tests
+import subprocess
+import sys
+
+import pytest
+
+# my modules
+from cqgridfinity import *
+
+from common_test import _almost_same
+
+
+def test_spec_table_no_cadquery():
+    code = "import sys, cqgridfinity.gf_spectable; print('cadquery' in sys.modules)"
+    r = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert r.stdout.strip() == "False"
+
+
+def test_spec_table_properties():
+    table = GridfinitySpecTable.matrix(
+        length_u=[1, 3],
+        width_u=2,
+        height_u=[2, 5],
+        lite_style=[False, True],
+        labels=[False, True],
+        solid=[False, True],
+        wall_th=[1.0, 2.5],
+    )
+    assert len(table) == 64
+    props = ["int_height", "max_height", "floor_h", "lip_width", "inner_l"]
+    props.extend(["outer_w", "safe_fillet_rad", "top_ref_height"])
+    for i, box in enumerate(table.objs()):
+        assert box.width_u == 2
+        for prop in props:
+            assert _almost_same(getattr(table, prop)[i], getattr(box, prop))
+        for backwall in [False, True]:
+            h = table.safe_label_height(backwall=backwall, from_bottom=True)[i]
+            assert _almost_same(h, box.safe_label_height(backwall, True))
+
+
+def test_spec_table_filter():
+    table = GridfinitySpecTable.matrix(
+        length_u=range(1, 8), width_u=range(1, 8), height_u=range(2, 13)
+    )
+    assert len(table) == 7 * 7 * 11
+    assert table.wall_th[0] == GR_WALL
+    xl, yl = table.compartment_dim
+    big = table[(xl > 100) & (yl > 100) & (table.int_height < 40)]
+    assert len(big) == 5 * 5 * 6
+    assert big[0] == GridfinitySpecTable.from_objs(big.objs([0]))[0]
+    assert _almost_same(big.inner_dim[0][0], GridfinityBox(3, 3, 2).inner_l)
+    with pytest.raises(ValueError):
+        GridfinitySpecTable(depth=5)
+
+
+def test_spec_table_validate():
+    table = GridfinitySpecTable.matrix(
+        length_u=[0, 2],
+        width_u=2,
+        height_u=3,
+        lite_style=[False, True],
+        holes=[False, True],
+        wall_th=[0.4, 1.0, 2.0],
+    )
+    errors = table.validate()
+    valid = table[table.valid]
+    assert len(valid) + len(errors) == len(table)
+    assert len(valid) == 5
+    assert all(not box.validate() for box in valid.objs())
+    for i, box in enumerate(table.objs()):
+        assert box.validate() == errors.get(i, [])
+
+
+def test_spec_table_round_trip():
+    boxes = [
+        GridfinityBox(2, 2, 3, scoops=True, scoop_rad=20, holes=True, hole_diam=8),
+        GridfinityBox(1, 2, 4, labels=True, label_lip_height=1.2, template=True),
+        GridfinityBox(3, 1, 5, length_div=2, fillet_interior=False, fillet_free=True),
+    ]
+    for box, copy in zip(boxes, GridfinitySpecTable.from_objs(boxes).objs()):
+        assert copy.canonical_params() == box.canonical_params()
+        assert copy.to_dict() == box.to_dict()